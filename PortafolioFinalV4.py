@@ -5,7 +5,6 @@ import json
 import smtplib
 import ssl
 import math
-import pandas as pd
 import urllib.parse
 from datetime import datetime, timedelta
 import numpy as np
@@ -13,7 +12,6 @@ import sys
 import sqlite3
 import winreg
 import re
-import urllib.request
 from types import SimpleNamespace
 
 # SOLUCION AL PROBLEMA DE MATPLOTLIB/PYQT6
@@ -28,51 +26,58 @@ from PyQt6.QtWidgets import (
     QLabel, QLineEdit, QPushButton, QComboBox, QScrollArea, QFrame, QTableWidget,
     QTableWidgetItem, QHeaderView, QAbstractItemView, QMessageBox, QRadioButton,
     QButtonGroup, QGroupBox, QAbstractScrollArea, QSizePolicy, QSplitter,
-    QStyleFactory, QCheckBox, QDateEdit, QListWidget, QListWidgetItem
+    QStyleFactory, QCheckBox, QDateEdit, QListWidget, QListWidgetItem, QTableView
 )
 from PyQt6.QtCore import Qt, QSize, QUrl, QTimer, QDate, QEvent
 from PyQt6.QtGui import QColor, QFont, QBrush, QIcon, QPixmap
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineSettings
 
-from collections import deque
 from db_utils import (
     get_conn,
     init_db,
     fetch_journal,
     insert_journal_row,
-    delete_journal_row_by_id,
+    delete_journal_rows,
     fetch_analysis,
     save_analysis,
+    fetch_portfolio,
     replace_portfolio,
+    replace_portfolio_positions,
+    data_version,
     import_journal_from_csv,
     import_analysis_from_csv,
     import_portfolio_from_csv,
     upsert_fx_rate,
-    fetch_fx_rate,
     fetch_fx_rate_on_or_before,
     fetch_fx_date_bounds,
     upsert_fx_rates_bulk,
     upsert_crypto_price,
     fetch_crypto_price,
     fetch_crypto_prices,
-    upsert_crypto_map,
-    fetch_crypto_map,
 )
 from app.ui.analysis_tab import AnalysisTab
-from app.ui.threads import DownloadThread
+from app.ui.journal_model import JournalFilterProxyModel, JournalTableModel
+from app.ui.refresh_bus import RefreshBus
+from app.ui.threads import DownloadThread, SnapshotThread
 from services.portfolio import (
     compute_cash_by_broker,
     compute_finished_operations,
-    compute_holdings_by_broker,
-    recompute_portfolio_rows,
+    LotLedger,
     next_plazo_fijo_number,
     calcular_operacion,
     compute_bmb_monthly_volume,
     get_bmb_tier,
     calcular_descuentos_y_totales,
 )
-from services.market import load_market_data, update_market_data
+from services.crypto import COINGECKO_MISS_TTL, COINGECKO_SEARCH_URL, CoinGeckoResolver
+from services.fx import empty_fx_series, fill_missing_dates, fx_rows, parse_ambito_series
+from services.fx_backfill import FxBackfillJob
+from services.http import HttpClient
+from services.market import MarketQuotes, load_market_data, update_market_data
+from services.portfolio_snapshot import build_portfolio_snapshot, project_portfolio
+from services.quote_cache import QuoteCache
+from services.rate_limit import HostRateLimiter
 
 # Configuracion de datos
 DATA_DIR = "data"
@@ -104,6 +109,9 @@ FX_SOURCE_BY_KIND = {
     "oficial": "bcra",
 }
 FX_BACKFILL_START = datetime(2020, 1, 1)
+HTTP_MIN_REQUEST_INTERVAL = 0.25  # segundos entre pedidos al mismo host
+HTTP_HOST_INTERVALS = {"api.coingecko.com": 2.0}  # la API pública limita pedidos por minuto
+HTTP_CACHE_DIR = os.path.join(DATA_DIR, "http_cache")
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
@@ -114,33 +122,15 @@ SMTP_TO = os.getenv("SMTP_TO", SMTP_USER)
 EMAIL_SUBJECT_PREFIX = os.getenv("EMAIL_SUBJECT_PREFIX", "Superprograma Portfolio")
 CONFIG_PATH = os.path.join(DATA_DIR, "app_config.json")
 COINGECKO_SIMPLE_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
-COINGECKO_SEARCH_URL = "https://api.coingecko.com/api/v3/search"
-CRYPTO_UPDATE_INTERVAL_MIN = 15
-COINGECKO_SYMBOL_MAP = {
-    "btc": "bitcoin",
-    "eth": "ethereum",
-    "usdt": "tether",
-    "usdc": "usd-coin",
-    "bnb": "binancecoin",
-    "xrp": "ripple",
-    "ada": "cardano",
-    "sol": "solana",
-    "dot": "polkadot",
-    "doge": "dogecoin",
-    "matic": "polygon",
-    "link": "chainlink",
-    "ltc": "litecoin",
-    "bch": "bitcoin-cash",
-    "avax": "avalanche-2",
-    "trx": "tron",
-    "uni": "uniswap",
-    "atom": "cosmos",
-    "near": "near",
-    "shib": "shiba-inu",
-    "xmr": "monero",
-    "xlm": "stellar",
-    "etc": "ethereum-classic",
-    "ton": "the-open-network",
+QUOTE_REFRESH_TICK_MS = 60 * 1000  # cada cuánto se revisan las clases de cotización vencidas
+# Vigencia (segundos) de la copia en disco de cada endpoint; sin entrada no se
+# cachea. BCRA no figura: sus pedidos llevan token y no se guardan en disco. La
+# búsqueda de CoinGecko no dura más que la caché negativa, para que su reintento
+# llegue a la red.
+HTTP_CACHE_TTL = {
+    "https://dolarhoy.com/": 5 * 60,
+    COINGECKO_SEARCH_URL: int(COINGECKO_MISS_TTL.total_seconds()),
+    COINGECKO_SIMPLE_PRICE_URL: 60,
 }
 
 
@@ -180,6 +170,14 @@ def send_email(subject, body):
 # Crear directorio si no existe
 os.makedirs(DATA_DIR, exist_ok=True)
 
+def _report_csv_import(nombre, result):
+    print(f"Migrado {nombre}: {result.imported} filas")
+    for line_no, error in result.errors[:20]:
+        print(f"  {nombre} línea {line_no}: {error}")
+    if len(result.errors) > 20:
+        print(f"  ... y {len(result.errors) - 20} errores más")
+
+
 # Inicializar base de datos
 def init_files():
     os.makedirs(DATA_DIR, exist_ok=True)
@@ -195,20 +193,21 @@ def init_files():
 
     if journal_empty and os.path.exists(LEGACY_JOURNAL):
         try:
-            import_journal_from_csv(LEGACY_JOURNAL)
+            _report_csv_import("journal.csv", import_journal_from_csv(LEGACY_JOURNAL))
         except Exception as e:
             print(f"Error migrando journal.csv: {e}")
     if analysis_empty and os.path.exists(LEGACY_ANALYSIS):
         try:
-            import_analysis_from_csv(LEGACY_ANALYSIS)
+            _report_csv_import("Analisis.csv", import_analysis_from_csv(LEGACY_ANALYSIS))
         except Exception as e:
             print(f"Error migrando Analisis.csv: {e}")
     if portfolio_empty and os.path.exists(LEGACY_PORTFOLIO):
         try:
-            import_portfolio_from_csv(LEGACY_PORTFOLIO)
+            _report_csv_import("portfolio.csv", import_portfolio_from_csv(LEGACY_PORTFOLIO))
         except Exception as e:
             print(f"Error migrando portfolio.csv: {e}")
 
+
 # Clase principal de la aplicación
 class PortfolioAppQt(QMainWindow):
     def __init__(self):
@@ -218,8 +217,27 @@ class PortfolioAppQt(QMainWindow):
 
         init_files()
         self.fx_backfill_done = False
+        self.http_rate_limiter = HostRateLimiter(
+            min_interval=HTTP_MIN_REQUEST_INTERVAL,
+            per_host=HTTP_HOST_INTERVALS,
+        )
+        self.http = HttpClient(
+            cache_dir=HTTP_CACHE_DIR,
+            ttl_by_prefix=HTTP_CACHE_TTL,
+            user_agent=USER_AGENT,
+            rate_limiter=self.http_rate_limiter,
+        )
+        # El backfill reintenta cada tramo con su propia espera; su cliente no
+        # reintenta, así un endpoint inestable no recibe reintentos anidados
+        self.backfill_http = HttpClient(
+            user_agent=USER_AGENT,
+            retries=0,
+            rate_limiter=self.http_rate_limiter,
+        )
+        self.crypto_resolver = CoinGeckoResolver(self._search_coingecko)
+        # La actualización FX se lanza desde la GUI y desde el hilo de la caché
+        self.fx_update_lock = threading.Lock()
         self.fx_update_running = False
-        self.crypto_update_running = False
         self.notify_state_path = os.path.join(DATA_DIR, "notify_state.json")
 
         # Crear widget central y layout principal
@@ -241,7 +259,19 @@ class PortfolioAppQt(QMainWindow):
         header_layout.addWidget(self.theme_toggle_btn)
         self.main_layout.addWidget(header_frame)
 
+        # Avisos de cambio de datos: cada vista se recalcula cuando se ve
+        self.refresh_bus = RefreshBus(self)
+        # Última cotización por clase de activo: se muestra al instante y se
+        # refresca en segundo plano cuando vence
+        self.quote_cache = QuoteCache()
+        self.quote_cache.register("cripto", self.update_crypto_prices)
+        self.quote_cache.register("fx", self.refresh_fx_quotes)
+        self.quote_cache.on_updated = lambda clase: self.refresh_bus.post("valuation")
+        self.seed_quote_cache()
+
         self.df_mercado = None
+        self.market_quotes = MarketQuotes()
+        self.market_data_version = 0
         self.last_update = None
         self.cargar_datos_mercado()
         self.default_fx_rate = 1.0
@@ -267,10 +297,10 @@ class PortfolioAppQt(QMainWindow):
         self.countdown_timer = QTimer(self)  # Nuevo timer para cuenta regresiva
         self.countdown_timer.timeout.connect(self.update_countdown)
 
-        self.crypto_update_timer = QTimer(self)
-        self.crypto_update_timer.timeout.connect(self.start_crypto_update_thread)
-        self.crypto_update_timer.start(CRYPTO_UPDATE_INTERVAL_MIN * 60 * 1000)
-        QTimer.singleShot(3000, self.start_crypto_update_thread)
+        self.quote_refresh_timer = QTimer(self)
+        self.quote_refresh_timer.timeout.connect(self.quote_cache.refresh_expired)
+        self.quote_refresh_timer.start(QUOTE_REFRESH_TICK_MS)
+        QTimer.singleShot(3000, self.quote_cache.refresh_expired)
 
         # Crear pestañas principales
         self.tabs = QTabWidget()
@@ -318,11 +348,16 @@ class PortfolioAppQt(QMainWindow):
         self.set_navigation_mode(False)
         self.apply_theme(self.detect_system_theme(), refresh_tables=False)
 
-        self.compras_pendientes = {}
+        self.lot_ledger = LotLedger()
+        self.portfolio_snapshot = None
+        self.snapshot_thread = None
+        self._snapshot_key = None
+        self._building_key = None
+        self._pending_portfolio_views = set()
         self.load_compras_pendientes()
         self.recalcular_portfolio()
-        self.refresh_portfolios()
-        self.load_journal()
+        self.register_refresh_views()
+        self.refresh_bus.refresh_visible()
         self.plazo_fijo_counter = self.get_next_plazo_fijo_number()
 
         self.tabs.currentChanged.connect(self.on_tab_changed)
@@ -442,14 +477,54 @@ class PortfolioAppQt(QMainWindow):
         if hasattr(self, "theme_toggle_btn"):
             self.theme_toggle_btn.setText("Modo claro" if theme_key == "dark" else "Modo oscuro")
         if refresh_tables:
-            self.refresh_portfolios()
+            self.refresh_bus.publish("theme")
 
     def get_portfolio_views(self):
         return getattr(self, "portfolio_views", [])
 
-    def refresh_portfolios(self):
-        for view in self.get_portfolio_views():
-            self.load_portfolio(view)
+    def register_refresh_views(self):
+        """Declara de qué datos depende cada vista para el bus de refresco."""
+        bus = self.refresh_bus
+        bus.register(
+            "portfolio_user",
+            lambda: self.load_portfolio(self.user_portfolio_view),
+            lambda: self.is_tab_visible(self.user_portfolio_tab),
+            ("journal", "valuation", "theme"),
+        )
+        bus.register(
+            "portfolio_dev",
+            lambda: self.load_portfolio(self.dev_portfolio_view),
+            lambda: self.is_tab_visible(self.dev_portfolio_tab),
+            ("journal", "valuation", "theme"),
+        )
+        bus.register(
+            "finished_ops",
+            self.load_finished_operations,
+            lambda: self.is_tab_visible(self.operations_tab, self.finished_ops_subtab),
+            ("journal",),
+        )
+        bus.register(
+            "journal",
+            self.load_journal,
+            lambda: self.is_tab_visible(self.operations_tab, self.journal_subtab),
+            ("journal",),
+        )
+        bus.register(
+            "analysis",
+            self.analysis_tab.refresh_portfolio_highlight,
+            lambda: self.is_tab_visible(self.analysis_tab),
+            ("journal",),
+        )
+
+    def is_tab_visible(self, tab, subtab=None):
+        if self.isMinimized() or self.tabs.currentWidget() is not tab:
+            return False
+        return subtab is None or self.operations_inner_tabs.currentWidget() is subtab
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange and not self.isMinimized():
+            self.refresh_bus.refresh_visible()
 
     def compute_bmb_tier(self, broker, fecha_dt):
         if (broker or "").upper() != "BMB":
@@ -513,7 +588,7 @@ class PortfolioAppQt(QMainWindow):
 
     def fetch_dolarhoy_rate(self, url):
         try:
-            html = urllib.request.urlopen(url, timeout=10).read().decode("utf-8", errors="ignore")
+            html = self.http.get_text(url)
         except Exception as e:
             print(f"Error leyendo {url}: {e}")
             return None, None
@@ -542,17 +617,6 @@ class PortfolioAppQt(QMainWindow):
             text = text.replace(".", "").replace(",", ".")
         return float(text)
 
-    def _parse_ambito_date(self, value):
-        if not value:
-            return None
-        text = str(value).strip()
-        for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
-            try:
-                return datetime.strptime(text, fmt)
-            except ValueError:
-                continue
-        return None
-
     def _load_notify_state(self):
         try:
             with open(self.notify_state_path, "r", encoding="utf-8") as f:
@@ -584,75 +648,50 @@ class PortfolioAppQt(QMainWindow):
         subject_line = f"{EMAIL_SUBJECT_PREFIX} - {subject}"
         send_email(subject_line, body)
 
-    def _fetch_ambito_series(self, tipo, start_dt, end_dt):
+    def _request_ambito_series(self, tipo, start_dt, end_dt, http=None):
+        """Serie de Ambito para el rango; lanza excepción si el pedido falla."""
         base = AMBITO_ENDPOINTS.get(tipo)
         if not base:
-            return {}
+            return empty_fx_series()
         start_str = start_dt.strftime("%Y-%m-%d")
         end_str = end_dt.strftime("%Y-%m-%d")
-        url = f"{base}{start_str}/{end_str}"
-        req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        data = (http or self.http).get_json(f"{base}{start_str}/{end_str}")
+        if not isinstance(data, list) or len(data) < 2:
+            return empty_fx_series()
+        return parse_ambito_series(data)
+
+    def _fetch_ambito_series(self, tipo, start_dt, end_dt):
         try:
-            raw = urllib.request.urlopen(req, timeout=10).read().decode("utf-8", errors="ignore")
-            data = json.loads(raw)
+            return self._request_ambito_series(tipo, start_dt, end_dt)
         except Exception as e:
             print(f"Error leyendo Ambito {tipo}: {e}")
-            return {}
-
-        if not isinstance(data, list) or len(data) < 2:
-            return {}
-        series = {}
-        for row in data[1:]:
-            if not row or len(row) < 2:
-                continue
-            dt = self._parse_ambito_date(row[0])
-            val = self._parse_decimal(row[1])
-            if dt and val is not None:
-                series[dt.strftime("%Y-%m-%d")] = float(val)
-        return series
-
-    def _fill_missing_dates(self, start_dt, end_dt, series):
-        filled = {}
-        current = start_dt
-        last_val = None
-        while current <= end_dt:
-            key = current.strftime("%Y-%m-%d")
-            if key in series:
-                last_val = series[key]
-                filled[key] = last_val
-            elif last_val is not None:
-                filled[key] = last_val
-            current += timedelta(days=1)
-        return filled
+            return empty_fx_series()
 
     def update_fx_rates_from_ambito_range(self, tipo, start_dt, end_dt):
         series = self._fetch_ambito_series(tipo, start_dt, end_dt)
-        if not series:
+        if series.empty:
             return False, f"Sin datos Ambito {tipo} {start_dt:%Y-%m-%d} a {end_dt:%Y-%m-%d}"
-        filled = self._fill_missing_dates(start_dt, end_dt, series)
-        rows = [
-            (fecha, tipo, "ambito", val, val)
-            for fecha, val in filled.items()
-        ]
-        upsert_fx_rates_bulk(rows)
+        filled = fill_missing_dates(start_dt, end_dt, series)
+        upsert_fx_rates_bulk(fx_rows(filled, tipo, "ambito"))
         return True, None
 
     def ensure_fx_backfill(self):
         if self.fx_backfill_done:
             return []
-        today = datetime.now()
-        errors = []
+        tipos = []
         for tipo in AMBITO_ENDPOINTS:
             min_date, _ = fetch_fx_date_bounds(tipo, "ambito")
             if min_date and min_date <= FX_BACKFILL_START.strftime("%Y-%m-%d"):
                 continue
-            current = FX_BACKFILL_START
-            while current <= today:
-                chunk_end = min(current + timedelta(days=180), today)
-                ok, err = self.update_fx_rates_from_ambito_range(tipo, current, chunk_end)
-                if not ok and err:
-                    errors.append(err)
-                current = chunk_end + timedelta(days=1)
+            tipos.append(tipo)
+        job = FxBackfillJob(
+            lambda tipo, desde, hasta: self._request_ambito_series(tipo, desde, hasta, http=self.backfill_http),
+            tipos,
+            FX_BACKFILL_START,
+            datetime.now(),
+            fuente="ambito",
+        )
+        errors = job.run()
         self.fx_backfill_done = True
         return errors
 
@@ -684,16 +723,8 @@ class PortfolioAppQt(QMainWindow):
             print("BCRA_API_TOKEN no configurado. Salteando tipo de cambio oficial.")
             return "BCRA_API_TOKEN no configurado."
         url = "https://api.estadisticasbcra.com/usd_of"
-        req = urllib.request.Request(
-            url,
-            headers={
-                "Authorization": f"BEARER {token}",
-                "User-Agent": USER_AGENT,
-            },
-        )
         try:
-            raw = urllib.request.urlopen(req, timeout=10).read().decode("utf-8", errors="ignore")
-            data = json.loads(raw)
+            data = self.http.get_json(url, headers={"Authorization": f"BEARER {token}"})
         except Exception as e:
             print(f"Error leyendo BCRA: {e}")
             return f"Error leyendo BCRA: {e}"
@@ -748,19 +779,72 @@ class PortfolioAppQt(QMainWindow):
             body += "\n".join(f"- {e}" for e in errors)
             self._send_notification("Fallo de actualización FX", body, "fx_update_error")
 
+    def _claim_fx_update(self):
+        """Marca una actualización FX en curso; False si ya había otra."""
+        with self.fx_update_lock:
+            if self.fx_update_running:
+                return False
+            self.fx_update_running = True
+            return True
+
+    def _release_fx_update(self):
+        with self.fx_update_lock:
+            self.fx_update_running = False
+
     def start_fx_update_thread(self, run_backfill=False):
-        if self.fx_update_running:
+        if not self._claim_fx_update():
             return
-        self.fx_update_running = True
 
         def _worker():
             try:
                 self.update_fx_rates_from_sources(run_backfill=run_backfill)
+                self.quote_cache.put_many("fx", self.latest_fx_quotes())
             finally:
-                self.fx_update_running = False
+                self._release_fx_update()
+                self.refresh_bus.post("valuation")
 
         threading.Thread(target=_worker, daemon=True).start()
 
+    def latest_fx_quotes(self):
+        """{"USD/KIND": (cotización, None, fecha)} con el último dato de cada tipo."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        quotes = {}
+        for kind, fuente in FX_SOURCE_BY_KIND.items():
+            row = fetch_fx_rate_on_or_before(today, kind, fuente)
+            if row:
+                rate = row.get("venta") or row.get("compra")
+                quotes[f"USD/{kind.upper()}"] = (rate, None, datetime.strptime(row["fecha"], "%Y-%m-%d"))
+        return quotes
+
+    def refresh_fx_quotes(self):
+        # Si ya corre una actualización (p. ej. el backfill inicial) no se
+        # lanza otra: se toma lo que haya y esa avisa al terminar
+        if self._claim_fx_update():
+            try:
+                self.update_fx_rates_from_sources(run_backfill=False)
+            finally:
+                self._release_fx_update()
+        return self.latest_fx_quotes()
+
+    def seed_quote_cache(self):
+        """Carga en la caché las últimas cotizaciones guardadas, sin ir a la red."""
+        try:
+            crypto = {}
+            for sym, row in fetch_crypto_prices(self.get_crypto_symbols()).items():
+                updated_at = self._parse_timestamp(row.get("updated_at"))
+                if updated_at is not None:
+                    crypto[sym] = (row.get("price_usd"), row.get("change_24h"), updated_at)
+            self.quote_cache.put_many("cripto", crypto)
+            self.quote_cache.put_many("fx", self.latest_fx_quotes())
+        except Exception as e:
+            print(f"Error cargando cotizaciones guardadas: {e}")
+
+    def _parse_timestamp(self, value):
+        try:
+            return datetime.fromisoformat(str(value))
+        except (TypeError, ValueError):
+            return None
+
     def get_crypto_symbols(self):
         symbols = []
         try:
@@ -776,65 +860,40 @@ class PortfolioAppQt(QMainWindow):
             print(f"Error leyendo simbolos cripto: {e}")
         return sorted(set(symbols))
 
+    def _search_coingecko(self, query):
+        # Una búsqueda sin monedas no se guarda: de eso se encarga crypto_map_misses
+        return self.http.get_json(
+            f"{COINGECKO_SEARCH_URL}?query={urllib.parse.quote(query)}",
+            cache_if=lambda data: isinstance(data, dict) and bool(data.get("coins")),
+        )
+
     def resolve_coingecko_id(self, symbol):
-        sym = symbol.strip().lower()
-        if not sym:
+        if not symbol.strip():
             return None
-        cached = fetch_crypto_map(sym.upper())
-        if cached:
-            return cached.get("coingecko_id")
-        if sym in COINGECKO_SYMBOL_MAP:
-            coingecko_id = COINGECKO_SYMBOL_MAP[sym]
-            upsert_crypto_map(sym.upper(), coingecko_id)
-            return coingecko_id
-        try:
-            query = urllib.parse.quote(sym)
-            url = f"{COINGECKO_SEARCH_URL}?query={query}"
-            req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
-            raw = urllib.request.urlopen(req, timeout=10).read().decode("utf-8", errors="ignore")
-            data = json.loads(raw)
-            coins = data.get("coins", [])
-            for coin in coins:
-                if coin.get("symbol", "").lower() == sym:
-                    coingecko_id = coin.get("id")
-                    if coingecko_id:
-                        upsert_crypto_map(sym.upper(), coingecko_id)
-                        return coingecko_id
-            if coins:
-                coingecko_id = coins[0].get("id")
-                if coingecko_id:
-                    upsert_crypto_map(sym.upper(), coingecko_id)
-                    return coingecko_id
-        except Exception as e:
-            print(f"Error resolviendo CoinGecko id para {symbol}: {e}")
-        return None
+        return self.crypto_resolver.resolve(symbol)
 
     def update_crypto_prices(self):
+        """Actualiza los precios cripto; devuelve {SIMBOLO: (precio, variación 24h, fecha)}."""
         symbols = self.get_crypto_symbols()
         if not symbols:
-            return
+            return {}
         ids = []
         symbol_by_id = {}
-        for sym in symbols:
-            coingecko_id = self.resolve_coingecko_id(sym)
-            if coingecko_id:
-                ids.append(coingecko_id)
-                symbol_by_id[coingecko_id] = sym
+        for sym, coingecko_id in self.crypto_resolver.resolve_many(symbols).items():
+            ids.append(coingecko_id)
+            symbol_by_id[coingecko_id] = sym
         if not ids:
-            return
+            return {}
         ids_str = ",".join(sorted(set(ids)))
         url = (
             f"{COINGECKO_SIMPLE_PRICE_URL}?ids={urllib.parse.quote(ids_str)}"
             "&vs_currencies=usd&include_24hr_change=true"
         )
-        req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
-        try:
-            raw = urllib.request.urlopen(req, timeout=10).read().decode("utf-8", errors="ignore")
-            data = json.loads(raw)
-        except Exception as e:
-            print(f"Error leyendo precios cripto: {e}")
-            return
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Si el pedido falla la excepción llega a la caché, que reintenta más tarde
+        data = self.http.get_json(url)
+        now_dt = datetime.now()
+        now = now_dt.strftime("%Y-%m-%d %H:%M:%S")
+        quotes = {}
         for coingecko_id, payload in data.items():
             price = payload.get("usd")
             change_24h = payload.get("usd_24h_change")
@@ -844,40 +903,23 @@ class PortfolioAppQt(QMainWindow):
             if symbol:
                 change_val = self._safe_number(change_24h, None)
                 upsert_crypto_price(symbol, float(price), now, change_val)
+                quotes[symbol] = (float(price), change_val, now_dt)
+        return quotes
 
-    def start_crypto_update_thread(self):
-        if self.crypto_update_running:
-            return
-        self.crypto_update_running = True
-
-        def _worker():
-            try:
-                self.update_crypto_prices()
-            finally:
-                self.crypto_update_running = False
-                QTimer.singleShot(0, self.refresh_portfolios)
-
-        threading.Thread(target=_worker, daemon=True).start()
-
-    def get_fx_rate_for_date(self, fecha_dt, tipo):
-        kind = self.get_fx_kind_for_tipo(tipo)
-        fecha_str = fecha_dt.strftime("%Y-%m-%d")
+    def _lookup_fx_rate(self, fecha_str, kind):
+        """Cotización exacta o la última anterior, desde las series FX en memoria."""
         fuente = FX_SOURCE_BY_KIND.get(kind, "dolarhoy")
-        row = fetch_fx_rate(fecha_str, kind, fuente)
-        if row:
-            return row.get("venta") or row.get("compra")
-        row = fetch_fx_rate_on_or_before(fecha_str, kind, fuente)
-        if row:
-            return row.get("venta") or row.get("compra")
-        if fuente != "dolarhoy":
-            row = fetch_fx_rate(fecha_str, kind, "dolarhoy")
-            if row:
-                return row.get("venta") or row.get("compra")
-            row = fetch_fx_rate_on_or_before(fecha_str, kind, "dolarhoy")
+        fuentes = [fuente] if fuente == "dolarhoy" else [fuente, "dolarhoy"]
+        for fuente_actual in fuentes:
+            row = fetch_fx_rate_on_or_before(fecha_str, kind, fuente_actual)
             if row:
                 return row.get("venta") or row.get("compra")
         return None
 
+    def get_fx_rate_for_date(self, fecha_dt, tipo):
+        kind = self.get_fx_kind_for_tipo(tipo)
+        return self._lookup_fx_rate(fecha_dt.strftime("%Y-%m-%d"), kind)
+
     def _safe_number(self, value, default=0.0):
         try:
             num = float(value)
@@ -888,22 +930,7 @@ class PortfolioAppQt(QMainWindow):
         return num
 
     def get_ccl_rate_for_date(self, fecha_dt):
-        fecha_str = fecha_dt.strftime("%Y-%m-%d")
-        fuente = FX_SOURCE_BY_KIND.get("ccl", "dolarhoy")
-        row = fetch_fx_rate(fecha_str, "ccl", fuente)
-        if row:
-            return row.get("venta") or row.get("compra")
-        row = fetch_fx_rate_on_or_before(fecha_str, "ccl", fuente)
-        if row:
-            return row.get("venta") or row.get("compra")
-        if fuente != "dolarhoy":
-            row = fetch_fx_rate(fecha_str, "ccl", "dolarhoy")
-            if row:
-                return row.get("venta") or row.get("compra")
-            row = fetch_fx_rate_on_or_before(fecha_str, "ccl", "dolarhoy")
-            if row:
-                return row.get("venta") or row.get("compra")
-        return None
+        return self._lookup_fx_rate(fecha_dt.strftime("%Y-%m-%d"), "ccl")
 
 
     def update_default_fx_rate(self):
@@ -1288,24 +1315,10 @@ class PortfolioAppQt(QMainWindow):
         self.countdown_timer.start(1000)
 
     def on_tab_changed(self, index):
-        current_widget = self.tabs.widget(index)
-        if current_widget == self.operations_tab:
-            inner_tab_name = self.operations_inner_tabs.tabText(self.operations_inner_tabs.currentIndex())
-            if inner_tab_name == "Operaciones Finalizadas":
-                self.load_finished_operations()
-        elif current_widget in self.portfolio_views_by_tab:
-            self.load_portfolio(self.portfolio_views_by_tab[current_widget])
-        elif current_widget == self.analysis_tab:
-            self.analysis_tab.load_portfolio()
-            self.analysis_tab.load_saved_data()
-            self.analysis_tab.sort_tables()  # Actualizar ordenamiento
+        self.refresh_bus.refresh_visible()
 
     def on_inner_tab_changed(self, index):
-        tab_name = self.operations_inner_tabs.tabText(index)
-        if tab_name == "Operaciones Finalizadas":
-            self.load_finished_operations()
-        elif tab_name == "Libro Diario":
-            self.load_journal()
+        self.refresh_bus.refresh_visible()
 
     def create_finished_ops_view(self, parent_widget):
         layout = QVBoxLayout(parent_widget)
@@ -1516,20 +1529,21 @@ class PortfolioAppQt(QMainWindow):
                 self.finished_table.setItem(row_idx, i, item)
 
     def recalcular_portfolio(self):
-        """Recalcular completamente el portafolio desde el libro diario"""
-        try:
-            journal_rows = fetch_journal()
-        except Exception as e:
-            print(f"Error leyendo journal: {e}")
-            return
-
-        rows_to_save = recompute_portfolio_rows(journal_rows)
-        replace_portfolio(rows_to_save)
+        """Recalcular el portafolio desde el libro de lotes"""
+        replace_portfolio(self.lot_ledger.portfolio_rows())
 
     def cargar_datos_mercado(self):
         try:
             self.df_mercado, self.last_update = load_market_data()
-            self.start_fx_update_thread(run_backfill=False)
+            self.market_quotes = MarketQuotes.from_dataframe(self.df_mercado)
+            self.market_data_version += 1
+            updated_at = self._parse_timestamp(self.last_update)
+            if updated_at is not None:
+                self.quote_cache.put_many(
+                    "mercado",
+                    {q.simbolo: (q.precio, q.variacion, updated_at) for q in self.market_quotes},
+                )
+            self.refresh_bus.publish("valuation")
             self.update_default_fx_rate()
             if self.df_mercado is not None and self.last_update:
                 self.update_status_labels()
@@ -1539,6 +1553,7 @@ class PortfolioAppQt(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error cargando datos de mercado: {str(e)}")
             self.df_mercado = None
+            self.market_quotes = MarketQuotes()
 
     def actualizar_datos_mercado(self):
         if hasattr(self, 'update_thread') and self.update_thread.isRunning():
@@ -1560,8 +1575,6 @@ class PortfolioAppQt(QMainWindow):
 
         if success:
             self.cargar_datos_mercado()
-            self.refresh_portfolios()
-            self.load_finished_operations()
 
         # Reiniciar actualización automática
         if self.auto_update_active:
@@ -2049,7 +2062,7 @@ class PortfolioAppQt(QMainWindow):
                     return
 
             # Guardar en base de datos
-            insert_journal_row({
+            journal_row = {
                 'fecha': fecha,
                 'tipo': tipo,
                 'tipo_operacion': tipo_op,
@@ -2071,37 +2084,18 @@ class PortfolioAppQt(QMainWindow):
                 'broker': broker,
                 'moneda': moneda,
                 'tc_usd_ars': tc_usd_ars
-            })
-
-            # Actualizar compras pendientes
-            if tipo_op == "Compra":
-                if simbolo not in self.compras_pendientes:
-                    self.compras_pendientes[simbolo] = deque()
-                self.compras_pendientes[simbolo].append((cantidad, precio))
-            elif tipo_op == "Venta":
-                cantidad_a_vender = cantidad
-                while cantidad_a_vender > 0 and self.compras_pendientes.get(simbolo):
-                    primera_compra = self.compras_pendientes[simbolo][0]
-                    if primera_compra[0] <= cantidad_a_vender:
-                        cantidad_a_vender -= primera_compra[0]
-                        self.compras_pendientes[simbolo].popleft()
-                    else:
-                        self.compras_pendientes[simbolo][0] = (primera_compra[0] - cantidad_a_vender, primera_compra[1])
-                        cantidad_a_vender = 0
+            }
+            journal_row['id'] = insert_journal_row(journal_row)
+
+            # Actualizar lotes abiertos sin reprocesar el journal completo
+            self.lot_ledger.apply(journal_row)
 
             # Recalcular el portafolio
             self.recalcular_portfolio()
 
             QMessageBox.information(self, "Éxito", "Operación registrada correctamente")
             self.limpiar_formulario()
-            self.load_journal()
-            self.refresh_portfolios()
-            self.load_finished_operations()
-
-            # Actualizar pestaña de Análisis
-            self.analysis_tab.load_portfolio()
-            self.analysis_tab.load_saved_data()
-            self.analysis_tab.sort_tables()
+            self.refresh_bus.publish("journal")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al guardar: {str(e)}")
 
@@ -2509,31 +2503,8 @@ class PortfolioAppQt(QMainWindow):
 
     def detect_fx_rate(self):
         """Intenta obtener un tipo de cambio MEP desde los datos de mercado usando AL30/AL30D"""
-        fx_rate = self.get_fx_rate_for_date(datetime.now(), "Acciones AR") or 1.0
-        if self.df_mercado is not None:
-            symbol_col = next(
-                (c for c in ["Símbolo.1", "Símbolo", "Simbolo", "Symbol", "Ticker"] if c in self.df_mercado.columns),
-                None,
-            )
-            price_col = next(
-                (c for c in ["Último Operado", "Ultimo Operado", "Precio", "Close"] if c in self.df_mercado.columns),
-                None,
-            )
-            if symbol_col and price_col:
-                try:
-                    al30 = self.df_mercado[self.df_mercado[symbol_col] == "AL30"].iloc[0][price_col]
-                    al30d = self.df_mercado[self.df_mercado[symbol_col] == "AL30D"].iloc[0][price_col]
-                    if isinstance(al30, str):
-                        al30 = al30.replace('.', '').replace(',', '.')
-                    if isinstance(al30d, str):
-                        al30d = al30d.replace('.', '').replace(',', '.')
-                    al30 = float(al30)
-                    al30d = float(al30d)
-                    if al30d != 0:
-                        fx_rate = al30 / al30d
-                except Exception:
-                    pass
-        self.default_fx_rate = fx_rate if fx_rate > 0 else 1.0
+        fallback = self.get_fx_rate_for_date(datetime.now(), "Acciones AR") or 1.0
+        self.default_fx_rate = self.market_quotes.mep_rate(fallback)
         return self.default_fx_rate
 
     def update_interval(self, text, view):
@@ -2585,429 +2556,140 @@ class PortfolioAppQt(QMainWindow):
 
     def get_holdings_by_broker(self):
         holdings = {broker: {} for broker in BROKERS}
-        try:
-            journal_rows = fetch_journal()
-            computed = compute_holdings_by_broker(journal_rows)
-            for broker, symbols in computed.items():
-                holdings[broker] = symbols
-        except Exception as e:
-            print(f"Error calculando posiciones por broker: {e}")
+        for broker, symbols in self.lot_ledger.holdings().items():
+            holdings[broker] = symbols
         return holdings
 
+    def _portfolio_data_key(self):
+        return (data_version(), self.market_data_version)
+
     def load_portfolio(self, view=None):
+        """Dibuja la vista con la valuación vigente o pide una nueva en segundo plano."""
         if view is None:
             view = self.user_portfolio_view
+        key = self._portfolio_data_key()
+        if self.portfolio_snapshot is not None and self._snapshot_key == key:
+            self.render_portfolio(view, self.portfolio_snapshot)
+            return
+        self._pending_portfolio_views.add(view)
+        if self.snapshot_thread is not None and self.snapshot_thread.isRunning():
+            return
+        self._start_portfolio_snapshot()
+
+    def _start_portfolio_snapshot(self):
+        self._building_key = self._portfolio_data_key()
+        # Lo que vive en memoria de la UI se copia antes de salir del hilo principal
+        average_costs = self.lot_ledger.average_costs()
+        market_quotes = self.market_quotes
+        get_fx_rate_for_date = self.get_fx_rate_for_date
+        brokers = list(BROKERS)
+
+        def build():
+            journal_rows = fetch_journal()
+            portfolio_rows = fetch_portfolio()
+            crypto_prices = {}
+            try:
+                crypto_symbols = [
+                    (row.get("simbolo") or "").strip().upper()
+                    for row in portfolio_rows
+                    if row.get("tipo") == "Criptomonedas"
+                ]
+                crypto_prices = fetch_crypto_prices(crypto_symbols)
+            except Exception as e:
+                print(f"Error leyendo precios cripto: {e}")
+            return build_portfolio_snapshot(
+                journal_rows,
+                portfolio_rows,
+                crypto_prices,
+                market_quotes,
+                average_costs,
+                get_fx_rate_for_date,
+                brokers,
+            )
+
+        self.snapshot_thread = SnapshotThread(build)
+        self.snapshot_thread.finished.connect(self._on_portfolio_snapshot)
+        self.snapshot_thread.failed.connect(self._on_portfolio_snapshot_failed)
+        self.snapshot_thread.start()
+
+    def _restart_stale_snapshot(self):
+        # Si los datos cambiaron mientras se calculaba, se descarta y se vuelve a pedir
+        if self._building_key == self._portfolio_data_key():
+            return False
+        self.snapshot_thread.wait()
+        self._start_portfolio_snapshot()
+        return True
 
+    def _on_portfolio_snapshot(self, snapshot):
+        if self._restart_stale_snapshot():
+            return
+        views = self._pending_portfolio_views
+        self._pending_portfolio_views = set()
+        self.portfolio_snapshot = snapshot
+        self._snapshot_key = self._building_key
+        self.default_fx_rate = snapshot.fx_rate
+        for view in views:
+            self.render_portfolio(view, snapshot)
+
+    def _on_portfolio_snapshot_failed(self, message):
+        print(f"Error calculando portafolio: {message}")
+        if not self._restart_stale_snapshot():
+            self._pending_portfolio_views = set()
+
+    def _mark_quote_age(self, cell, item):
+        """Antigüedad de la cotización en el tooltip; gris e itálica si ya venció."""
+        # Misma fuente de precio que la valuación: cripto por CoinGecko y, si
+        # no hay, la foto de mercado
+        clase, key = "mercado", item.get("simbolo") or ""
+        crypto_key = key.strip().upper()
+        if item.get("tipo") == "Criptomonedas" and self.quote_cache.get("cripto", crypto_key) is not None:
+            clase, key = "cripto", crypto_key
+        age = self.quote_cache.age(clase, key)
+        if cell is None or age is None:
+            return
+        minutes = max(int(age.total_seconds() // 60), 0)
+        if minutes < 60:
+            edad = f"{minutes} min"
+        elif minutes < 48 * 60:
+            edad = f"{minutes // 60} h"
+        else:
+            edad = f"{minutes // (24 * 60)} días"
+        if self.quote_cache.is_stale(clase, key):
+            cell.setToolTip(f"Cotización de hace {edad} (desactualizada)")
+            cell.setForeground(QColor('gray'))
+            font = cell.font()
+            font.setItalic(True)
+            cell.setFont(font)
+        else:
+            cell.setToolTip(f"Cotización de hace {edad}")
+
+    def render_portfolio(self, view, snapshot):
         # Limpiar tabla
         view.portfolio_table.setRowCount(0)
 
-        plazo_fijo_detalles = {}
-        descuentos_por_simbolo = {}
-        rendimientos_por_simbolo = {}
-        tc_weighted_by_symbol = {}
-        tc_weighted_amount = {}
-        try:
-            for row in fetch_journal():
-                simbolo = row.get("simbolo", "")
-                tipo_op = row.get("tipo_operacion", "")
-                tipo = row.get("tipo", "")
-                total_desc = row.get("total_descuentos", 0)
-                rendimiento_val = row.get("rendimiento", 0)
-
-                # Recolectar descuentos
-                if tipo_op in ["Compra", "Dividendos"]:
-                    try:
-                        total_desc = float(str(total_desc).replace(',', '.'))
-                    except Exception:
-                        total_desc = 0
-                    if simbolo not in descuentos_por_simbolo:
-                        descuentos_por_simbolo[simbolo] = 0
-                    descuentos_por_simbolo[simbolo] += total_desc
-
-                # Recolectar rendimientos
-                if tipo_op == "Dividendos":
-                    try:
-                        rendimiento = float(str(rendimiento_val).replace(',', '.'))
-                    except Exception:
-                        rendimiento = 0
-                    if simbolo not in rendimientos_por_simbolo:
-                        rendimientos_por_simbolo[simbolo] = 0
-                    rendimientos_por_simbolo[simbolo] += rendimiento
-
-                if tipo_op == "Compra" and simbolo:
-                    try:
-                        cantidad = float(row.get("cantidad", 0) or 0)
-                        precio = float(str(row.get("precio", 0)).replace(",", ".") or 0)
-                    except Exception:
-                        cantidad = 0
-                        precio = 0
-                    monto = cantidad * precio
-                    if monto > 0:
-                        tc_val = 0
-                        try:
-                            fecha_dt = datetime.strptime(row.get("fecha", ""), "%Y-%m-%d")
-                            tc_val = self.get_fx_rate_for_date(fecha_dt, tipo) or 0
-                        except Exception:
-                            tc_val = 0
-                        if tc_val <= 0:
-                            tc_row = row.get("tc_usd_ars", 0) or 0
-                            try:
-                                tc_val = float(tc_row)
-                            except Exception:
-                                tc_val = 0
-                        if tc_val > 0:
-                            tc_weighted_by_symbol[simbolo] = tc_weighted_by_symbol.get(simbolo, 0.0) + (tc_val * monto)
-                            tc_weighted_amount[simbolo] = tc_weighted_amount.get(simbolo, 0.0) + monto
-
-                if tipo == "Plazo Fijo" and simbolo:
-                    plazo_fijo_detalles[simbolo] = row.get("detalle", "")
-        except Exception as e:
-            print(f"Error leyendo journal para portfolio: {e}")
-
-        # Calcular efectivo por moneda/broker
-        cash_by_broker_ars = self.get_cash_by_broker("ARS")
-        cash_by_broker_usd = self.get_cash_by_broker("USD")
-        fx_rate = self.detect_fx_rate()
+        fx_rate = snapshot.fx_rate
         if getattr(view, "is_user", False):
             view.liquidity_by_broker = {
-                "ARS": cash_by_broker_ars,
-                "USD": cash_by_broker_usd
+                moneda: dict(balances) for moneda, balances in snapshot.cash_by_broker.items()
             }
 
-        portfolio_data = []
-        # Inicializar total_valor a 0 (se calcularó despuós)
-        total_valor = 0.0
-        tipo_valores = {}
-
-        # Agregar efectivo por broker combinando ARS y USD en una fila
-        cash_combined = {}
-        for broker, amount in cash_by_broker_ars.items():
-            if abs(amount) >= 0.0001:
-                cash_combined.setdefault(broker, {'ars': 0.0, 'usd': 0.0})
-                cash_combined[broker]['ars'] += amount
-        for broker, amount in cash_by_broker_usd.items():
-            if abs(amount) >= 0.0001:
-                cash_combined.setdefault(broker, {'ars': 0.0, 'usd': 0.0})
-                cash_combined[broker]['usd'] += amount
-
-        for broker, amounts in cash_combined.items():
-            moneda_label = "ARS/USD" if amounts['ars'] and amounts['usd'] else ("ARS" if amounts['ars'] else "USD")
-            portfolio_data.append({
-                'tipo': "Efectivo",
-                'broker': broker,
-                'moneda': moneda_label,
-                'simbolo': broker,
-                'simbolo_display': f"Liquidez {broker}",
-                'detalle': f"Liquidez en {broker}",
-                'precio_prom': 1.0,
-                'cantidad': 0,  # no aplica cantidad única
-                'precio_actual': 1.0,
-                'variacion_diaria': 0.0,
-                'monto_ars': amounts.get('ars', 0.0),
-                'monto_usd': amounts.get('usd', 0.0)
-            })
-
-        # Cargar otros activos
-        # Cargar otros activos desde base de datos
-        with get_conn() as conn:
-            cur = conn.execute("SELECT simbolo, broker, tipo, moneda, cantidad, precio_prom FROM portfolio")
-            for row in cur.fetchall():
-                simbolo = row['simbolo']
-                broker = row['broker']
-                tipo = row['tipo']
-                moneda = row['moneda']
-                cantidad = float(row['cantidad'])
-                precio_prom = float(row['precio_prom'])
-                simbolo_display = simbolo
-
-                if tipo == "Plazo Fijo":
-                    detalle = plazo_fijo_detalles.get(simbolo, "")
-                    if detalle:
-                        simbolo_display = f"{simbolo} ({detalle})"
-
-                portfolio_data.append({
-                    'tipo': tipo,
-                    'broker': broker,
-                    'moneda': moneda,
-                    'simbolo': simbolo,
-                    'simbolo_display': simbolo_display,
-                    'detalle': "",
-                    'precio_prom': precio_prom,
-                    'cantidad': cantidad
-                })
-
-        # Filtrar entradas obsoletas de "Efectivo Líquido"
-        portfolio_data = [p for p in portfolio_data if p.get('tipo') != "Efectivo Líquido"]
-
-        crypto_prices = {}
-        try:
-            crypto_symbols = [
-                (p.get("simbolo") or "").strip().upper()
-                for p in portfolio_data
-                if p.get("tipo") == "Criptomonedas"
-            ]
-            crypto_prices = fetch_crypto_prices(crypto_symbols)
-        except Exception as e:
-            print(f"Error leyendo precios cripto: {e}")
-
         display_currency = "ARS"
         if getattr(view, "is_user", False):
             display_currency = getattr(view, "asset_currency_view", "ARS")
 
-        # Calcular los valores para cada activo
-        total_valor_ars = 0.0
-        total_valor_usd = 0.0
-        total_valor_actual_usd = 0.0  # para sumatoria de columna Valor USD
-
-        for item in portfolio_data:
-            moneda_item = item.get('moneda', 'ARS')
-            # Para Efectivo
-            if item['tipo'] == "Efectivo":
-                item['precio_operacion_compra'] = 1.0
-                item['valor_compra'] = item['cantidad'] * item['precio_operacion_compra']
-                item['precio_actual'] = 1.0
-                item['valor_actual'] = item['cantidad'] * item['precio_actual']
-                item['diferencia_valor'] = item['valor_actual'] - item['valor_compra']
-                item['variacion_diaria'] = 0.0
-
-            # Para Plazo Fijo
-            elif item['tipo'] == "Plazo Fijo":
-                item['precio_operacion_compra'] = 1.0
-                item['valor_compra'] = item['cantidad'] * item['precio_operacion_compra']
-                item['precio_actual'] = 1.0
-                item['valor_actual'] = item['cantidad'] * item['precio_actual']
-                item['diferencia_valor'] = item['valor_actual'] - item['valor_compra']
-                item['variacion_diaria'] = 0.0
-
-            else:  # Para otros activos
-                if item['simbolo'] in self.compras_pendientes and self.compras_pendientes[item['simbolo']]:
-                    total_cantidad = sum([compra[0] for compra in self.compras_pendientes[item['simbolo']]])
-                    total_inversion = sum([compra[0] * compra[1] for compra in self.compras_pendientes[item['simbolo']]])
-                    if total_cantidad > 0:
-                        item['precio_operacion_compra'] = total_inversion / total_cantidad
-                    else:
-                        item['precio_operacion_compra'] = 0
-                else:
-                    item['precio_operacion_compra'] = 0
-
-                item['valor_compra'] = item['cantidad'] * item['precio_operacion_compra']
-
-                # Obtener precio actual y variación diaria del mercado
-                item['precio_actual'] = None
-                item['variacion_diaria'] = None
-                if item['tipo'] == "Criptomonedas":
-                    symbol_key = (item.get("simbolo") or "").strip().upper()
-                    price_row = crypto_prices.get(symbol_key)
-                    if price_row:
-                        item['precio_actual'] = self._safe_number(price_row.get("price_usd"), None)
-                        item['variacion_diaria'] = self._safe_number(price_row.get("change_24h"), None)
-                if item['precio_actual'] is None and self.df_mercado is not None:
-                    simbolo = item['simbolo']
-                    if item['tipo'] == "Plazo Fijo" and "(" in simbolo:
-                        simbolo = simbolo.split("(")[0].strip()
-
-                    # Buscar columnas disponibles en el CSV de mercado
-                    symbol_col = next(
-                        (c for c in ["Símbolo.1", "Símbolo", "Simbolo", "Symbol", "Ticker"] if c in self.df_mercado.columns),
-                        None,
-                    )
-                    price_col = next(
-                        (c for c in ["Último Operado", "Ultimo Operado", "Precio", "Close"] if c in self.df_mercado.columns),
-                        None,
-                    )
-                    var_col = next(
-                        (c for c in ["Variación Diaria", "Variacion Diaria", "Var.%", "Variación", "Change %"] if c in self.df_mercado.columns),
-                        None,
-                    )
-
-                    if symbol_col and price_col:
-                        match = self.df_mercado[self.df_mercado[symbol_col] == simbolo]
-                    else:
-                        match = pd.DataFrame()
-
-                    if not match.empty:
-                            try:
-                                ultimo_operado = match.iloc[0].get(price_col)
-                                if isinstance(ultimo_operado, str):
-                                    ultimo_operado = ultimo_operado.replace('.', '').replace(',', '.')
-                                ultimo_operado = self._safe_number(ultimo_operado, None)
-                                if ultimo_operado is None:
-                                    item['precio_actual'] = None
-                                elif item['tipo'] == "Bonos AR":
-                                    item['precio_actual'] = ultimo_operado * 0.01
-                                else:
-                                    item['precio_actual'] = ultimo_operado
-                            except Exception:
-                                item['precio_actual'] = None
-
-                            if var_col:
-                                try:
-                                    variacion = match.iloc[0].get(var_col)
-                                    if isinstance(variacion, str):
-                                        variacion = variacion.replace('%', '').replace(',', '.').strip()
-                                        if variacion.endswith('%'):
-                                            variacion = variacion[:-1]
-                                    item['variacion_diaria'] = self._safe_number(variacion, None)
-                                except Exception:
-                                    item['variacion_diaria'] = None
-
-                if item['precio_actual'] is not None:
-                    item['valor_actual'] = item['cantidad'] * item['precio_actual']
-                else:
-                    item['valor_actual'] = item['valor_compra']
-                item['valor_actual'] = self._safe_number(item['valor_actual'], item['valor_compra'])
-
-                item['diferencia_valor'] = item['valor_actual'] - item['valor_compra']
-
-            # Calcular descuentos totales (base = comisiones del libro)
-            descuento_total = descuentos_por_simbolo.get(item['simbolo'], 0)
-            item['comisiones_base'] = descuento_total
-
-            # Calcular descuento adicional según tipo
-            if item['tipo'] in ["Acciones AR", "CEDEARs", "ETFs" , "Criptomonedas"]:
-                if item['valor_actual'] is not None:
-                    descuento_adicional = 0.008228 * item['valor_actual']
-                else:
-                    descuento_adicional = 0
-                item['descuentos'] = descuento_total + descuento_adicional
-            elif item['tipo'] == "Bonos AR":
-                if item['valor_actual'] is not None:
-                    descuento_adicional = 0.006171 * item['valor_actual']
-                else:
-                    descuento_adicional = 0
-                item['descuentos'] = descuento_total + descuento_adicional
-            else:  # Efectivo, Plazo Fijo
-                item['descuentos'] = 0
-
-            # Calcular rendimientos acumulados
-            item['rendimientos'] = rendimientos_por_simbolo.get(item['simbolo'], 0.0)
-
-            # Calcular resultado
-            item['resultado'] = item['diferencia_valor'] - item['descuentos'] + item['rendimientos']
-
-            # Acumular valor actual para calcular el total
-            # Valores convertidos por tipo de activo
-            tc_actual = self.get_fx_rate_for_date(datetime.now(), item.get("tipo", "")) or fx_rate
-            if tc_actual <= 0:
-                tc_actual = fx_rate
-            simbolo = item.get("simbolo", "")
-            tc_compra = fx_rate
-            if simbolo in tc_weighted_by_symbol and tc_weighted_amount.get(simbolo, 0) > 0:
-                tc_compra = tc_weighted_by_symbol[simbolo] / tc_weighted_amount[simbolo]
-            if tc_compra <= 0:
-                tc_compra = fx_rate
-
-            item["tc_compra"] = tc_compra
-            item["tc_actual"] = tc_actual
-
-            if item['tipo'] == "Efectivo":
-                valor_ars = self._safe_number(item.get('monto_ars', 0.0), 0.0)
-                valor_usd = self._safe_number(item.get('monto_usd', 0.0), 0.0)
-            else:
-                if moneda_item == "USD":
-                    valor_ars = self._safe_number(item['valor_actual'], 0.0) * tc_actual
-                    valor_usd = self._safe_number(item['valor_actual'], 0.0)
-                else:
-                    valor_ars = self._safe_number(item['valor_actual'], 0.0)
-                    valor_usd = (
-                        self._safe_number(item['valor_actual'], 0.0) / tc_actual
-                        if tc_actual
-                        else self._safe_number(item['valor_actual'], 0.0)
-                    )
-            item['valor_ars'] = valor_ars
-            item['valor_usd'] = valor_usd
-
-            total_valor_ars += valor_ars
-            total_valor_usd += valor_usd
-            if item['tipo'] in tipo_valores:
-                tipo_valores[item['tipo']] += valor_ars
-            else:
-                tipo_valores[item['tipo']] = valor_ars
-            total_valor_actual_usd += valor_usd
-
-        table_data = portfolio_data
-        total_assets_ars = total_valor_ars
-        if getattr(view, "is_user", False):
-            table_data = [p for p in portfolio_data if p.get('tipo') not in ("Efectivo", "Efectivo Líquido")]
-            total_assets_ars = sum(p.get('valor_ars', 0) for p in table_data)
-            total_valor_ars = total_assets_ars
-            total_valor_usd = sum(p.get('valor_usd', 0) for p in table_data)
-            tipo_valores = {}
-            for p in table_data:
-                tipo_valores[p['tipo']] = tipo_valores.get(p['tipo'], 0) + p.get('valor_ars', 0)
-
-        # Aplicar filtro de moneda si corresponde
+        # Cada vista es una proyección de la misma valuación
         filtro_moneda = getattr(view, "currency_filter_combo", None)
-        moneda_seleccionada = filtro_moneda.currentText() if filtro_moneda else "Todos"
-        if moneda_seleccionada != "Todos":
-            table_data = [p for p in table_data if p.get('moneda', 'ARS') == moneda_seleccionada]
-            # Recalcular categorías con el filtro aplicado
-            tipo_valores = {}
-            for p in table_data:
-                tipo_valores[p['tipo']] = tipo_valores.get(p['tipo'], 0) + p.get('valor_ars', 0)
-            total_valor_ars = sum(p.get('valor_ars', 0) for p in table_data)
-            total_valor_usd = sum(p.get('valor_usd', 0) for p in table_data)
-            total_valor = total_valor_usd if display_currency == "USD" else total_valor_ars
-        else:
-            total_valor = total_valor_usd if display_currency == "USD" else total_valor_ars
-
-        if getattr(view, "is_user", False) and getattr(view, "group_by", "tipo") == "tipo":
-            grouped = {}
-            passthrough = []
-            for item in table_data:
-                simbolo = item.get("simbolo")
-                if not simbolo:
-                    passthrough.append(item)
-                    continue
-                key = (item.get("tipo"), simbolo, item.get("moneda", "ARS"))
-                if key not in grouped:
-                    grouped[key] = {
-                        **item,
-                        "cantidad": 0.0,
-                        "valor_compra": 0.0,
-                        "valor_actual": 0.0,
-                        "valor_ars": 0.0,
-                        "valor_usd": 0.0,
-                        "descuentos": 0.0,
-                        "rendimientos": 0.0,
-                        "comisiones_base": 0.0,
-                        "_brokers": set(),
-                    }
-                g = grouped[key]
-                g["_brokers"].add(item.get("broker"))
-                g["cantidad"] += self._safe_number(item.get("cantidad", 0.0), 0.0)
-                g["valor_compra"] += self._safe_number(item.get("valor_compra", 0.0), 0.0)
-                g["valor_actual"] += self._safe_number(item.get("valor_actual", 0.0), 0.0)
-                g["valor_ars"] += self._safe_number(item.get("valor_ars", 0.0), 0.0)
-                g["valor_usd"] += self._safe_number(item.get("valor_usd", 0.0), 0.0)
-                g["descuentos"] += self._safe_number(item.get("descuentos", 0.0), 0.0)
-                g["rendimientos"] += self._safe_number(item.get("rendimientos", 0.0), 0.0)
-                g["comisiones_base"] += self._safe_number(item.get("comisiones_base", 0.0), 0.0)
-                if g.get("precio_actual") is None and item.get("precio_actual") is not None:
-                    g["precio_actual"] = item.get("precio_actual")
-                if g.get("variacion_diaria") is None and item.get("variacion_diaria") is not None:
-                    g["variacion_diaria"] = item.get("variacion_diaria")
-
-            aggregated = []
-            for g in grouped.values():
-                if g["cantidad"] > 0:
-                    g["precio_operacion_compra"] = g["valor_compra"] / g["cantidad"]
-                    g["precio_actual"] = g["valor_actual"] / g["cantidad"]
-                else:
-                    g["precio_operacion_compra"] = 0.0
-                g["diferencia_valor"] = g["valor_actual"] - g["valor_compra"]
-                g["resultado"] = g["diferencia_valor"] - g["descuentos"] + g["rendimientos"]
-                brokers = g.pop("_brokers", set())
-                g["broker"] = "Varios" if len(brokers) > 1 else next(iter(brokers), "")
-                aggregated.append(g)
-
-            table_data = aggregated + passthrough
-            tipo_valores = {}
-            for p in table_data:
-                tipo_valores[p['tipo']] = tipo_valores.get(p['tipo'], 0) + p.get('valor_ars', 0)
-            total_valor_ars = sum(p.get('valor_ars', 0) for p in table_data)
-            total_valor_usd = sum(p.get('valor_usd', 0) for p in table_data)
-            total_valor = total_valor_usd if display_currency == "USD" else total_valor_ars
+        projection = project_portfolio(
+            snapshot,
+            include_cash=not getattr(view, "is_user", False),
+            currency=filtro_moneda.currentText() if filtro_moneda else "Todos",
+            aggregate_by_symbol=getattr(view, "is_user", False) and getattr(view, "group_by", "tipo") == "tipo",
+            display_currency=display_currency,
+        )
+        table_data = projection.items
+        total_valor = projection.total_valor
+        total_valor_usd = projection.total_valor_usd
+        total_assets_ars = projection.total_assets_ars
 
         if getattr(view, "is_user", False):
             self.update_liquidity_section(view, total_assets_ars, fx_rate)
@@ -3026,13 +2708,8 @@ class PortfolioAppQt(QMainWindow):
                 valor_compra = self._safe_number(p.get("valor_compra", 0.0), 0.0)
                 valor_actual = self._safe_number(p.get("valor_actual", 0.0), 0.0)
                 moneda_item = p.get("moneda", "ARS")
-                tc_compra = fx_rate
-                simbolo = p.get("simbolo", "")
-                if simbolo in tc_weighted_by_symbol and tc_weighted_amount.get(simbolo, 0) > 0:
-                    tc_compra = tc_weighted_by_symbol[simbolo] / tc_weighted_amount[simbolo]
-                if tc_compra <= 0:
-                    tc_compra = fx_rate
-                tc_actual = self.get_fx_rate_for_date(datetime.now(), p.get("tipo", "")) or fx_rate
+                tc_compra = snapshot.tc_compra(p.get("simbolo", ""))
+                tc_actual = snapshot.tc_actual(p.get("tipo", ""))
 
                 if moneda_item == "USD":
                     valor_compra_ars = valor_compra * tc_compra
@@ -3147,7 +2824,6 @@ class PortfolioAppQt(QMainWindow):
                 if item.get("precio_actual") is None:
                     continue
                 moneda_item = item.get("moneda", "ARS")
-                simbolo = item.get("simbolo", "")
                 tc_compra = item.get("tc_compra", fx_rate) or fx_rate
                 if tc_compra <= 0:
                     tc_compra = fx_rate
@@ -3375,6 +3051,8 @@ class PortfolioAppQt(QMainWindow):
                     elif resultado_usd_val < 0:
                         view.portfolio_table.item(row_idx, 13).setForeground(QColor('red'))
 
+                self._mark_quote_age(view.portfolio_table.item(row_idx, 7), item)
+
                 row_idx += 1
 
         # Fila total
@@ -3572,19 +3250,26 @@ class PortfolioAppQt(QMainWindow):
     def create_journal_view(self, parent_widget):
         layout = QVBoxLayout(parent_widget)
 
-        # Tabla
-        self.journal_table = QTableWidget()
-        self.journal_table.setColumnCount(21)
-        self.journal_table.setHorizontalHeaderLabels([
-            "Fecha", "Tipo", "Operación", "Símbolo", "Detalle", "Plazo",
-            "Broker", "Cantidad", "Precio", "Dividendos", "Total", "Comisión",
-            "IVA", "Derechos", "IVA Der", "Desc Total",
-            "Costo", "Ingreso", "Balance", "Moneda", "TC USD/ARS"
-        ])
+        # Filtro
+        self.journal_filter = QLineEdit()
+        self.journal_filter.setPlaceholderText("Filtrar operaciones...")
+        layout.addWidget(self.journal_filter)
+
+        # Tabla: modelo por columnas con carga incremental, filtro por proxy
+        self.journal_model = JournalTableModel(self)
+        self.journal_proxy = JournalFilterProxyModel(self)
+        self.journal_proxy.setSourceModel(self.journal_model)
+        self.journal_filter.textChanged.connect(self.journal_proxy.set_filter_text)
+
+        self.journal_table = QTableView()
+        self.journal_table.setModel(self.journal_proxy)
         self.journal_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.journal_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.journal_table.setSortingEnabled(True)
         self.journal_table.verticalHeader().setVisible(False)
         self.journal_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.journal_table.setSizeAdjustPolicy(QAbstractScrollArea.SizeAdjustPolicy.AdjustToContents)
+        self.journal_table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.journal_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
 
         layout.addWidget(self.journal_table)
 
@@ -3604,90 +3289,42 @@ class PortfolioAppQt(QMainWindow):
         layout.addWidget(button_frame)
 
     def load_journal(self):
-        self.journal_table.setRowCount(0)
-
-        rows = fetch_journal()
-        headers = [
-            "id", "fecha", "tipo", "tipo_operacion", "simbolo", "detalle", "plazo",
-            "cantidad", "precio", "Dividendos", "total_sin_desc", "comision",
-            "iva_21", "derechos", "iva_derechos", "total_descuentos",
-            "costo_total", "ingreso_total", "balance", "broker", "moneda", "tc_usd_ars"
-        ]
-        self.journal_table.setColumnCount(len(headers)-1)  # omit id in view
-        self.journal_table.setHorizontalHeaderLabels(headers[1:])
-        numeric_columns = {
-            "cantidad", "precio", "rendimiento", "total_sin_desc", "comision",
-            "iva_21", "derechos", "iva_derechos", "total_descuentos",
-            "costo_total", "ingreso_total", "balance", "tc_usd_ars"
-        }
-
-        for row_idx, row in enumerate(rows):
-            self.journal_table.insertRow(row_idx)
-            for col_idx, key in enumerate(headers[1:]):
-                value = row.get(key, "")
-                if key in numeric_columns:
-                    try:
-                        num = float(value)
-                        item = QTableWidgetItem(f"${num:,.2f}")
-                    except:
-                        item = QTableWidgetItem(str(value))
-                else:
-                    item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                self.journal_table.setItem(row_idx, col_idx, item)
+        self.journal_model.set_rows(fetch_journal())
+        self.journal_proxy.fill_view()
 
     def eliminar_operacion(self):
-        selected_items = self.journal_table.selectedItems()
-        if not selected_items:
+        selected_rows = self.journal_table.selectionModel().selectedRows()
+        if not selected_rows:
             QMessageBox.warning(self, "Advertencia", "Seleccione una operación para eliminar")
             return
 
-        if QMessageBox.question(self, "Confirmar", "¿Está seguro de eliminar la operación seleccionada?") == QMessageBox.StandardButton.Yes:
-            selected_row = selected_items[0].row()
-            # Obtener id desde la tabla (no visible). Suponemos que las filas están en orden y fetch_journal devuelve ids crecientes
-            rows = fetch_journal()
-            if selected_row < len(rows):
-                row_id = rows[selected_row].get('id')
-                if row_id is not None:
-                    delete_journal_row_by_id(row_id)
-
-            # Recalcular compras pendientes y portafolio
-            self.load_compras_pendientes()
-            self.recalcular_portfolio()
-            self.load_journal()
-            self.refresh_portfolios()
-            self.load_finished_operations()
+        if len(selected_rows) == 1:
+            pregunta = "¿Está seguro de eliminar la operación seleccionada?"
+        else:
+            pregunta = f"¿Está seguro de eliminar las {len(selected_rows)} operaciones seleccionadas?"
+        if QMessageBox.question(self, "Confirmar", pregunta) == QMessageBox.StandardButton.Yes:
+            row_ids = [self.journal_proxy.row_id(index.row()) for index in selected_rows]
+            row_ids = [row_id for row_id in row_ids if row_id is not None]
+            if not row_ids:
+                return
+            delete_journal_rows(row_ids)
+            self.journal_model.remove_ids(row_ids)
+            self.journal_proxy.fill_view()
 
-            # Actualizar pestaña de Análisis
-            self.analysis_tab.load_portfolio()
-            self.analysis_tab.load_saved_data()
-            self.analysis_tab.sort_tables()
+            # Sólo se rebobinan y reescriben las posiciones tocadas por el borrado
+            afectadas = self.lot_ledger.remove_many(row_ids)
+            replace_portfolio_positions(afectadas, self.lot_ledger.portfolio_rows(afectadas))
+            # El Libro Diario ya quedó al día; el resto se refresca al mostrarse
+            self.refresh_bus.publish("journal", handled=("journal",))
 
     def load_compras_pendientes(self):
-        self.compras_pendientes = {}
-        rows = fetch_journal()
-        for row in rows:
-            tipo_op = row.get("tipo_operacion", "")
-            simbolo = row.get("simbolo", "")
-            try:
-                cantidad = float(row.get("cantidad", 0) or 0)
-                precio = float(row.get("precio", 0) or 0)
-            except:
-                continue
-            if tipo_op == "Compra":
-                if simbolo not in self.compras_pendientes:
-                    self.compras_pendientes[simbolo] = deque()
-                self.compras_pendientes[simbolo].append((cantidad, precio))
-            elif tipo_op == "Venta":
-                cantidad_a_vender = cantidad
-                while cantidad_a_vender > 0 and self.compras_pendientes.get(simbolo):
-                    primera_compra = self.compras_pendientes[simbolo][0]
-                    if primera_compra[0] <= cantidad_a_vender:
-                        cantidad_a_vender -= primera_compra[0]
-                        self.compras_pendientes[simbolo].popleft()
-                    else:
-                        self.compras_pendientes[simbolo][0] = (primera_compra[0] - cantidad_a_vender, primera_compra[1])
-                        cantidad_a_vender = 0
+        """Reconstruye el libro de lotes FIFO desde el journal."""
+        try:
+            journal_rows = fetch_journal()
+        except Exception as e:
+            print(f"Error leyendo journal: {e}")
+            journal_rows = []
+        self.lot_ledger = LotLedger.from_rows(journal_rows)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
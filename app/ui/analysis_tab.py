@@ -16,12 +16,15 @@ from PyQt6.QtWidgets import (
     QStyledItemDelegate,
 )
 from datetime import datetime
-from PyQt6.QtCore import Qt, QUrl
+from PyQt6.QtCore import Qt, QUrl, QTimer, QCoreApplication
 from PyQt6.QtGui import QColor, QBrush
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineSettings
 
-from db_utils import fetch_analysis, save_analysis, fetch_journal
+from db_utils import fetch_analysis, upsert_analysis_rows, delete_analysis_rows, fetch_journal
+
+# Espera desde el último cambio antes de escribir en la base
+SAVE_DEBOUNCE_MS = 500
 
 
 class ColorDelegate(QStyledItemDelegate):
@@ -47,6 +50,20 @@ class AnalysisTab(QWidget):
         self.setObjectName("AnalysisTab")
         self.current_sort_criteria = "Simbolo"  # Criterio de ordenamiento por defecto
 
+        # Filas modificadas ({id(item de símbolo): (item, tipo)}; el item sigue a
+        # su fila al reordenar y QTableWidgetItem no es hasheable) e ids
+        # borrados, pendientes de guardar
+        self._dirty = {}
+        self._deleted_ids = set()
+        self._tracking = True
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(SAVE_DEBOUNCE_MS)
+        self._save_timer.timeout.connect(self.save_data)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.save_data)
+
         layout = QVBoxLayout(self)
 
         sort_control_layout = QHBoxLayout()
@@ -90,24 +107,10 @@ class AnalysisTab(QWidget):
 
     def detect_fx_rate(self):
         fx_rate = 1.0
-        if self.df_mercado is not None:
-            symbol_col = next((c for c in ["Símbolo.1", "Símbolo", "Simbolo", "Symbol", "Ticker"] if c in self.df_mercado.columns), None)
-            price_col = next((c for c in ["Último Operado", "Ultimo Operado", "Precio", "Close"] if c in self.df_mercado.columns), None)
-            if symbol_col and price_col:
-                try:
-                    al30 = self.df_mercado[self.df_mercado[symbol_col] == "AL30"].iloc[0][price_col]
-                    al30d = self.df_mercado[self.df_mercado[symbol_col] == "AL30D"].iloc[0][price_col]
-                    if isinstance(al30, str):
-                        al30 = al30.replace('.', '').replace(',', '.')
-                    if isinstance(al30d, str):
-                        al30d = al30d.replace('.', '').replace(',', '.')
-                    al30 = float(al30)
-                    al30d = float(al30d)
-                    if al30d != 0:
-                        fx_rate = al30 / al30d
-                except Exception:
-                    pass
-        self.default_fx_rate = fx_rate if fx_rate > 0 else 1.0
+        market_quotes = getattr(self.parent_app, "market_quotes", None)
+        if market_quotes is not None:
+            fx_rate = market_quotes.mep_rate(fx_rate)
+        self.default_fx_rate = fx_rate
         return self.default_fx_rate
 
     def load_portfolio(self):
@@ -121,7 +124,34 @@ class AnalysisTab(QWidget):
         except Exception as e:
             print(f"Error cargando portfolio: {e}")
 
+    def refresh_portfolio_highlight(self):
+        """Recalcula los símbolos operados y repinta sólo las filas que cambiaron."""
+        previous = getattr(self, "portfolio_symbols", set())
+        self.load_portfolio()
+        changed = previous ^ self.portfolio_symbols
+        if not changed:
+            return
+        self._tracking = False
+        try:
+            for tipo in ["bonos", "acciones", "cedears", "etfs", "cripto", "fci"]:
+                table = getattr(self, f"table_{tipo}")
+                for symbol in changed:
+                    brush = QBrush(QColor("#FFA500")) if symbol in self.portfolio_symbols else QBrush()
+                    for row in self._find_rows(table, symbol):
+                        for col in (0, 1, 3, 4, 5):
+                            item = table.item(row, col)
+                            if item is not None:
+                                item.setBackground(brush)
+        finally:
+            self._tracking = True
+
     def load_saved_data(self):
+        if self._dirty or self._deleted_ids:
+            self.save_data()
+            if self._dirty or self._deleted_ids:
+                # El guardado falló: recargar borraría los cambios que siguen en la tabla
+                return
+        self._tracking = False
         try:
             rows = fetch_analysis()
             for tipo in ["bonos", "acciones", "cedears", "etfs", "cripto", "fci"]:
@@ -141,6 +171,7 @@ class AnalysisTab(QWidget):
                     table.insertRow(row_position)
 
                     symbol_item = QTableWidgetItem(symbol)
+                    symbol_item.setData(Qt.ItemDataRole.UserRole, row.get('id'))
                     desc_item = QTableWidgetItem(desc)
 
                     revision_combo = QComboBox()
@@ -155,7 +186,7 @@ class AnalysisTab(QWidget):
                     self.update_combo_color(revision_combo)
 
                     revision_combo.currentIndexChanged.connect(
-                        lambda _, r=row_position, t=tipo: self.on_revision_changed(r, t)
+                        lambda _, c=revision_combo, t=tipo: self.on_revision_changed(c, t)
                     )
 
                     ultima_item = QTableWidgetItem(ultima_revision)
@@ -188,6 +219,8 @@ class AnalysisTab(QWidget):
                 self.sort_table_data(table)
         except Exception as e:
             print(f"Error cargando datos: {e}")
+        finally:
+            self._tracking = True
 
     def update_combo_color(self, combo):
         text = combo.currentText()
@@ -206,41 +239,76 @@ class AnalysisTab(QWidget):
 
         combo.setStyleSheet(f"background-color: {color.name()};")
 
-    def save_data(self):
-        try:
-            data = []
-            tipos = ["bonos", "acciones", "cedears", "etfs", "cripto", "fci"]
-
-            for tipo in tipos:
-                table = getattr(self, f"table_{tipo}")
-
-                for row in range(table.rowCount()):
-                    symbol_item = table.item(row, 0)
-                    desc_item = table.item(row, 1)
-                    ultima_revision_item = table.item(row, 3)
-                    comentario_item = table.item(row, 4)
-
-                    symbol = symbol_item.text() if symbol_item is not None else ""
-                    desc = desc_item.text() if desc_item is not None else ""
-                    ultima_revision = ultima_revision_item.text() if ultima_revision_item is not None else ""
-                    comentario = comentario_item.text() if comentario_item is not None else ""
-
-                    revision_combo = table.cellWidget(row, 2)
-                    revision = revision_combo.currentText() if revision_combo is not None else ""
-
-                    data.append({
-                        'tipo': tipo.upper(),
-                        'simbolo': symbol,
-                        'descripcion': desc,
-                        'revision': revision,
-                        'ultima_revision': ultima_revision,
-                        'comentario': comentario
-                    })
+    def _row_data(self, table, row, tipo):
+        symbol_item = table.item(row, 0)
+        desc_item = table.item(row, 1)
+        ultima_revision_item = table.item(row, 3)
+        comentario_item = table.item(row, 4)
+        revision_combo = table.cellWidget(row, 2)
+        return {
+            'id': symbol_item.data(Qt.ItemDataRole.UserRole) if symbol_item is not None else None,
+            'tipo': tipo.upper(),
+            'simbolo': symbol_item.text() if symbol_item is not None else "",
+            'descripcion': desc_item.text() if desc_item is not None else "",
+            'revision': revision_combo.currentText() if revision_combo is not None else "",
+            'ultima_revision': ultima_revision_item.text() if ultima_revision_item is not None else "",
+            'comentario': comentario_item.text() if comentario_item is not None else ""
+        }
+
+    def _find_rows(self, table, symbol):
+        return [item.row() for item in table.findItems(symbol, Qt.MatchFlag.MatchExactly) if item.column() == 0]
+
+    def mark_dirty(self, tipo, row):
+        """Marca una fila para guardar y reprograma la escritura diferida."""
+        if not self._tracking:
+            return
+        symbol_item = getattr(self, f"table_{tipo}").item(row, 0)
+        if symbol_item is None:
+            return
+        self._dirty[id(symbol_item)] = (symbol_item, tipo)
+        self._save_timer.start()
 
-            save_analysis(data)
+    def on_item_changed(self, item, tipo):
+        if item.column() in (0, 1, 4):
+            self.mark_dirty(tipo, item.row())
 
+    def save_data(self):
+        """Escribe sólo las filas modificadas y los borrados pendientes.
+
+        Si la escritura falla, lo pendiente vuelve a la cola para el próximo
+        guardado.
+        """
+        self._save_timer.stop()
+        dirty, self._dirty = self._dirty, {}
+        deleted, self._deleted_ids = self._deleted_ids, set()
+        if not dirty and not deleted:
+            return
+        pending = []
+        for symbol_item, tipo in dirty.values():
+            try:
+                row = symbol_item.row()
+            except RuntimeError:
+                continue  # la fila ya no existe
+            if row >= 0:
+                pending.append((symbol_item, self._row_data(getattr(self, f"table_{tipo}"), row, tipo)))
+        try:
+            # Primero los borrados: si después falla el upsert, repetirlos no cambia nada
+            delete_analysis_rows(deleted)
+            ids = upsert_analysis_rows([data for _, data in pending])
         except Exception as e:
             print(f"Error guardando datos: {e}")
+            for key, entry in dirty.items():
+                self._dirty.setdefault(key, entry)
+            self._deleted_ids |= deleted
+            return
+
+        # Las filas nuevas quedan asociadas a su id para los próximos guardados
+        self._tracking = False
+        try:
+            for (symbol_item, _), row_id in zip(pending, ids):
+                symbol_item.setData(Qt.ItemDataRole.UserRole, row_id)
+        finally:
+            self._tracking = True
 
     def init_tab(self, tab, tipo):
         tipo_lower = tipo.lower()
@@ -287,6 +355,7 @@ class AnalysisTab(QWidget):
         table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         table.cellClicked.connect(lambda row, col, tipo=tipo_lower, table=table: self.on_cell_clicked(row, col, tipo, table))
+        table.itemChanged.connect(lambda item, tipo=tipo_lower: self.on_item_changed(item, tipo))
         left_layout.addWidget(table)
 
         right_widget = QWidget()
@@ -334,7 +403,7 @@ class AnalysisTab(QWidget):
         revision_combo.addItems(["Muy Alta", "Alta", "Indeciso", "Baja", "Muy Baja"])
         delegate = ColorDelegate()
         revision_combo.setItemDelegate(delegate)
-        revision_combo.currentIndexChanged.connect(lambda _, row=row_position, tipo=tipo: self.on_revision_changed(row, tipo))
+        revision_combo.currentIndexChanged.connect(lambda _, combo=revision_combo, tipo=tipo: self.on_revision_changed(combo, tipo))
         self.update_combo_color(revision_combo)
 
         ultima_item = QTableWidgetItem("")
@@ -357,14 +426,21 @@ class AnalysisTab(QWidget):
         table.setItem(row_position, 4, comentario_item)
         table.setItem(row_position, 5, chart_item)
 
+        self.mark_dirty(tipo, row_position)
         self.sort_tables()
 
     def delete_selected(self, tipo):
         table = getattr(self, f"table_{tipo}")
         selected_rows = sorted({index.row() for index in table.selectedIndexes()}, reverse=True)
         for row in selected_rows:
+            symbol_item = table.item(row, 0)
+            if symbol_item is not None:
+                self._dirty.pop(id(symbol_item), None)
+                row_id = symbol_item.data(Qt.ItemDataRole.UserRole)
+                if row_id is not None:
+                    self._deleted_ids.add(row_id)
             table.removeRow(row)
-        self.save_data()
+        self._save_timer.start()
 
     def on_cell_clicked(self, row, column, tipo, table):
         if column == 5:
@@ -449,10 +525,11 @@ class AnalysisTab(QWidget):
             table.viewport().update()
         self.save_data()
 
-    def on_revision_changed(self, row, tipo):
+    def on_revision_changed(self, combo, tipo):
         table = getattr(self, f"table_{tipo}")
-        combo = table.cellWidget(row, 2)
-        if combo:
+        # La fila se busca al momento: el orden de la tabla puede haber cambiado
+        row = table.indexAt(combo.pos()).row()
+        if row >= 0:
             self.update_combo_color(combo)
             if table.item(row, 3) is None:
                 now = datetime.now().strftime("%Y-%m-%d")
@@ -461,7 +538,7 @@ class AnalysisTab(QWidget):
                 table.setItem(row, 3, ultima_item)
             else:
                 table.item(row, 3).setText(datetime.now().strftime("%Y-%m-%d"))
-            self.save_data()
+            self.mark_dirty(tipo, row)
             symbol_item = table.item(row, 0)
             if symbol_item:
                 self.show_chart(tipo, symbol_item.text())
@@ -0,0 +1,225 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt
+
+# (clave en la base, encabezado visible)
+JOURNAL_COLUMNS = [
+    ("fecha", "Fecha"),
+    ("tipo", "Tipo"),
+    ("tipo_operacion", "Operación"),
+    ("simbolo", "Símbolo"),
+    ("detalle", "Detalle"),
+    ("plazo", "Plazo"),
+    ("cantidad", "Cantidad"),
+    ("precio", "Precio"),
+    ("rendimiento", "Dividendos"),
+    ("total_sin_desc", "Total"),
+    ("comision", "Comisión"),
+    ("iva_21", "IVA"),
+    ("derechos", "Derechos"),
+    ("iva_derechos", "IVA Der"),
+    ("total_descuentos", "Desc Total"),
+    ("costo_total", "Costo"),
+    ("ingreso_total", "Ingreso"),
+    ("balance", "Balance"),
+    ("broker", "Broker"),
+    ("moneda", "Moneda"),
+    ("tc_usd_ars", "TC USD/ARS"),
+]
+
+NUMERIC_COLUMNS = {
+    "cantidad", "precio", "rendimiento", "total_sin_desc", "comision",
+    "iva_21", "derechos", "iva_derechos", "total_descuentos",
+    "costo_total", "ingreso_total", "balance", "tc_usd_ars"
+}
+
+# Filas que se agregan a la vista por cada fetchMore
+FETCH_BATCH = 500
+
+
+def _format_value(key, value):
+    if value is None:
+        return ""
+    if key in NUMERIC_COLUMNS:
+        try:
+            return f"${float(value):,.2f}"
+        except (TypeError, ValueError):
+            pass
+    return str(value)
+
+
+def _sort_key(key):
+    if key in NUMERIC_COLUMNS:
+        def numeric(value):
+            try:
+                return (0, float(value))
+            except (TypeError, ValueError):
+                return (1, 0.0)
+        return numeric
+    return lambda value: (value is None, "" if value is None else str(value).lower())
+
+
+class JournalTableModel(QAbstractTableModel):
+    """Modelo de solo lectura del Libro Diario sobre un buffer por columnas.
+
+    Las filas se guardan como una lista de valores por columna y se formatean
+    recién en ``data()``; la vista recibe las filas de a ``batch_size`` con
+    ``canFetchMore``/``fetchMore``. El orden se aplica sobre todo el buffer
+    (una permutación de índices), no sólo sobre las filas ya entregadas.
+    """
+
+    def __init__(self, parent=None, batch_size=FETCH_BATCH):
+        super().__init__(parent)
+        self.batch_size = batch_size
+        self._keys = [key for key, _ in JOURNAL_COLUMNS]
+        self._headers = [label for _, label in JOURNAL_COLUMNS]
+        self._ids = []
+        self._columns = [[] for _ in self._keys]
+        self._order = []
+        self._loaded = 0
+        self._sort_column = -1
+        self._sort_order = Qt.SortOrder.AscendingOrder
+
+    def set_rows(self, rows):
+        """Reemplaza el contenido con las filas del journal (dicts)."""
+        self.beginResetModel()
+        self._ids = [row.get("id") for row in rows]
+        self._columns = [[row.get(key) for row in rows] for key in self._keys]
+        self._order = self._sorted_order(range(len(self._ids)))
+        self._loaded = min(self.batch_size, len(self._order))
+        self.endResetModel()
+
+    def remove_ids(self, row_ids):
+        """Quita filas por id sin recargar el buffer ni mover el resto de la vista."""
+        row_ids = set(row_ids)
+        positions = [pos for pos, i in enumerate(self._order) if self._ids[i] in row_ids]
+        # Tramos contiguos, de atrás hacia adelante para no correr las posiciones
+        runs = []
+        for pos in positions:
+            if runs and runs[-1][1] == pos - 1:
+                runs[-1][1] = pos
+            else:
+                runs.append([pos, pos])
+        for first, last in reversed(runs):
+            visible_last = min(last, self._loaded - 1)
+            if first <= visible_last:
+                self.beginRemoveRows(QModelIndex(), first, visible_last)
+                del self._order[first:last + 1]
+                self._loaded -= visible_last - first + 1
+                self.endRemoveRows()
+            else:
+                del self._order[first:last + 1]
+
+    def row_id(self, row):
+        """Id en la base de la fila visible ``row`` del modelo."""
+        return self._ids[self._order[row]]
+
+    def raw_value(self, row, column):
+        return self._columns[column][self._order[row]]
+
+    def total_rows(self):
+        return len(self._order)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._keys)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        value = self._columns[column][self._order[index.row()]]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return _format_value(self._keys[column], value)
+        if role == Qt.ItemDataRole.UserRole:
+            return value
+        if role == Qt.ItemDataRole.TextAlignmentRole and self._keys[column] in NUMERIC_COLUMNS:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._order)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.batch_size, len(self._order) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """Ordena el buffer completo; ``column < 0`` vuelve al orden del journal."""
+        self._sort_column = column
+        self._sort_order = order
+        self.beginResetModel()
+        self._order = self._sorted_order(self._order)
+        self.endResetModel()
+
+    def _sorted_order(self, rows):
+        # Los índices crecientes del buffer son el orden original del journal
+        order = sorted(rows)
+        if 0 <= self._sort_column < len(self._keys):
+            values = self._columns[self._sort_column]
+            key = _sort_key(self._keys[self._sort_column])
+            order.sort(
+                key=lambda i: key(values[i]),
+                reverse=self._sort_order == Qt.SortOrder.DescendingOrder,
+            )
+        return order
+
+
+class JournalFilterProxyModel(QSortFilterProxyModel):
+    """Filtra el Libro Diario por texto y delega el orden al modelo fuente.
+
+    El orden lo resuelve ``JournalTableModel`` sobre todas las filas; si lo
+    hiciera el proxy sólo ordenaría las filas ya entregadas por fetchMore.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._filter_text = ""
+
+    def set_filter_text(self, text):
+        self._filter_text = text.strip().lower()
+        self.invalidateFilter()
+        self.fill_view()
+
+    def fill_view(self):
+        """Pide más filas al modelo fuente hasta completar un lote filtrado."""
+        source = self.sourceModel()
+        if source is None:
+            return
+        while self.rowCount() < source.batch_size and source.canFetchMore():
+            source.fetchMore()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._filter_text:
+            return True
+        source = self.sourceModel()
+        for column in range(source.columnCount()):
+            value = source.raw_value(source_row, column)
+            if value is not None and self._filter_text in str(value).lower():
+                return True
+        return False
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sourceModel().sort(column, order)
+        self.fill_view()
+
+    def row_id(self, row):
+        """Id en la base de la fila ``row`` de la vista filtrada."""
+        source_index = self.mapToSource(self.index(row, 0))
+        return self.sourceModel().row_id(source_index.row())
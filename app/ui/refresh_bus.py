@@ -0,0 +1,61 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# Ventana en la que se agrupan los avisos de cambio antes de refrescar
+REFRESH_DEBOUNCE_MS = 150
+
+
+class RefreshBus(QObject):
+    """Bus de avisos de cambio de datos para las vistas de la aplicación.
+
+    Cada vista se registra con los temas de los que depende ("journal",
+    "valuation", ...). ``publish`` sólo la marca como desactualizada; las
+    vistas visibles se recalculan una vez pasada la ventana de debounce y las
+    ocultas recién cuando vuelven a mostrarse (``refresh_visible``).
+    """
+
+    # Permite publicar desde hilos de trabajo: la conexión es encolada
+    posted = pyqtSignal(tuple)
+
+    def __init__(self, parent=None, debounce_ms=REFRESH_DEBOUNCE_MS):
+        super().__init__(parent)
+        self._views = {}
+        self._stale = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self.refresh_visible)
+        self.posted.connect(lambda topics: self.publish(*topics))
+
+    def register(self, name, refresh, is_visible, topics):
+        """Registra una vista; queda desactualizada hasta su primer refresco."""
+        self._views[name] = (refresh, is_visible, frozenset(topics))
+        self._stale.add(name)
+
+    def publish(self, *topics, handled=()):
+        """Marca las vistas que dependen de ``topics``, salvo las de ``handled``."""
+        topics = set(topics)
+        for name, (_, _, view_topics) in self._views.items():
+            if name not in handled and view_topics & topics:
+                self._stale.add(name)
+        if self._stale:
+            self._timer.start()
+
+    def post(self, *topics):
+        """Como ``publish``, pero seguro de llamar fuera del hilo de la UI."""
+        self.posted.emit(topics)
+
+    def is_stale(self, name):
+        return name in self._stale
+
+    def refresh_visible(self):
+        """Recalcula ahora las vistas desactualizadas que están a la vista."""
+        self._timer.stop()
+        for name in list(self._stale):
+            refresh, is_visible, _ = self._views[name]
+            if not is_visible():
+                continue
+            self._stale.discard(name)
+            try:
+                refresh()
+            except Exception as e:
+                print(f"Error refrescando {name}: {e}")
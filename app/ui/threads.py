@@ -16,3 +16,20 @@ class DownloadThread(QThread):
             self.finished.emit(success, message)
         except Exception as e:
             self.finished.emit(False, f"Error: {str(e)}")
+
+
+class SnapshotThread(QThread):
+    """Ejecuta ``build`` fuera del hilo de la UI y entrega el resultado por señal."""
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, build):
+        super().__init__()
+        self.build = build
+
+    def run(self):
+        try:
+            self.finished.emit(self.build())
+        except Exception as e:
+            self.failed.emit(f"Error: {str(e)}")
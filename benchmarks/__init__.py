@@ -0,0 +1 @@
+"""Benchmarks reproducibles de las rutas de cálculo más pesadas."""
@@ -0,0 +1,84 @@
+"""Benchmark de latencia por llamada de db_utils.get_conn.
+
+Compara abrir y cerrar una conexión en cada consulta (el esquema anterior)
+contra la conexión por hilo reutilizada, sobre una base temporal con
+``fx_rates`` y ``crypto_prices`` poblados.
+
+Uso: python -m benchmarks.bench_db_connections [llamadas]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import db_utils
+
+
+def populate(n_days: int = 2_000) -> None:
+    with db_utils.get_conn() as conn:
+        conn.executescript(db_utils.SCHEMA)
+        start = date(2019, 1, 1)
+        conn.executemany(
+            "INSERT INTO fx_rates (fecha, tipo, fuente, compra, venta) VALUES (?, ?, ?, ?, ?)",
+            [
+                ((start + timedelta(days=i)).isoformat(), tipo, "dolarhoy", 100.0 + i, 101.0 + i)
+                for i in range(n_days)
+                for tipo in ("mep", "ccl")
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO crypto_prices (simbolo, price_usd, change_24h, updated_at) VALUES (?, ?, ?, ?)",
+            [(f"C{i:03d}", 1.0 + i, 0.0, "2024-01-01 00:00:00") for i in range(200)],
+        )
+        conn.commit()
+
+
+@contextmanager
+def legacy_get_conn():
+    """get_conn anterior: una conexión nueva por llamada."""
+    conn = sqlite3.connect(db_utils.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _query(get_conn, i: int) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            "SELECT compra, venta FROM fx_rates WHERE fecha = ? AND tipo = ? AND fuente = ?",
+            ((date(2019, 1, 1) + timedelta(days=i % 2_000)).isoformat(), "mep", "dolarhoy"),
+        ).fetchone()
+        conn.execute(
+            "SELECT price_usd FROM crypto_prices WHERE simbolo = ?",
+            (f"C{i % 200:03d}",),
+        ).fetchone()
+
+
+def _per_call(get_conn, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        _query(get_conn, i)
+    return (time.perf_counter() - start) / calls
+
+
+def main(calls: int = 20_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = os.path.join(tmp, "bench.db")
+        populate()
+        t_old = _per_call(legacy_get_conn, calls)
+        t_new = _per_call(db_utils.get_conn, calls)
+        db_utils.close_all_connections()
+    print(f"Llamadas: {calls:,}")
+    print(f"Conexión por llamada: {t_old * 1e6:8.1f} us/llamada")
+    print(f"Conexión por hilo:    {t_new * 1e6:8.1f} us/llamada")
+    if t_new > 0:
+        print(f"Speedup: x{t_old / t_new:,.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
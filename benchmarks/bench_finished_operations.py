@@ -0,0 +1,127 @@
+"""Benchmark de compute_finished_operations sobre un journal sintético.
+
+Compara el barrido cronológico actual contra el reparto de rendimientos
+anterior (dos pasadas sobre todas las compras del símbolo por cada cupón).
+
+Uso: python -m benchmarks.bench_finished_operations [filas]
+"""
+import random
+import sys
+import time
+from collections import deque
+from datetime import date, timedelta
+
+from services.portfolio import _to_float, compute_finished_operations
+
+
+def build_journal(n_rows: int = 50_000, n_symbols: int = 40, seed: int = 7) -> list:
+    """Journal con bonos de cupón mensual: ~40% compras, ~20% ventas, ~40% cupones."""
+    rng = random.Random(seed)
+    holdings = {}
+    rows = []
+    day = date(2019, 1, 1)
+    per_day = max(1, n_rows // (365 * 6))
+    for i in range(n_rows):
+        if i % per_day == 0:
+            day += timedelta(days=1)
+        simbolo = f"BONO{rng.randrange(n_symbols):02d}"
+        held = holdings.get(simbolo, 0)
+        r = rng.random()
+        row = {
+            "fecha": day.isoformat(),
+            "tipo": "Bonos AR",
+            "simbolo": simbolo,
+            "detalle": "",
+            "cantidad": 0.0,
+            "precio": 0.0,
+            "rendimiento": 0.0,
+            "total_descuentos": 0.0,
+        }
+        if r < 0.4 and held > 0:
+            row["tipo_operacion"] = "Rendimiento"
+            row["rendimiento"] = round(rng.uniform(1, 50), 2)
+            row["total_descuentos"] = round(row["rendimiento"] * 0.01, 2)
+        elif r < 0.6 and held > 0:
+            cantidad = float(rng.randint(1, int(held)))
+            holdings[simbolo] = held - cantidad
+            row.update(tipo_operacion="Venta", cantidad=cantidad, precio=rng.uniform(50, 120))
+            row["total_descuentos"] = round(cantidad * row["precio"] * 0.006, 2)
+        else:
+            cantidad = float(rng.randint(1, 200))
+            holdings[simbolo] = held + cantidad
+            row.update(tipo_operacion="Compra", cantidad=cantidad, precio=rng.uniform(50, 120))
+            row["total_descuentos"] = round(cantidad * row["precio"] * 0.006, 2)
+        rows.append(row)
+    return rows
+
+
+def legacy_finished_operations(journal_rows) -> int:
+    """Reparto de rendimientos previo: O(cupones x compras) por símbolo."""
+    compras = {}
+    rendimientos = {}
+    ventas = []
+    for row in sorted(journal_rows, key=lambda r: r["fecha"]):
+        tipo_op = row["tipo_operacion"]
+        simbolo = row["simbolo"]
+        if tipo_op == "Compra":
+            compras.setdefault(simbolo, deque()).append(
+                {
+                    "cantidad": _to_float(row["cantidad"]),
+                    "precio": _to_float(row["precio"]),
+                    "fecha": row["fecha"],
+                    "descuentos": _to_float(row["total_descuentos"]),
+                    "rendimiento": 0.0,
+                }
+            )
+        elif tipo_op == "Rendimiento":
+            rendimientos.setdefault(simbolo, deque()).append(
+                {"fecha": row["fecha"], "valor": _to_float(row["rendimiento"]), "descuentos": _to_float(row["total_descuentos"])}
+            )
+        elif tipo_op == "Venta":
+            ventas.append(row)
+
+    for simbolo, rends in rendimientos.items():
+        for rend in rends:
+            tenencia_total = sum(c["cantidad"] for c in compras[simbolo] if c["fecha"] <= rend["fecha"])
+            if tenencia_total == 0:
+                continue
+            for compra in compras[simbolo]:
+                if compra["fecha"] <= rend["fecha"]:
+                    proporcion = compra["cantidad"] / tenencia_total
+                    compra["rendimiento"] += rend["valor"] * proporcion
+                    compra["descuentos"] += rend["descuentos"] * proporcion
+
+    cerradas = 0
+    for venta in ventas:
+        cola = compras.get(venta["simbolo"])
+        restante = _to_float(venta["cantidad"])
+        while restante > 0 and cola:
+            usada = min(cola[0]["cantidad"], restante)
+            cola[0]["cantidad"] -= usada
+            restante -= usada
+            if cola[0]["cantidad"] <= 0:
+                cola.popleft()
+        if restante <= 0:
+            cerradas += 1
+    return cerradas
+
+
+def _timeit(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(n_rows: int = 50_000) -> None:
+    journal = build_journal(n_rows)
+    t_new, ops = _timeit(compute_finished_operations, journal)
+    t_old, cerradas = _timeit(legacy_finished_operations, journal)
+    print(f"Filas journal: {len(journal):,}")
+    print(f"Barrido cronológico: {t_new:8.3f}s ({len(ops):,} operaciones cerradas)")
+    print(f"Reparto anterior:    {t_old:8.3f}s ({cerradas:,} operaciones cerradas)")
+    if t_new > 0:
+        print(f"Speedup: x{t_old / t_new:,.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
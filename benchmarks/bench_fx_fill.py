@@ -0,0 +1,84 @@
+"""Benchmark del post-proceso de series FX del backfill (parseo, relleno y filas).
+
+Compara el recorrido día por día con ``strftime`` (el esquema anterior)
+contra ``services.fx`` sobre respuestas sintéticas de Ambito: cuatro series
+desde 2020 con fines de semana y feriados faltantes.
+
+Uso: python -m benchmarks.bench_fx_fill [años]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from services.fx import fill_missing_dates, fx_rows, parse_ambito_series
+
+TIPOS = ("mep", "ccl", "blue", "cripto")
+
+
+def make_response(start: datetime, days: int):
+    data = [["fecha", "valor"]]
+    for i in range(days):
+        dt = start + timedelta(days=i)
+        if dt.weekday() >= 5 or i % 37 == 0:
+            continue
+        data.append([dt.strftime("%d/%m/%Y"), f"{100 + i * 0.37:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")])
+    return data
+
+
+def _parse_decimal(value):
+    text = str(value).strip()
+    if not text:
+        return None
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    return float(text)
+
+
+def legacy_rows(data, tipo, start_dt, end_dt):
+    """Parseo y relleno anteriores: un diccionario y un strftime por día."""
+    series = {}
+    for row in data[1:]:
+        dt = datetime.strptime(row[0], "%d/%m/%Y")
+        series[dt.strftime("%Y-%m-%d")] = _parse_decimal(row[1])
+    filled = {}
+    current = start_dt
+    last_val = None
+    while current <= end_dt:
+        key = current.strftime("%Y-%m-%d")
+        if key in series:
+            last_val = series[key]
+            filled[key] = last_val
+        elif last_val is not None:
+            filled[key] = last_val
+        current += timedelta(days=1)
+    return [(fecha, tipo, "ambito", val, val) for fecha, val in filled.items()]
+
+
+def vectorized_rows(data, tipo, start_dt, end_dt):
+    filled = fill_missing_dates(start_dt, end_dt, parse_ambito_series(data))
+    return fx_rows(filled, tipo, "ambito")
+
+
+def _timed(func, data, start_dt, end_dt):
+    begin = time.perf_counter()
+    rows = [func(data, tipo, start_dt, end_dt) for tipo in TIPOS]
+    return time.perf_counter() - begin, rows
+
+
+def main(years: int = 6) -> None:
+    start_dt = datetime(2020, 1, 1)
+    days = years * 365
+    end_dt = start_dt + timedelta(days=days - 1)
+    data = make_response(start_dt, days)
+    t_old, old = _timed(legacy_rows, data, start_dt, end_dt)
+    t_new, new = _timed(vectorized_rows, data, start_dt, end_dt)
+    assert old == new, "las filas no coinciden"
+    print(f"Series: {len(TIPOS)} x {days:,} días")
+    print(f"Día por día: {t_old * 1e3:8.1f} ms")
+    print(f"Vectorizado: {t_new * 1e3:8.1f} ms")
+    if t_new > 0:
+        print(f"Speedup: x{t_old / t_new:,.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 6)
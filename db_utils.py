@@ -1,13 +1,35 @@
+import atexit
+import bisect
+import csv
 import os
 import sqlite3
 import shutil
+import threading
 from contextlib import contextmanager
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import lru_cache
 
 import pandas as pd
 
 DB_PATH = os.path.join("data", "portfolio.db")
 
+# Snapshot compartido del journal. Toda escritura sobre la tabla incrementa
+# la versión y el próximo fetch_journal() vuelve a materializar las filas.
+_journal_lock = threading.Lock()
+_journal_version = 0
+_journal_cache = {"version": -1, "rows": None}
+
+# Series de tipo de cambio por (tipo, fuente) como arrays ordenados por fecha.
+_fx_lock = threading.Lock()
+_fx_generation = 0
+_fx_series_cache = {}
+
+# Versión de las demás tablas que alimentan la valuación (portfolio y
+# crypto_prices); junto con las dos anteriores identifica una versión de datos.
+_valuation_lock = threading.Lock()
+_valuation_version = 0
+
 SCHEMA = """
 PRAGMA journal_mode = WAL;
 PRAGMA foreign_keys = ON;
@@ -80,17 +102,150 @@ CREATE TABLE IF NOT EXISTS crypto_map (
     simbolo TEXT NOT NULL UNIQUE,
     coingecko_id TEXT NOT NULL
 );
+
+CREATE TABLE IF NOT EXISTS crypto_map_misses (
+    simbolo TEXT PRIMARY KEY,
+    intentos INTEGER NOT NULL DEFAULT 1,
+    retry_after TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS market_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    filas INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS market_quotes (
+    snapshot_id INTEGER NOT NULL REFERENCES market_snapshots(id) ON DELETE CASCADE,
+    fuente TEXT NOT NULL,
+    simbolo TEXT NOT NULL,
+    precio REAL,
+    variacion REAL,
+    volumen REAL,
+    PRIMARY KEY (snapshot_id, fuente, simbolo)
+);
+
+CREATE INDEX IF NOT EXISTS idx_market_quotes_simbolo ON market_quotes (simbolo, snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_market_snapshots_created_at ON market_snapshots (created_at);
+
+-- Puntero a la última foto completa; se mueve en la misma transacción que la inserta
+CREATE TABLE IF NOT EXISTS market_current (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    snapshot_id INTEGER NOT NULL REFERENCES market_snapshots(id)
+);
+
+CREATE TABLE IF NOT EXISTS fx_backfill_chunks (
+    tipo TEXT NOT NULL,
+    fuente TEXT NOT NULL,
+    fecha_desde TEXT NOT NULL,
+    fecha_hasta TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    filas INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (tipo, fuente, fecha_desde)
+);
 """
 
+# Columnas normalizadas de una foto de mercado y días de historia que se conservan
+MARKET_COLUMNS = ["fuente", "simbolo", "precio", "variacion", "volumen"]
+MARKET_SNAPSHOT_RETENTION_DAYS = 30
+
+
+# Ajustes por conexión; journal_mode=WAL es persistente y lo fija init_db.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Una conexión de larga vida por hilo (UI, workers de FX/cripto, snapshots).
+# El registro permite cerrar las de hilos terminados y todas al salir.
+_conn_local = threading.local()
+_conn_registry_lock = threading.Lock()
+_conn_registry = {}  # id(conn) -> (hilo dueño, conexión)
+
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _prune_dead_connections():
+    with _conn_registry_lock:
+        dead = [key for key, (owner, _) in _conn_registry.items() if not owner.is_alive()]
+        conns = [_conn_registry.pop(key)[1] for key in dead]
+    for conn in conns:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _thread_connection():
+    conn = getattr(_conn_local, "conn", None)
+    if conn is not None and _conn_local.path == DB_PATH:
+        return conn
+    if conn is not None:
+        close_thread_connection()
+    _prune_dead_connections()
+    conn = _open_connection(DB_PATH)
+    _conn_local.conn = conn
+    _conn_local.path = DB_PATH
+    _conn_local.depth = 0
+    with _conn_registry_lock:
+        _conn_registry[id(conn)] = (threading.current_thread(), conn)
+    return conn
+
+
+def close_thread_connection():
+    """Cierra la conexión del hilo actual (los workers pueden llamarla al terminar)."""
+    conn = getattr(_conn_local, "conn", None)
+    if conn is None:
+        return
+    _conn_local.conn = None
+    with _conn_registry_lock:
+        _conn_registry.pop(id(conn), None)
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def close_all_connections():
+    with _conn_registry_lock:
+        conns = [conn for _, conn in _conn_registry.values()]
+        _conn_registry.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+atexit.register(close_all_connections)
+
 
 @contextmanager
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Conexión del hilo actual. Lo que no se confirmó con commit() se descarta
+    al salir del bloque más externo, igual que al cerrar una conexión propia."""
+    conn = _thread_connection()
+    depth = _conn_local.depth
+    _conn_local.depth = depth + 1
     try:
         yield conn
     finally:
-        conn.close()
+        _conn_local.depth = depth
+        if depth == 0 and conn.in_transaction:
+            conn.rollback()
 
 
 def init_db():
@@ -104,6 +259,178 @@ def init_db():
         if "change_24h" not in crypto_cols:
             conn.execute("ALTER TABLE crypto_prices ADD COLUMN change_24h REAL")
         conn.commit()
+        _apply_migrations(conn)
+
+
+_FECHA_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+_FECHA_ISO_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"
+
+
+@lru_cache(maxsize=8192)
+def _normalize_fecha_text(text):
+    for fmt in _FECHA_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(text).strftime("%Y-%m-%d")
+    except ValueError:
+        return text
+
+
+def _normalize_fecha(value):
+    """Lleva una fecha a 'YYYY-MM-DD' para que el orden por la columna sea cronológico."""
+    return _normalize_fecha_text(str(value or "").strip())
+
+
+def _normalize_journal_dates(conn) -> int:
+    rows = conn.execute(
+        f"SELECT id, fecha FROM journal WHERE fecha NOT GLOB '{_FECHA_ISO_GLOB}'"
+    ).fetchall()
+    updates = [
+        (fecha, row["id"])
+        for row in rows
+        if (fecha := _normalize_fecha(row["fecha"])) != row["fecha"]
+    ]
+    conn.executemany("UPDATE journal SET fecha = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+def _migration_indexes_v1(conn):
+    _normalize_journal_dates(conn)
+    conn.executescript(
+        """
+        CREATE INDEX IF NOT EXISTS idx_journal_fecha ON journal (fecha, id);
+        CREATE INDEX IF NOT EXISTS idx_journal_simbolo_fecha ON journal (simbolo, fecha);
+        CREATE INDEX IF NOT EXISTS idx_fx_rates_tipo_fuente_fecha ON fx_rates (tipo, fuente, fecha, compra, venta);
+        CREATE INDEX IF NOT EXISTS idx_portfolio_tipo_simbolo ON portfolio (tipo, simbolo);
+        CREATE INDEX IF NOT EXISTS idx_portfolio_broker_tipo ON portfolio (broker, tipo, simbolo);
+        """
+    )
+
+
+def _migration_market_snapshots_v2(conn):
+    # La tabla plana de versiones anteriores quedó reemplazada por market_snapshots;
+    # la última foto vieja se pierde y vuelve con la próxima actualización de mercado
+    conn.execute("DROP TABLE IF EXISTS market_data")
+
+
+# Migraciones de esquema en orden; PRAGMA user_version guarda la última aplicada.
+MIGRATIONS = [
+    _migration_indexes_v1,
+    _migration_market_snapshots_v2,
+]
+
+
+def _apply_migrations(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS, start=1):
+        if version >= target:
+            continue
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {target}")
+        conn.commit()
+    if version < len(MIGRATIONS):
+        invalidate_journal_cache()
+
+
+# Consultas calientes y el índice que debe resolverlas (ver audit_query_plans)
+QUERY_PLAN_EXPECTATIONS = (
+    ("journal ordenado", "SELECT * FROM journal ORDER BY fecha, id", (), "idx_journal_fecha"),
+    (
+        "journal por símbolo",
+        "SELECT * FROM journal WHERE simbolo = ? ORDER BY fecha",
+        ("GGAL",),
+        "idx_journal_simbolo_fecha",
+    ),
+    (
+        "serie fx",
+        "SELECT fecha, compra, venta FROM fx_rates WHERE tipo = ? AND fuente = ? ORDER BY fecha",
+        ("mep", "dolarhoy"),
+        "idx_fx_rates_tipo_fuente_fecha",
+    ),
+    (
+        "fx en o antes de fecha",
+        "SELECT * FROM fx_rates WHERE fecha <= ? AND tipo = ? AND fuente = ? ORDER BY fecha DESC LIMIT 1",
+        ("2024-01-01", "mep", "dolarhoy"),
+        "idx_fx_rates_tipo_fuente_fecha",
+    ),
+    (
+        "símbolos cripto",
+        "SELECT DISTINCT simbolo FROM portfolio WHERE tipo = 'Criptomonedas'",
+        (),
+        "idx_portfolio_tipo_simbolo",
+    ),
+    (
+        "símbolos por broker",
+        "SELECT DISTINCT simbolo FROM portfolio WHERE broker = ? AND tipo = ?",
+        ("IOL", "Plazo Fijo"),
+        "idx_portfolio_broker_tipo",
+    ),
+)
+
+
+def audit_query_plans():
+    """Devuelve {consulta: plan} de las consultas cuyo EXPLAIN QUERY PLAN no usa el índice esperado."""
+    problems = {}
+    with get_conn() as conn:
+        for name, sql, params, index in QUERY_PLAN_EXPECTATIONS:
+            plan = [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+            if not any(index in detail for detail in plan) or any("TEMP B-TREE" in detail for detail in plan):
+                problems[name] = plan
+    return problems
+
+
+def _bump_valuation_version() -> None:
+    global _valuation_version
+    with _valuation_lock:
+        _valuation_version += 1
+
+
+def data_version() -> tuple:
+    """Identifica el estado de los datos de valuación; cambia ante cualquier escritura."""
+    return (_journal_version, _fx_generation, _valuation_version)
+
+
+def invalidate_fx_cache(keys=None) -> None:
+    """Descarta las series FX cacheadas (todas o sólo las claves (tipo, fuente) dadas)."""
+    global _fx_generation
+    with _fx_lock:
+        _fx_generation += 1
+        if keys is None:
+            _fx_series_cache.clear()
+        else:
+            for key in keys:
+                _fx_series_cache.pop(key, None)
+
+
+def _get_fx_series(tipo: str, fuente: str):
+    key = (tipo, fuente)
+    with _fx_lock:
+        series = _fx_series_cache.get(key)
+        if series is not None:
+            return series
+        generation = _fx_generation
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT fecha, compra, venta FROM fx_rates WHERE tipo = ? AND fuente = ? ORDER BY fecha",
+            (tipo, fuente),
+        ).fetchall()
+    series = (
+        [row["fecha"] for row in rows],
+        [row["compra"] for row in rows],
+        [row["venta"] for row in rows],
+    )
+    with _fx_lock:
+        if generation == _fx_generation:
+            _fx_series_cache[key] = series
+    return series
+
+
+def _fx_row(series, idx: int, tipo: str, fuente: str) -> dict:
+    fechas, compras, ventas = series
+    return {"fecha": fechas[idx], "tipo": tipo, "fuente": fuente, "compra": compras[idx], "venta": ventas[idx]}
 
 
 def upsert_fx_rate(fecha: str, tipo: str, fuente: str, compra: float, venta: float) -> None:
@@ -119,31 +446,23 @@ def upsert_fx_rate(fecha: str, tipo: str, fuente: str, compra: float, venta: flo
             (fecha, tipo, fuente, compra, venta),
         )
         conn.commit()
+    invalidate_fx_cache([(tipo, fuente)])
 
 
 def fetch_fx_rate(fecha: str, tipo: str, fuente: str = "dolarhoy"):
-    with get_conn() as conn:
-        cur = conn.execute(
-            "SELECT * FROM fx_rates WHERE fecha = ? AND tipo = ? AND fuente = ?",
-            (fecha, tipo, fuente),
-        )
-        row = cur.fetchone()
-        return dict(row) if row else None
+    series = _get_fx_series(tipo, fuente)
+    idx = bisect.bisect_left(series[0], fecha)
+    if idx < len(series[0]) and series[0][idx] == fecha:
+        return _fx_row(series, idx, tipo, fuente)
+    return None
 
 
 def fetch_fx_rate_on_or_before(fecha: str, tipo: str, fuente: str):
-    with get_conn() as conn:
-        cur = conn.execute(
-            """
-            SELECT * FROM fx_rates
-            WHERE fecha <= ? AND tipo = ? AND fuente = ?
-            ORDER BY fecha DESC
-            LIMIT 1
-            """,
-            (fecha, tipo, fuente),
-        )
-        row = cur.fetchone()
-        return dict(row) if row else None
+    series = _get_fx_series(tipo, fuente)
+    idx = bisect.bisect_right(series[0], fecha) - 1
+    if idx >= 0:
+        return _fx_row(series, idx, tipo, fuente)
+    return None
 
 
 def upsert_crypto_price(simbolo: str, price_usd: float, updated_at: str, change_24h: float | None = None) -> None:
@@ -160,6 +479,7 @@ def upsert_crypto_price(simbolo: str, price_usd: float, updated_at: str, change_
             (simbolo, price_usd, change_24h, updated_at),
         )
         conn.commit()
+    _bump_valuation_version()
 
 
 def fetch_crypto_price(simbolo: str):
@@ -206,6 +526,61 @@ def fetch_crypto_map(simbolo: str):
         return dict(row) if row else None
 
 
+def fetch_crypto_maps():
+    """Todo ``crypto_map`` en una sola consulta: {simbolo: coingecko_id}."""
+    with get_conn() as conn:
+        rows = conn.execute("SELECT simbolo, coingecko_id FROM crypto_map").fetchall()
+    return {row["simbolo"]: row["coingecko_id"] for row in rows}
+
+
+def upsert_crypto_maps(pairs) -> None:
+    """Guarda pares (simbolo, coingecko_id) y borra sus búsquedas fallidas."""
+    pairs = list(pairs)
+    if not pairs:
+        return
+    with get_conn() as conn:
+        conn.executemany(
+            """
+            INSERT INTO crypto_map (simbolo, coingecko_id)
+            VALUES (?, ?)
+            ON CONFLICT(simbolo) DO UPDATE SET
+                coingecko_id = excluded.coingecko_id
+            """,
+            pairs,
+        )
+        conn.executemany(
+            "DELETE FROM crypto_map_misses WHERE simbolo = ?",
+            [(simbolo,) for simbolo, _ in pairs],
+        )
+        conn.commit()
+
+
+def fetch_crypto_map_misses():
+    """Búsquedas de CoinGecko sin resultado: {simbolo: (intentos, retry_after)}."""
+    with get_conn() as conn:
+        rows = conn.execute("SELECT simbolo, intentos, retry_after FROM crypto_map_misses").fetchall()
+    return {row["simbolo"]: (row["intentos"], row["retry_after"]) for row in rows}
+
+
+def record_crypto_map_misses(misses) -> None:
+    """Registra filas (simbolo, intentos, retry_after) de búsquedas sin resultado."""
+    misses = list(misses)
+    if not misses:
+        return
+    with get_conn() as conn:
+        conn.executemany(
+            """
+            INSERT INTO crypto_map_misses (simbolo, intentos, retry_after)
+            VALUES (?, ?, ?)
+            ON CONFLICT(simbolo) DO UPDATE SET
+                intentos = excluded.intentos,
+                retry_after = excluded.retry_after
+            """,
+            misses,
+        )
+        conn.commit()
+
+
 def fetch_fx_date_bounds(tipo: str, fuente: str):
     with get_conn() as conn:
         row = conn.execute(
@@ -217,7 +592,51 @@ def fetch_fx_date_bounds(tipo: str, fuente: str):
         return row["min_date"], row["max_date"]
 
 
+def fetch_fx_backfill_chunks(fuente: str):
+    """Estado de los tramos de backfill de ``fuente``: {(tipo, fecha_desde): fila}."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT * FROM fx_backfill_chunks WHERE fuente = ?",
+            (fuente,),
+        ).fetchall()
+    return {(row["tipo"], row["fecha_desde"]): dict(row) for row in rows}
+
+
+def save_fx_backfill_chunk(
+    tipo: str,
+    fuente: str,
+    fecha_desde: str,
+    fecha_hasta: str,
+    estado: str,
+    intentos: int,
+    filas: int = 0,
+    error=None,
+) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO fx_backfill_chunks (
+                tipo, fuente, fecha_desde, fecha_hasta, estado, intentos, filas, error, updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(tipo, fuente, fecha_desde) DO UPDATE SET
+                fecha_hasta = excluded.fecha_hasta,
+                estado = excluded.estado,
+                intentos = excluded.intentos,
+                filas = excluded.filas,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+            """,
+            (
+                tipo, fuente, fecha_desde, fecha_hasta, estado, intentos, filas, error,
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+        conn.commit()
+
+
 def upsert_fx_rates_bulk(rows):
+    rows = list(rows)
     if not rows:
         return
     with get_conn() as conn:
@@ -232,84 +651,143 @@ def upsert_fx_rates_bulk(rows):
             rows,
         )
         conn.commit()
+    invalidate_fx_cache({(row[1], row[2]) for row in rows})
 
 
-def import_journal_from_csv(csv_path):
-    import csv
-    rows = []
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            row["Plazo"] = row.get("Plazo") or "T+1"
-            rows.append(row)
-    with get_conn() as conn:
-        conn.execute("DELETE FROM journal")
-        for r in rows:
-            conn.execute(
-                """
-                INSERT INTO journal (
-                    fecha, tipo, tipo_operacion, simbolo, detalle,
-                    plazo, cantidad, precio, rendimiento, total_sin_desc,
-                    comision, iva_21, derechos, iva_derechos,
-                    total_descuentos, costo_total, ingreso_total, balance,
-                    broker, moneda, tc_usd_ars
-                ) VALUES (
-                    :Fecha, :Tipo, :Tipo_Operacion, :Simbolo, :Detalle,
-                    :Plazo, CAST(:Cantidad AS REAL), CAST(:Precio AS REAL),
-                    CAST(:Rendimiento AS REAL), CAST(:Total_Sin_Descuentos AS REAL),
-                    CAST(:Comision AS REAL), CAST(:IVA_21 AS REAL),
-                    CAST(:Derechos AS REAL), CAST(:IVA_Derechos AS REAL),
-                    CAST(:Total_Descuentos AS REAL), CAST(:Costo_Total AS REAL),
-                    CAST(:Ingreso_Total AS REAL), CAST(:Balance AS REAL),
-                    :Broker, :Moneda, CAST(:TC_USD_ARS AS REAL)
-                )
-                """,
-                r,
-            )
-        conn.commit()
+IMPORT_CHUNK_SIZE = 5000
 
 
-def import_analysis_from_csv(csv_path):
-    import csv
-    rows = []
-    with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
-    with get_conn() as conn:
-        conn.execute("DELETE FROM analysis")
-        for r in rows:
-            conn.execute(
-                """
-                INSERT INTO analysis (tipo, simbolo, descripcion, revision, ultima_revision, comentario)
-                VALUES (:Tipo, :Simbolo, :Descripcion, :Revision, :UltimaRevision, :Comentario)
-                """,
-                r,
-            )
-        conn.commit()
+@dataclass
+class CsvImportResult:
+    """Resumen de una importación: filas insertadas y errores (línea del CSV, motivo)."""
+
+    imported: int = 0
+    errors: list = field(default_factory=list)
+
+
+def _csv_float(value) -> float:
+    text = str(value if value is not None else "").strip()
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        # Formato local "1.234,56"
+        return float(text.replace(".", "").replace(",", "."))
 
 
-def import_portfolio_from_csv(csv_path):
-    import csv
-    rows = []
-    with open(csv_path, "r", encoding="utf-8") as f:
+def _import_csv(csv_path, table, columns, convert, progress=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Reemplaza ``table`` con el CSV, leyéndolo por bloques e insertando con executemany.
+
+    Todo ocurre en una transacción: si falla la escritura, la tabla queda como
+    estaba. Las filas que ``convert`` no puede tipar se saltean y se reportan.
+    ``progress(filas_importadas)`` se llama después de cada bloque.
+    """
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    result = CsvImportResult()
+    with open(csv_path, "r", encoding="utf-8", newline="") as f, get_conn() as conn:
         reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
-    with get_conn() as conn:
-        conn.execute("DELETE FROM portfolio")
-        for r in rows:
-            conn.execute(
-                """
-                INSERT INTO portfolio (simbolo, broker, tipo, moneda, cantidad, precio_prom)
-                VALUES (:Simbolo, :Broker, :Tipo,
-                        COALESCE(:Moneda,'ARS'),
-                        CAST(:Cantidad AS REAL),
-                        CAST(:Precio_Promedio AS REAL))
-                """,
-                r,
-            )
+        conn.execute(f"DELETE FROM {table}")
+        chunk = []
+        for line_no, row in enumerate(reader, start=2):
+            try:
+                chunk.append(convert(row))
+            except (KeyError, TypeError, ValueError) as e:
+                result.errors.append((line_no, f"{type(e).__name__}: {e}"))
+                continue
+            if len(chunk) >= chunk_size:
+                conn.executemany(sql, chunk)
+                result.imported += len(chunk)
+                chunk.clear()
+                if progress:
+                    progress(result.imported)
+        if chunk:
+            conn.executemany(sql, chunk)
+            result.imported += len(chunk)
+            if progress:
+                progress(result.imported)
         conn.commit()
+    return result
+
+
+def _journal_csv_row(row):
+    return (
+        _normalize_fecha(row["Fecha"]),
+        row["Tipo"],
+        row["Tipo_Operacion"],
+        row.get("Simbolo"),
+        row.get("Detalle"),
+        row.get("Plazo") or "T+1",
+        _csv_float(row["Cantidad"]),
+        _csv_float(row["Precio"]),
+        _csv_float(row["Rendimiento"]),
+        _csv_float(row["Total_Sin_Descuentos"]),
+        _csv_float(row["Comision"]),
+        _csv_float(row["IVA_21"]),
+        _csv_float(row["Derechos"]),
+        _csv_float(row["IVA_Derechos"]),
+        _csv_float(row["Total_Descuentos"]),
+        _csv_float(row["Costo_Total"]),
+        _csv_float(row["Ingreso_Total"]),
+        _csv_float(row["Balance"]),
+        row["Broker"],
+        row["Moneda"],
+        _csv_float(row["TC_USD_ARS"]),
+    )
+
+
+def import_journal_from_csv(csv_path, progress=None):
+    result = _import_csv(
+        csv_path,
+        "journal",
+        (
+            "fecha", "tipo", "tipo_operacion", "simbolo", "detalle",
+            "plazo", "cantidad", "precio", "rendimiento", "total_sin_desc",
+            "comision", "iva_21", "derechos", "iva_derechos",
+            "total_descuentos", "costo_total", "ingreso_total", "balance",
+            "broker", "moneda", "tc_usd_ars",
+        ),
+        _journal_csv_row,
+        progress,
+    )
+    invalidate_journal_cache()
+    return result
+
+
+def import_analysis_from_csv(csv_path, progress=None):
+    return _import_csv(
+        csv_path,
+        "analysis",
+        ("tipo", "simbolo", "descripcion", "revision", "ultima_revision", "comentario"),
+        lambda row: (
+            row["Tipo"],
+            row.get("Simbolo"),
+            row.get("Descripcion"),
+            row.get("Revision"),
+            row.get("UltimaRevision"),
+            row.get("Comentario"),
+        ),
+        progress,
+    )
+
+
+def import_portfolio_from_csv(csv_path, progress=None):
+    result = _import_csv(
+        csv_path,
+        "portfolio",
+        ("simbolo", "broker", "tipo", "moneda", "cantidad", "precio_prom"),
+        lambda row: (
+            row["Simbolo"],
+            row["Broker"],
+            row["Tipo"],
+            row.get("Moneda") or "ARS",
+            _csv_float(row["Cantidad"]),
+            _csv_float(row["Precio_Promedio"]),
+        ),
+        progress,
+    )
+    _bump_valuation_version()
+    return result
 
 
 def backup_csv_files(csv_paths):
@@ -323,15 +801,45 @@ def backup_csv_files(csv_paths):
             shutil.copy2(path, dest)
 
 
+def journal_version() -> int:
+    """Versión actual del journal; cambia con cada escritura sobre la tabla."""
+    return _journal_version
+
+
+def invalidate_journal_cache() -> None:
+    global _journal_version
+    with _journal_lock:
+        _journal_version += 1
+        _journal_cache["rows"] = None
+
+
 def fetch_journal():
+    """Devuelve las filas del journal desde el snapshot en memoria.
+
+    Las filas (dicts) se comparten entre consumidores y deben tratarse como
+    solo lectura; la lista devuelta sí es propia de cada llamada.
+    """
+    with _journal_lock:
+        if _journal_cache["rows"] is not None and _journal_cache["version"] == _journal_version:
+            return list(_journal_cache["rows"])
+        version = _journal_version
     with get_conn() as conn:
-        cur = conn.execute("SELECT * FROM journal ORDER BY date(fecha)")
-        return [dict(row) for row in cur.fetchall()]
+        cur = conn.execute("SELECT * FROM journal ORDER BY fecha, id")
+        rows = [dict(row) for row in cur.fetchall()]
+    with _journal_lock:
+        # Si hubo una escritura mientras leíamos, no se cachea el resultado.
+        if version == _journal_version:
+            _journal_cache["version"] = version
+            _journal_cache["rows"] = rows
+    return list(rows)
 
 
 def insert_journal_row(row):
+    # Misma forma que deja la migración, así el orden por la columna sigue siendo
+    # cronológico; se normaliza en el mismo dict para que el llamador vea lo guardado
+    row["fecha"] = _normalize_fecha(row.get("fecha"))
     with get_conn() as conn:
-        conn.execute(
+        cur = conn.execute(
             """
             INSERT INTO journal (
                 fecha, tipo, tipo_operacion, simbolo, detalle,
@@ -350,40 +858,124 @@ def insert_journal_row(row):
             row,
         )
         conn.commit()
+    invalidate_journal_cache()
+    return cur.lastrowid
 
 
 def save_market_data(df):
-    """Guarda los datos de mercado combinados en SQLite."""
+    """Guarda una foto de mercado normalizada (columnas MARKET_COLUMNS) y la marca como vigente."""
     if df is None:
-        return
+        return None
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    df_to_save = df.copy()
-    df_to_save["updated_at"] = timestamp
+    rows = [
+        (
+            fuente or "",
+            simbolo,
+            None if pd.isna(precio) else float(precio),
+            None if pd.isna(variacion) else float(variacion),
+            None if pd.isna(volumen) else float(volumen),
+        )
+        for fuente, simbolo, precio, variacion, volumen in df[MARKET_COLUMNS].itertuples(index=False, name=None)
+        if isinstance(simbolo, str) and simbolo
+    ]
+    cutoff = (datetime.now() - timedelta(days=MARKET_SNAPSHOT_RETENTION_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
     with get_conn() as conn:
-        # Reemplazar la tabla completa en cada actualización
-        conn.execute("DROP TABLE IF EXISTS market_data")
-        df_to_save.to_sql("market_data", conn, if_exists="replace", index=False)
-        conn.commit()
+        # Foto, cotizaciones y puntero en una sola transacción: los lectores ven la anterior o la nueva
+        with conn:
+            snapshot_id = conn.execute(
+                "INSERT INTO market_snapshots (created_at, filas) VALUES (?, ?)",
+                (timestamp, len(rows)),
+            ).lastrowid
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO market_quotes (snapshot_id, fuente, simbolo, precio, variacion, volumen)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [(snapshot_id,) + row for row in rows],
+            )
+            conn.execute(
+                "INSERT INTO market_current (id, snapshot_id) VALUES (1, ?) "
+                "ON CONFLICT(id) DO UPDATE SET snapshot_id = excluded.snapshot_id",
+                (snapshot_id,),
+            )
+            old_ids = [
+                row["id"]
+                for row in conn.execute(
+                    "SELECT id FROM market_snapshots WHERE created_at < ? AND id != ?",
+                    (cutoff, snapshot_id),
+                ).fetchall()
+            ]
+            conn.executemany("DELETE FROM market_quotes WHERE snapshot_id = ?", [(i,) for i in old_ids])
+            conn.executemany("DELETE FROM market_snapshots WHERE id = ?", [(i,) for i in old_ids])
+    return snapshot_id
 
 
-def fetch_market_data():
-    """Devuelve DataFrame con datos de mercado y timestamp de actualización."""
+def fetch_market_data(snapshot_id=None):
+    """Devuelve (DataFrame normalizado, timestamp) de la foto vigente o de ``snapshot_id``."""
     with get_conn() as conn:
-        try:
-            df = pd.read_sql("SELECT * FROM market_data", conn)
-        except Exception:
+        if snapshot_id is None:
+            current = conn.execute("SELECT snapshot_id FROM market_current WHERE id = 1").fetchone()
+            if current is None:
+                return None, None
+            snapshot_id = current["snapshot_id"]
+        snapshot = conn.execute(
+            "SELECT created_at FROM market_snapshots WHERE id = ?", (snapshot_id,)
+        ).fetchone()
+        if snapshot is None:
             return None, None
-    last_update = None
-    if df is not None and not df.empty and "updated_at" in df.columns:
-        last_update = df["updated_at"].iloc[0]
-        df = df.drop(columns=["updated_at"])
-    return df, last_update
+        df = pd.read_sql(
+            "SELECT fuente, simbolo, precio, variacion, volumen FROM market_quotes "
+            "WHERE snapshot_id = ? ORDER BY rowid",
+            conn,
+            params=(snapshot_id,),
+        )
+    return df, snapshot["created_at"]
 
 
-def delete_journal_row_by_id(row_id):
+def fetch_market_history(simbolo, since=None):
+    """Serie intradiaria de un símbolo a través de las fotos guardadas."""
+    query = (
+        "SELECT s.created_at, q.fuente, q.precio, q.variacion, q.volumen "
+        "FROM market_quotes q JOIN market_snapshots s ON s.id = q.snapshot_id "
+        "WHERE q.simbolo = ?"
+    )
+    params = [simbolo]
+    if since is not None:
+        query += " AND s.created_at >= ?"
+        params.append(since)
+    query += " ORDER BY q.snapshot_id"
+    with get_conn() as conn:
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+
+def _drop_from_journal_cache(row_ids) -> None:
+    """Quita filas del snapshot en memoria sin descartarlo, si está vigente."""
+    global _journal_version
+    ids = set(row_ids)
+    with _journal_lock:
+        rows = _journal_cache["rows"] if _journal_cache["version"] == _journal_version else None
+        _journal_version += 1
+        if rows is None:
+            _journal_cache["rows"] = None
+        else:
+            _journal_cache["rows"] = [row for row in rows if row.get("id") not in ids]
+            _journal_cache["version"] = _journal_version
+
+
+def delete_journal_rows(row_ids):
+    """Borra varias filas del journal en una sola transacción."""
+    row_ids = list(row_ids)
+    if not row_ids:
+        return 0
     with get_conn() as conn:
-        conn.execute("DELETE FROM journal WHERE id = ?", (row_id,))
+        cur = conn.executemany("DELETE FROM journal WHERE id = ?", [(row_id,) for row_id in row_ids])
         conn.commit()
+    _drop_from_journal_cache(row_ids)
+    return cur.rowcount
+
+
+def delete_journal_row_by_id(row_id):
+    delete_journal_rows([row_id])
 
 
 def fetch_analysis():
@@ -406,6 +998,49 @@ def save_analysis(rows):
         conn.commit()
 
 
+def upsert_analysis_rows(rows):
+    """Inserta las filas sin ``id`` y actualiza las demás; devuelve los ids en el mismo orden."""
+    ids = []
+    with get_conn() as conn:
+        for r in rows:
+            if r.get("id") is None:
+                cur = conn.execute(
+                    """
+                    INSERT INTO analysis (tipo, simbolo, descripcion, revision, ultima_revision, comentario)
+                    VALUES (:tipo, :simbolo, :descripcion, :revision, :ultima_revision, :comentario)
+                    """,
+                    r,
+                )
+                ids.append(cur.lastrowid)
+            else:
+                conn.execute(
+                    """
+                    UPDATE analysis SET tipo = :tipo, simbolo = :simbolo, descripcion = :descripcion,
+                        revision = :revision, ultima_revision = :ultima_revision, comentario = :comentario
+                    WHERE id = :id
+                    """,
+                    r,
+                )
+                ids.append(r["id"])
+        conn.commit()
+    return ids
+
+
+def delete_analysis_rows(ids):
+    ids = list(ids)
+    if not ids:
+        return
+    with get_conn() as conn:
+        conn.executemany("DELETE FROM analysis WHERE id = ?", [(i,) for i in ids])
+        conn.commit()
+
+
+def fetch_portfolio():
+    with get_conn() as conn:
+        cur = conn.execute("SELECT simbolo, broker, tipo, moneda, cantidad, precio_prom FROM portfolio")
+        return [dict(row) for row in cur.fetchall()]
+
+
 def replace_portfolio(rows):
     with get_conn() as conn:
         conn.execute("DELETE FROM portfolio")
@@ -418,3 +1053,22 @@ def replace_portfolio(rows):
                 r,
             )
         conn.commit()
+    _bump_valuation_version()
+
+
+def replace_portfolio_positions(keys, rows):
+    """Reemplaza sólo las posiciones (broker, simbolo) indicadas en ``keys``."""
+    keys = list(keys)
+    if not keys:
+        return
+    with get_conn() as conn:
+        conn.executemany("DELETE FROM portfolio WHERE broker = ? AND simbolo = ?", keys)
+        conn.executemany(
+            """
+            INSERT INTO portfolio (simbolo, broker, tipo, moneda, cantidad, precio_prom)
+            VALUES (:simbolo, :broker, :tipo, :moneda, :cantidad, :precio_prom)
+            """,
+            rows,
+        )
+        conn.commit()
+    _bump_valuation_version()
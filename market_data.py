@@ -1,7 +1,11 @@
 import os
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait as wait_futures
+from typing import Callable, NamedTuple, Optional
 import pandas as pd
 import logging
+import requests
 from selenium.webdriver.remote.remote_connection import LOGGER
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -15,7 +19,6 @@ from bs4 import BeautifulSoup
 from io import StringIO
 import ssl
 
-from db_utils import save_market_data
 
 # Suprimir logs de Selenium
 LOGGER.setLevel(logging.WARNING)
@@ -35,9 +38,23 @@ urls = {
 # Configuración de SSL
 ssl._create_default_https_context = ssl._create_unverified_context
 
-def descargar_datos_mercado(carpeta_destino):
-    """Descarga todos los datos de mercado y devuelve el DataFrame combinado"""
-    # Configuración de Selenium
+# Sesiones de Chrome en paralelo y tiempo máximo por fuente (segundos)
+MAX_NAVEGADORES = 3
+TIMEOUT_FUENTE = 120
+PANELES_IOL = ["Panel General", "Panel Líderes", "Subastas"]
+# Filas de la primera página de las tablas de IOL; con más se asume que vino la tabla completa
+FILAS_PAGINA_IOL = 10
+
+# Descarga sin navegador de las páginas que no dependen de JavaScript
+HTTP_TIMEOUT = 20
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36',
+    'Accept-Language': 'es-AR,es;q=0.9',
+}
+
+
+def _crear_driver():
+    """Crea una sesión de Chrome headless"""
     chrome_options = Options()
     chrome_options.add_argument('--headless=new')
     chrome_options.add_argument('--no-sandbox')
@@ -49,9 +66,7 @@ def descargar_datos_mercado(carpeta_destino):
     chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36')
     chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
     chrome_options.add_experimental_option('useAutomationExtension', False)
-    # Añadir estas opciones para suprimir logs
-    chrome_options.add_argument('--log-level=3')
-    
+
     try:
         # Ajusta esta ruta a tu chromedriver
         service = Service(executable_path=r'C:\ruta\a\tu\chromedriver.exe')
@@ -61,162 +76,403 @@ def descargar_datos_mercado(carpeta_destino):
         driver = webdriver.Chrome(options=chrome_options)
 
     driver.implicitly_wait(10)
-    wait = WebDriverWait(driver, 20)
-    all_dfs = []
+    driver.set_page_load_timeout(TIMEOUT_FUENTE)
+    return driver
 
-    def mostrar_todo():
-        """Selecciona 'Mostrar Todo' en el dropdown"""
-        attempts = 0
-        while attempts < 3:
-            try:
-                select = Select(wait.until(
-                    EC.element_to_be_clickable((By.NAME, "cotizaciones_length"))
-                ))
-                select.select_by_value("-1")
-                wait.until(lambda d: len(d.find_elements(By.CSS_SELECTOR, '#cotizaciones tbody tr')) > 10)
-                return
-            except (StaleElementReferenceException, TimeoutException):
-                attempts += 1
-                time.sleep(2)
 
-    def obtener_tabla(nombre_fuente, selector="table#cotizaciones", tipo='iol'):
-        """Obtiene la tabla como DataFrame"""
+class _PoolNavegadores:
+    """Una sesión de Chrome por hilo de trabajo, reutilizada entre fuentes"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._drivers = set()
+
+    def driver(self):
+        driver = getattr(self._local, "driver", None)
+        if driver is None:
+            driver = _crear_driver()
+            self._local.driver = driver
+            with self._lock:
+                self._drivers.add(driver)
+        return driver
+
+    def descartar(self, driver):
+        """Cierra una sesión (por ejemplo, para abortar una fuente colgada)"""
+        with self._lock:
+            if driver not in self._drivers:
+                return
+            self._drivers.discard(driver)
+        if getattr(self._local, "driver", None) is driver:
+            self._local.driver = None
         try:
-            tabla = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-            html = tabla.get_attribute('outerHTML')
-            df = pd.read_html(StringIO(html), decimal=',', thousands='.')[0]
-            
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    converted = pd.to_numeric(
-                        df[col].astype(str).str.replace('.', '', regex=False).str.replace(',', '.'),
-                        errors='coerce'
-                    )
-                    if not converted.isna().all():
-                        df[col] = converted
-            
-            if tipo == 'ripio' and isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.droplevel(0)
-                df = df.dropna(how='all')
-            
-            return df
-        except Exception as e:
-            print(f"Error obteniendo tabla {nombre_fuente}: {str(e)}")
-            return None
+            driver.quit()
+        except Exception:
+            pass
 
-    def procesar_panel(panel):
-        """Procesa paneles de IOL"""
-        attempts = 0
-        max_attempts = 3
-        
-        while attempts < max_attempts:
+    def liberar_hilo_actual(self):
+        driver = getattr(self._local, "driver", None)
+        if driver is not None:
+            with self._lock:
+                vigente = driver in self._drivers
+            if not vigente:
+                self._local.driver = None
+
+    def cerrar(self):
+        with self._lock:
+            drivers = list(self._drivers)
+            self._drivers.clear()
+        for driver in drivers:
             try:
-                driver.get(urls["Panel Líderes"])
-                time.sleep(2)
-                
-                selector_paneles = wait.until(
-                    EC.presence_of_element_located((By.ID, "paneles"))
-                )
-                
-                driver.execute_script("arguments[0].scrollIntoView(true);", selector_paneles)
-                time.sleep(0.5)
-                
-                select = Select(selector_paneles)
-                select.select_by_visible_text(panel)
-                
-                wait.until(EC.presence_of_element_located((By.ID, "cotizaciones")))
-                time.sleep(1)
-                
-                mostrar_todo()
-                df = obtener_tabla(f"Acciones Argentinas - {panel}")
-                if df is not None:
-                    return df
-                else:
-                    attempts += 1
-                    time.sleep(3)
-            except Exception as e:
-                attempts += 1
-                time.sleep(3)
+                driver.quit()
+            except Exception:
+                pass
+
+
+def _mostrar_todo(driver, wait):
+    """Selecciona 'Mostrar Todo' en el dropdown"""
+    attempts = 0
+    while attempts < 3:
+        try:
+            select = Select(wait.until(
+                EC.element_to_be_clickable((By.NAME, "cotizaciones_length"))
+            ))
+            select.select_by_value("-1")
+            wait.until(lambda d: len(d.find_elements(By.CSS_SELECTOR, '#cotizaciones tbody tr')) > FILAS_PAGINA_IOL)
+            return
+        except (StaleElementReferenceException, TimeoutException):
+            attempts += 1
+            time.sleep(1)
+
+
+def _tabla_desde_html(html, tipo='iol'):
+    """Convierte el HTML de una tabla en DataFrame con columnas numéricas"""
+    df = pd.read_html(StringIO(html), decimal=',', thousands='.')[0]
+
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            converted = pd.to_numeric(
+                df[col].astype(str).str.replace('.', '', regex=False).str.replace(',', '.'),
+                errors='coerce'
+            )
+            if not converted.isna().all():
+                df[col] = converted
+
+    if tipo == 'ripio' and isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.droplevel(0)
+        df = df.dropna(how='all')
+
+    return df
+
+
+def _obtener_tabla(wait, nombre_fuente, selector="table#cotizaciones", tipo='iol'):
+    """Obtiene la tabla como DataFrame"""
+    try:
+        tabla = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        return _tabla_desde_html(tabla.get_attribute('outerHTML'), tipo)
+    except Exception as e:
+        print(f"Error obteniendo tabla {nombre_fuente}: {str(e)}")
         return None
 
-    def extraer_tabla_ripio():
-        """Extrae la tabla de criptomonedas de Ripio"""
+
+def parse_iol_table(html, selector="table#cotizaciones"):
+    """Tabla de cotizaciones de IOL a partir del HTML de la página (None si no está)"""
+    tabla = BeautifulSoup(html, 'html.parser').select_one(selector)
+    if tabla is None:
+        return None
+    df = _tabla_desde_html(str(tabla))
+    return df if not df.empty else None
+
+
+def parse_ripio(html):
+    """Lista de criptomonedas de Ripio a partir del HTML de la página (None si no está)"""
+    contenedor = BeautifulSoup(html, 'html.parser').find('div', {'id': 'cotizaciones-list'})
+    if contenedor is None:
+        return None
+    monedas = []
+
+    for item in contenedor.find_all('div', class_='collection-item-6'):
         try:
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#cotizaciones-list .collection-item-6")))
-            time.sleep(2)
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            contenedor = soup.find('div', {'id': 'cotizaciones-list'})
-            monedas = []
-            
-            for item in contenedor.find_all('div', class_='collection-item-6'):
-                try:
-                    monedas.append({
-                        'Moneda': item.find('div', class_='c-land-list_name').text.strip(),
-                        'Símbolo': item.find('div', class_='c-land-list_abb').text.strip(),
-                        'Precio Compra': item.find('div', class_='c-land-list__price').text.strip(),
-                        'Precio Venta': item.find('div', class_='c-land-list__market').text.strip(),
-                        'Variación Diaria': item.find('div', class_='c-land-list__variation').text.strip()
-                    })
-                except AttributeError:
-                    continue
-            
-            return pd.DataFrame(monedas)
-        except Exception as e:
-            print(f"Error extrayendo Ripio: {str(e)}")
-            return pd.DataFrame()
-
-    def procesar_ripio():
-        """Procesa la página de Ripio"""
-        driver.get(urls["Ripio Criptomonedas"])
-        
+            monedas.append({
+                'Moneda': item.find('div', class_='c-land-list_name').text.strip(),
+                'Símbolo': item.find('div', class_='c-land-list_abb').text.strip(),
+                'Precio Compra': item.find('div', class_='c-land-list__price').text.strip(),
+                'Precio Venta': item.find('div', class_='c-land-list__market').text.strip(),
+                'Variación Diaria': item.find('div', class_='c-land-list__variation').text.strip()
+            })
+        except AttributeError:
+            continue
+
+    if not monedas:
+        return None
+    df = pd.DataFrame(monedas)
+    df = df[['Símbolo', 'Moneda', 'Precio Compra', 'Precio Venta', 'Variación Diaria']]
+    df['Variación Diaria'] = df['Variación Diaria'].str[1:].str.replace('.', ',', regex=False)
+    return df
+
+
+def _procesar_panel(driver, panel):
+    """Procesa paneles de IOL"""
+    wait = WebDriverWait(driver, 20)
+    attempts = 0
+    max_attempts = 3
+
+    while attempts < max_attempts:
         try:
-            cookie_btn = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.ID, "axeptio_btn_acceptAll"))
+            driver.get(urls["Panel Líderes"])
+            selector_paneles = wait.until(
+                EC.presence_of_element_located((By.ID, "paneles"))
             )
-            cookie_btn.click()
-            time.sleep(1)
-        except:
+            driver.execute_script("arguments[0].scrollIntoView(true);", selector_paneles)
+
+            select = Select(selector_paneles)
+            select.select_by_visible_text(panel)
+
+            wait.until(EC.presence_of_element_located((By.ID, "cotizaciones")))
+            _mostrar_todo(driver, wait)
+            df = _obtener_tabla(wait, f"Acciones Argentinas - {panel}")
+            if df is not None:
+                return df
+        except Exception:
             pass
-        
-        df = extraer_tabla_ripio()
-        if not df.empty:
-            df = df[['Símbolo', 'Moneda', 'Precio Compra', 'Precio Venta', 'Variación Diaria']]
-            df['Variación Diaria'] = df['Variación Diaria'].str[1:].str.replace('.', ',', regex=False)
-            return df
+        attempts += 1
+        time.sleep(2)
+    return None
+
+
+def _procesar_cotizacion(driver, nombre):
+    """Procesa una página de cotizaciones de IOL (Cedears, bonos, fondos)"""
+    wait = WebDriverWait(driver, 20)
+    driver.get(urls[nombre])
+    _mostrar_todo(driver, wait)
+    return _obtener_tabla(wait, nombre)
+
+
+def _procesar_ripio(driver):
+    """Procesa la página de Ripio"""
+    driver.get(urls["Ripio Criptomonedas"])
+
+    # El banner de cookies es opcional: no se espera más de unos segundos
+    try:
+        cookie_btn = WebDriverWait(driver, 5).until(
+            EC.element_to_be_clickable((By.ID, "axeptio_btn_acceptAll"))
+        )
+        cookie_btn.click()
+    except:
+        pass
+
+    try:
+        WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "#cotizaciones-list .collection-item-6"))
+        )
+        return parse_ripio(driver.page_source)
+    except Exception as e:
+        print(f"Error extrayendo Ripio: {str(e)}")
         return None
 
+
+class FuenteMercado(NamedTuple):
+    """Fuente de cotizaciones: ``parser(html)`` si alcanza con HTTP, ``selenium(driver)`` como respaldo.
+
+    Por HTTP se acepta la tabla sólo si tiene más de ``filas_pagina`` filas;
+    si no, puede ser una primera página y se usa el navegador.
+    """
+    nombre: str
+    url: Optional[str]
+    parser: Optional[Callable[[str], Optional[pd.DataFrame]]]
+    selenium: Callable
+    filas_pagina: int = 0
+
+
+def _fuentes_mercado():
+    """Fuentes independientes a descargar, en el orden en que se combinan"""
+    # Los paneles de acciones se eligen con un selector que requiere JavaScript
+    fuentes = [
+        FuenteMercado(
+            f"Acciones Argentinas - {panel}",
+            None,
+            None,
+            lambda driver, panel=panel: _procesar_panel(driver, panel),
+        )
+        for panel in PANELES_IOL
+    ]
+    for nombre, url in urls.items():
+        if nombre.startswith("Cotizacion"):
+            fuentes.append(
+                FuenteMercado(
+                    nombre,
+                    url,
+                    parse_iol_table,
+                    lambda driver, nombre=nombre: _procesar_cotizacion(driver, nombre),
+                    FILAS_PAGINA_IOL,
+                )
+            )
+    fuentes.append(FuenteMercado("Ripio Criptomonedas", urls["Ripio Criptomonedas"], parse_ripio, _procesar_ripio))
+    return fuentes
+
+
+def _descargar_http(fuentes, timeout=HTTP_TIMEOUT):
+    """Descarga por HTTP simple las fuentes que no necesitan navegador.
+
+    Devuelve ({nombre: DataFrame}, {nombre: motivo del fallo}).
+    """
+    resultados = {}
+    errores = {}
+    if not fuentes:
+        return resultados, errores
+
+    with requests.Session() as session:
+        session.headers.update(HTTP_HEADERS)
+
+        def bajar(fuente):
+            response = session.get(fuente.url, timeout=timeout)
+            response.raise_for_status()
+            return fuente.parser(response.text)
+
+        with ThreadPoolExecutor(max_workers=len(fuentes), thread_name_prefix="mercado-http") as executor:
+            futures = {executor.submit(bajar, fuente): fuente for fuente in fuentes}
+            for future in as_completed(futures):
+                fuente = futures[future]
+                nombre = fuente.nombre
+                try:
+                    df = future.result()
+                except Exception as e:
+                    errores[nombre] = str(e).splitlines()[0] if str(e) else type(e).__name__
+                    continue
+                if df is None or df.empty:
+                    errores[nombre] = "sin datos"
+                elif len(df) <= fuente.filas_pagina:
+                    # Mismo criterio que _mostrar_todo en el navegador
+                    errores[nombre] = f"{len(df)} filas, posible primera página"
+                else:
+                    resultados[nombre] = df
+    return resultados, errores
+
+
+def _descargar_fuentes(fuentes, max_navegadores=MAX_NAVEGADORES, timeout=TIMEOUT_FUENTE):
+    """Descarga las fuentes en paralelo sobre un pool acotado de navegadores.
+
+    Devuelve ({nombre: DataFrame}, {nombre: motivo del fallo}). Una fuente que
+    supera ``timeout`` se aborta cerrando su navegador; el resto sigue.
+    """
+    pool = _PoolNavegadores()
+    en_curso = {}  # nombre -> (inicio, driver); driver es None mientras Chrome arranca
+    vencidas = set()
+    en_curso_lock = threading.Lock()
+
+    def ejecutar(nombre, funcion):
+        # Se registra antes de crear el driver: un arranque de Chrome colgado también vence
+        with en_curso_lock:
+            en_curso[nombre] = (time.monotonic(), None)
+        try:
+            driver = pool.driver()
+        except BaseException:
+            with en_curso_lock:
+                en_curso.pop(nombre, None)
+            raise
+        with en_curso_lock:
+            vencida = nombre in vencidas
+            if not vencida:
+                en_curso[nombre] = (en_curso[nombre][0], driver)
+        if vencida:
+            pool.descartar(driver)
+            pool.liberar_hilo_actual()
+            return None
+        try:
+            return funcion(driver)
+        except TimeoutException:
+            raise
+        except WebDriverException:
+            # La sesión quedó inutilizable: la próxima fuente abre otra
+            pool.descartar(driver)
+            raise
+        finally:
+            with en_curso_lock:
+                en_curso.pop(nombre, None)
+            pool.liberar_hilo_actual()
+
+    resultados = {}
+    errores = {}
+    sin_driver = False
+    executor = ThreadPoolExecutor(max_workers=max_navegadores, thread_name_prefix="mercado")
     try:
-        # Procesar paneles de IOL
-        for panel in ["Panel General", "Panel Líderes", "Subastas"]:
-            df = procesar_panel(panel)
-            if df is not None:
-                all_dfs.append((f"Acciones Argentinas - {panel}", df))
-        
-        # Procesar otras secciones de IOL
-        for nombre, url in urls.items():
-            if nombre.startswith("Cotizacion"):
-                driver.get(url)
-                mostrar_todo()
-                df = obtener_tabla(nombre)
-                if df is not None:
-                    all_dfs.append((nombre, df))
-        
-        # Procesar Ripio
-        df_ripio = procesar_ripio()
-        if df_ripio is not None:
-            all_dfs.append(("Ripio Criptomonedas", df_ripio))
-
-        
-        # Combinar todos los DataFrames
+        futures = {executor.submit(ejecutar, nombre, funcion): nombre for nombre, funcion in fuentes}
+        pendientes = set(futures)
+        while pendientes:
+            listos, pendientes = wait_futures(pendientes, timeout=min(1, timeout), return_when=FIRST_COMPLETED)
+            for future in listos:
+                nombre = futures[future]
+                if nombre in vencidas:
+                    continue
+                try:
+                    df = future.result()
+                except Exception as e:
+                    errores[nombre] = str(e).splitlines()[0] if str(e) else type(e).__name__
+                    continue
+                if df is None or df.empty:
+                    errores[nombre] = "sin datos"
+                else:
+                    resultados[nombre] = df
+
+            ahora = time.monotonic()
+            with en_curso_lock:
+                colgadas = [
+                    (nombre, driver)
+                    for nombre, (inicio, driver) in en_curso.items()
+                    if nombre not in vencidas and ahora - inicio > timeout
+                ]
+                vencidas.update(nombre for nombre, _ in colgadas)
+            for nombre, driver in colgadas:
+                errores[nombre] = f"timeout ({timeout}s)"
+                if driver is None:
+                    sin_driver = True
+                else:
+                    pool.descartar(driver)
+                # Sin esperar al hilo colgado: cuenta como terminada
+                pendientes = {f for f in pendientes if futures[f] != nombre}
+    finally:
+        # Un arranque de Chrome colgado no se puede interrumpir: no se lo espera,
+        # y si el driver llega a crearse, ejecutar lo cierra al verla vencida
+        executor.shutdown(wait=not sin_driver, cancel_futures=True)
+        pool.cerrar()
+    return resultados, errores
+
+
+def descargar_datos_mercado(carpeta_destino, errores=None):
+    """Descarga todos los datos de mercado y devuelve el DataFrame combinado.
+
+    Las páginas estáticas se leen por HTTP y el resto (o las que fallan) con
+    Selenium, en paralelo; si ``errores`` es una lista, se agregan las tuplas
+    (fuente, motivo) de las que fallaron.
+    """
+    try:
+        fuentes = _fuentes_mercado()
+        resultados, fallidas_http = _descargar_http([f for f in fuentes if f.parser is not None])
+
+        # Selenium sólo para lo que necesita JavaScript o falló por HTTP
+        pendientes = [(f.nombre, f.selenium) for f in fuentes if f.nombre not in resultados]
+        fallidas = {}
+        if pendientes:
+            resultados_navegador, fallidas = _descargar_fuentes(pendientes)
+            resultados.update(resultados_navegador)
+        for fuente, motivo in fallidas.items():
+            if fuente in fallidas_http:
+                fallidas[fuente] = f"HTTP: {fallidas_http[fuente]}; navegador: {motivo}"
+        for fuente, motivo in fallidas.items():
+            print(f"Error descargando {fuente}: {motivo}")
+            if errores is not None:
+                errores.append((fuente, motivo))
+
+        # Combinar en el orden de las fuentes
+        all_dfs = [(f.nombre, resultados[f.nombre]) for f in fuentes if f.nombre in resultados]
         if all_dfs:
             dfs_para_combinar = []
             for fuente, df in all_dfs:
                 df['Fuente'] = fuente
                 dfs_para_combinar.append(df)
-            
+
             combined_df = pd.concat(dfs_para_combinar, ignore_index=True)
-            
+
             # Dividir columna "Símbolo" si existe
             if 'Símbolo' in combined_df.columns:
                 split_symbol = combined_df['Símbolo'].str.split(n=1, expand=True)
@@ -226,20 +482,16 @@ def descargar_datos_mercado(carpeta_destino):
                         split_symbol[col] = split_symbol[col].str.replace(r'\s+', ' ', regex=True).str.strip()
                     combined_df = combined_df.drop(columns=['Símbolo'])
                     combined_df = pd.concat([combined_df, split_symbol], axis=1)
-            
+
             # Eliminar columnas innecesarias
             columnas_a_eliminar = ["Unnamed: 13", "Cantidad Compra", "Cantidad Venta", "Unnamed: 12"]
             for col in columnas_a_eliminar:
                 if col in combined_df.columns:
                     combined_df = combined_df.drop(columns=[col])
-            
-            # Guardar resultados
-            save_market_data(combined_df)
+
             return combined_df
         return None
 
     except Exception as e:
         print(f"Error en la descarga: {str(e)}")
         return None
-    finally:
-        driver.quit()
@@ -4,13 +4,14 @@ from portfolio_app.models.operation import Operation, OperationType
 from portfolio_app.storage.in_memory import InMemoryStore
 from portfolio_app.services.portfolio_service import PortfolioService
 from portfolio_app.services.metrics_service import MetricsService
+from portfolio_app.data_providers.caching_provider import CachingPriceProvider
 from portfolio_app.data_providers.yahoo_provider import YahooPriceProvider
 
 
 def main() -> None:
     store = InMemoryStore()
     portfolio_service = PortfolioService(store)
-    price_provider = YahooPriceProvider()
+    price_provider = CachingPriceProvider(YahooPriceProvider(), ttl_seconds=60)
     metrics_service = MetricsService(portfolio_service, price_provider)
 
     # Register assets
@@ -0,0 +1,100 @@
+import asyncio
+import inspect
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Protocol, runtime_checkable
+
+@runtime_checkable
+class PriceProvider(Protocol):
+    def get_bulk_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        ...
+
+
+@runtime_checkable
+class AsyncPriceProvider(Protocol):
+    async def get_bulk_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        ...
+
+
+class ExecutorAsyncProvider:
+    """Async adapter that runs a blocking provider on an executor.
+
+    At most ``max_concurrency`` calls to the wrapped provider run at once, and
+    each call is abandoned after ``timeout`` seconds (the worker thread itself
+    cannot be interrupted; its late result is discarded). With ``chunk_size``
+    the symbols are split into chunks priced concurrently within that limit.
+    A failed or timed-out call contributes no prices.
+
+    Unless an ``executor`` is given, each adapter owns a pool of
+    ``max_concurrency`` threads, so calls still stuck after a timeout only
+    hold up this provider and never the others. The pool is not the loop's
+    default executor, which ``asyncio.run`` would join on exit.
+    """
+
+    def __init__(
+        self,
+        provider: PriceProvider,
+        max_concurrency: int = 4,
+        timeout: Optional[float] = 10.0,
+        chunk_size: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        self.provider = provider
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.executor = executor
+        self.name = name or type(provider).__name__
+        self._own_executor: Optional[ThreadPoolExecutor] = None
+        # One semaphore per event loop, so the adapter survives repeated asyncio.run calls
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _executor(self) -> Executor:
+        if self.executor is not None:
+            return self.executor
+        if self._own_executor is None:
+            self._own_executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix=f"price-{self.name}"
+            )
+        return self._own_executor
+
+    async def _fetch_chunk(self, symbols: List[str]) -> Dict[str, float]:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore():
+            try:
+                call = loop.run_in_executor(self._executor(), self.provider.get_bulk_prices, symbols)
+                return await asyncio.wait_for(call, self.timeout)
+            except asyncio.TimeoutError:
+                print(f"[WARN] {self.name} timed out after {self.timeout}s for {len(symbols)} symbols")
+            except Exception as exc:  # noqa: BLE001
+                print(f"[WARN] {self.name} failed for {len(symbols)} symbols: {exc}")
+            return {}
+
+    async def get_bulk_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        unique = list(dict.fromkeys(s for s in symbols if s))
+        if not unique:
+            return {}
+        size = self.chunk_size or len(unique)
+        chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+        prices: Dict[str, float] = {}
+        for result in await asyncio.gather(*(self._fetch_chunk(chunk) for chunk in chunks)):
+            prices.update(result)
+        return prices
+
+
+def as_async_provider(provider, **kwargs) -> AsyncPriceProvider:
+    """Return ``provider`` as is if its ``get_bulk_prices`` is a coroutine, else wrap it."""
+    if inspect.iscoroutinefunction(getattr(provider, "get_bulk_prices", None)):
+        return provider
+    return ExecutorAsyncProvider(provider, **kwargs)
@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class CachingPriceProvider:
+    """TTL + LRU cache in front of any provider exposing ``get_bulk_prices``.
+
+    Fresh prices are served from memory; misses and expired entries for one
+    call are fetched together in a single ``get_bulk_prices`` on the wrapped
+    provider. Symbols already being fetched by another thread are awaited
+    (for at most ``wait_timeout`` seconds) instead of requested twice; if that
+    fetch fails or times out they are left out of the result, never served
+    stale. With ``db_path`` the cache is also written to SQLite and reloaded
+    on startup.
+    """
+
+    def __init__(
+        self,
+        provider,
+        ttl_seconds: float = 60.0,
+        max_size: int = 1024,
+        db_path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+        wait_timeout: Optional[float] = 30.0,
+    ) -> None:
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self.db_path = db_path
+        self._clock = clock
+        self.wait_timeout = wait_timeout
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        if db_path:
+            self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS price_cache ("
+            "symbol TEXT PRIMARY KEY, price REAL NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        return conn
+
+    def _load(self) -> None:
+        cutoff = self._clock() - self.ttl_seconds
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT symbol, price, fetched_at FROM price_cache WHERE fetched_at >= ? "
+                "ORDER BY fetched_at DESC LIMIT ?",
+                (cutoff, self.max_size),
+            ).fetchall()
+        # Oldest first so the most recent end up at the MRU end
+        for symbol, price, fetched_at in reversed(rows):
+            self._entries[symbol] = (price, fetched_at)
+
+    def _persist(self, rows: List[Tuple[str, float, float]]) -> None:
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT INTO price_cache (symbol, price, fetched_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(symbol) DO UPDATE SET price = excluded.price, fetched_at = excluded.fetched_at",
+                    rows,
+                )
+        except sqlite3.Error as exc:
+            print(f"[WARN] Could not persist price cache: {exc}")
+
+    def _fresh(self, symbol: str, now: float) -> Optional[float]:
+        """Cached price if still within TTL (caller holds the lock)."""
+        entry = self._entries.get(symbol)
+        if entry is None or now - entry[1] > self.ttl_seconds:
+            return None
+        self._entries.move_to_end(symbol)
+        return entry[0]
+
+    def _store(self, prices: Dict[str, float], fetched_at: float) -> None:
+        with self._lock:
+            for symbol, price in prices.items():
+                self._entries[symbol] = (price, fetched_at)
+                self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        if self.db_path and prices:
+            self._persist([(symbol, price, fetched_at) for symbol, price in prices.items()])
+
+    def get_latest_price(self, symbol: str) -> Optional[float]:
+        return self.get_bulk_prices([symbol]).get(symbol)
+
+    def get_bulk_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        prices: Dict[str, float] = {}
+        to_fetch: List[str] = []
+        to_wait: Dict[str, threading.Event] = {}
+        now = self._clock()
+        with self._lock:
+            for symbol in dict.fromkeys(s for s in symbols if s):
+                price = self._fresh(symbol, now)
+                if price is not None:
+                    prices[symbol] = price
+                elif symbol in self._in_flight:
+                    to_wait[symbol] = self._in_flight[symbol]
+                else:
+                    self._in_flight[symbol] = threading.Event()
+                    to_fetch.append(symbol)
+
+        if to_fetch:
+            try:
+                fetched = self.provider.get_bulk_prices(to_fetch)
+                requested = set(to_fetch)
+                fetched = {s: float(p) for s, p in fetched.items() if s in requested and p is not None}
+                self._store(fetched, self._clock())
+                prices.update(fetched)
+            finally:
+                with self._lock:
+                    events = [self._in_flight.pop(symbol) for symbol in to_fetch]
+                for event in events:
+                    event.set()
+
+        deadline = None if self.wait_timeout is None else time.monotonic() + self.wait_timeout
+        for symbol, event in to_wait.items():
+            event.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            with self._lock:
+                price = self._fresh(symbol, self._clock())
+            if price is not None:
+                prices[symbol] = price
+        return prices
+
+    def invalidate(self, symbols: Optional[Iterable[str]] = None) -> None:
+        """Drop the given symbols (or everything) from the cache."""
+        symbols = None if symbols is None else list(symbols)
+        with self._lock:
+            if symbols is None:
+                self._entries.clear()
+            else:
+                for symbol in symbols:
+                    self._entries.pop(symbol, None)
+        if self.db_path:
+            with closing(self._connect()) as conn, conn:
+                if symbols is None:
+                    conn.execute("DELETE FROM price_cache")
+                else:
+                    conn.executemany("DELETE FROM price_cache WHERE symbol = ?", [(s,) for s in symbols])
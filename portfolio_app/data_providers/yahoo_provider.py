@@ -1,29 +1,85 @@
-from typing import Dict, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
 import yfinance as yf
 
+# transport(symbols) -> frame shaped like ``yf.download`` output (OHLC columns,
+# one level per ticker); swap it for recorded frames to run offline.
+PriceTransport = Callable[[Sequence[str]], pd.DataFrame]
+
+
+def yfinance_transport(symbols: Sequence[str]) -> pd.DataFrame:
+    """Download recent daily bars for all symbols in a single request."""
+    return yf.download(
+        tickers=list(symbols),
+        period="5d",
+        interval="1d",
+        group_by="column",
+        auto_adjust=False,
+        threads=False,
+        progress=False,
+    )
+
+
+def latest_closes(frame: pd.DataFrame, symbols: Sequence[str]) -> Dict[str, float]:
+    """Last non-missing close per symbol from a ``yf.download`` frame."""
+    if frame is None or frame.empty:
+        return {}
+    if isinstance(frame.columns, pd.MultiIndex):
+        if "Close" not in frame.columns.get_level_values(0):
+            return {}
+        closes = frame["Close"]
+    elif "Close" in frame.columns and len(symbols) == 1:
+        # Older yfinance versions return flat columns for a single ticker
+        closes = frame[["Close"]].set_axis(list(symbols), axis=1)
+    else:
+        return {}
+    last = closes.ffill().iloc[-1]
+    return {symbol: float(last[symbol]) for symbol in symbols if symbol in last and pd.notna(last[symbol])}
+
 
 class YahooPriceProvider:
-    """Simple price provider using yfinance."""
+    """Simple price provider using yfinance.
 
-    def __init__(self, currency_fallback: str = "USD") -> None:
+    Bulk lookups are batched: symbols are split into chunks of ``chunk_size``,
+    each chunk is one multi-ticker request, and chunks run on a small thread
+    pool when there is more than one.
+    """
+
+    def __init__(
+        self,
+        currency_fallback: str = "USD",
+        transport: Optional[PriceTransport] = None,
+        chunk_size: int = 100,
+        max_workers: int = 4,
+    ) -> None:
         self.currency_fallback = currency_fallback
+        self.transport = transport or yfinance_transport
+        self.chunk_size = max(1, chunk_size)
+        self.max_workers = max(1, max_workers)
 
     def get_latest_price(self, symbol: str) -> Optional[float]:
         """Return latest close price for symbol; None if unavailable."""
+        return self.get_bulk_prices([symbol]).get(symbol)
+
+    def _fetch_chunk(self, symbols: List[str]) -> Dict[str, float]:
         try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d")
-            if data.empty:
-                return None
-            return float(data["Close"].iloc[-1])
+            return latest_closes(self.transport(symbols), symbols)
         except Exception as exc:  # noqa: BLE001
-            print(f"[WARN] Could not fetch price for {symbol}: {exc}")
-            return None
+            print(f"[WARN] Could not fetch prices for {', '.join(symbols)}: {exc}")
+            return {}
 
     def get_bulk_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """Return latest close per symbol; unavailable symbols are omitted."""
+        unique = list(dict.fromkeys(s for s in symbols if s))
+        chunks = [unique[i:i + self.chunk_size] for i in range(0, len(unique), self.chunk_size)]
+        if len(chunks) <= 1:
+            results = [self._fetch_chunk(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                results = list(executor.map(self._fetch_chunk, chunks))
         prices: Dict[str, float] = {}
-        for symbol in symbols:
-            price = self.get_latest_price(symbol)
-            if price is not None:
-                prices[symbol] = price
+        for result in results:
+            prices.update(result)
         return prices
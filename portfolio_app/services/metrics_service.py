@@ -1,4 +1,6 @@
-from typing import Dict
+import asyncio
+from typing import Dict, Optional, Sequence
+from portfolio_app.data_providers.async_provider import as_async_provider
 from portfolio_app.models.operation import OperationType
 from portfolio_app.services.portfolio_service import PortfolioService
 
@@ -13,7 +15,29 @@ class MetricsService:
     def compute_metrics(self) -> Dict[str, float]:
         positions = self.portfolio_service.get_positions()
         prices = self.price_provider.get_bulk_prices(positions.keys())
+        return self._metrics_from_prices(positions, prices)
 
+    async def compute_metrics_async(self, providers: Optional[Sequence] = None) -> Dict[str, float]:
+        """Async variant that queries all providers concurrently.
+
+        ``providers`` are in priority order (default: the service's own
+        provider); the first one that prices a symbol wins. Blocking providers
+        are wrapped with ``as_async_provider`` defaults, so pass an
+        ``ExecutorAsyncProvider`` to set per-provider concurrency and timeout.
+        Total latency is bounded by the slowest provider, not their sum.
+        """
+        positions = self.portfolio_service.get_positions()
+        symbols = list(positions.keys())
+        async_providers = [as_async_provider(p) for p in (providers or [self.price_provider])]
+        results = await asyncio.gather(*(p.get_bulk_prices(symbols) for p in async_providers))
+
+        prices: Dict[str, float] = {}
+        for result in results:
+            for symbol, price in result.items():
+                prices.setdefault(symbol, price)
+        return self._metrics_from_prices(positions, prices)
+
+    def _metrics_from_prices(self, positions: Dict[str, float], prices: Dict[str, float]) -> Dict[str, float]:
         market_value = 0.0
         invested = 0.0
         asset_returns: Dict[str, float] = {}
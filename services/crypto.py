@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from db_utils import (
+    fetch_crypto_map_misses,
+    fetch_crypto_maps,
+    record_crypto_map_misses,
+    upsert_crypto_maps,
+)
+
+COINGECKO_SEARCH_URL = "https://api.coingecko.com/api/v3/search"
+COINGECKO_SYMBOL_MAP = {
+    "btc": "bitcoin",
+    "eth": "ethereum",
+    "usdt": "tether",
+    "usdc": "usd-coin",
+    "bnb": "binancecoin",
+    "xrp": "ripple",
+    "ada": "cardano",
+    "sol": "solana",
+    "dot": "polkadot",
+    "doge": "dogecoin",
+    "matic": "polygon",
+    "link": "chainlink",
+    "ltc": "litecoin",
+    "bch": "bitcoin-cash",
+    "avax": "avalanche-2",
+    "trx": "tron",
+    "uni": "uniswap",
+    "atom": "cosmos",
+    "near": "near",
+    "shib": "shiba-inu",
+    "xmr": "monero",
+    "xlm": "stellar",
+    "etc": "ethereum-classic",
+    "ton": "the-open-network",
+}
+
+# Una búsqueda sin resultado no se repite hasta que vence; la espera se
+# duplica con cada intento fallido, hasta el máximo
+COINGECKO_MISS_TTL = timedelta(hours=24)
+COINGECKO_MISS_MAX_TTL = timedelta(days=7)
+COINGECKO_SEARCH_WORKERS = 4
+
+# search(simbolo) -> respuesta JSON de /search; lanza excepción si el pedido falla
+CoinSearch = Callable[[str], dict]
+
+
+def pick_coingecko_id(symbol: str, data: dict) -> Optional[str]:
+    """Elige el id de la respuesta de /search: coincidencia exacta de símbolo o el primero."""
+    sym = symbol.strip().lower()
+    coins = data.get("coins", []) if isinstance(data, dict) else []
+    for coin in coins:
+        if coin.get("symbol", "").lower() == sym and coin.get("id"):
+            return coin["id"]
+    if coins:
+        return coins[0].get("id") or None
+    return None
+
+
+class CoinGeckoResolver:
+    """Resuelve símbolos a ids de CoinGecko en lote.
+
+    ``crypto_map`` se lee en una sola consulta; los símbolos que faltan y no
+    están en ``COINGECKO_SYMBOL_MAP`` se buscan en paralelo (el ritmo por host
+    lo pone ``search``). Las búsquedas sin resultado se anotan en
+    ``crypto_map_misses`` y no se repiten hasta que vence su espera. Los
+    errores de red no cuentan como búsqueda fallida.
+    """
+
+    def __init__(
+        self,
+        search: CoinSearch,
+        max_workers: int = COINGECKO_SEARCH_WORKERS,
+        miss_ttl: timedelta = COINGECKO_MISS_TTL,
+        max_miss_ttl: timedelta = COINGECKO_MISS_MAX_TTL,
+        now: Callable[[], datetime] = datetime.now,
+    ) -> None:
+        self.search = search
+        self.max_workers = max_workers
+        self.miss_ttl = miss_ttl
+        self.max_miss_ttl = max_miss_ttl
+        self._now = now
+
+    def _search_one(self, symbol: str):
+        """Devuelve (id o None, ok); ``ok`` es False si el pedido falló."""
+        try:
+            return pick_coingecko_id(symbol, self.search(symbol.lower())), True
+        except Exception as e:
+            print(f"Error resolviendo CoinGecko id para {symbol}: {e}")
+            return None, False
+
+    def resolve_many(self, symbols: Iterable[str]) -> Dict[str, str]:
+        """{SIMBOLO: coingecko_id} de los símbolos que se pudieron resolver."""
+        symbols = sorted({s.strip().upper() for s in symbols if s and s.strip()})
+        known = fetch_crypto_maps()
+        resolved = {s: known[s] for s in symbols if s in known}
+
+        new_pairs = []
+        missing = []
+        for symbol in symbols:
+            if symbol in resolved:
+                continue
+            coingecko_id = COINGECKO_SYMBOL_MAP.get(symbol.lower())
+            if coingecko_id:
+                resolved[symbol] = coingecko_id
+                new_pairs.append((symbol, coingecko_id))
+            else:
+                missing.append(symbol)
+
+        now = self._now()
+        now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+        misses = fetch_crypto_map_misses() if missing else {}
+        to_search = [s for s in missing if s not in misses or misses[s][1] <= now_str]
+
+        new_misses = []
+        if to_search:
+            workers = min(self.max_workers, len(to_search))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._search_one, to_search))
+            for symbol, (coingecko_id, ok) in zip(to_search, results):
+                if coingecko_id:
+                    resolved[symbol] = coingecko_id
+                    new_pairs.append((symbol, coingecko_id))
+                elif ok:
+                    intentos = misses.get(symbol, (0, None))[0] + 1
+                    wait = min(self.miss_ttl * 2 ** (intentos - 1), self.max_miss_ttl)
+                    new_misses.append((symbol, intentos, (now + wait).strftime("%Y-%m-%d %H:%M:%S")))
+
+        upsert_crypto_maps(new_pairs)
+        record_crypto_map_misses(new_misses)
+        return resolved
+
+    def resolve(self, symbol: str) -> Optional[str]:
+        return self.resolve_many([symbol]).get(symbol.strip().upper())
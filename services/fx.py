@@ -0,0 +1,75 @@
+from datetime import datetime
+from itertools import repeat
+from typing import List, Sequence, Tuple
+
+import pandas as pd
+
+
+def empty_fx_series() -> pd.Series:
+    return pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+
+
+def parse_decimal_series(values: Sequence) -> pd.Series:
+    """Números con formato local ("1.234,5") o plano a float; lo inválido queda NaN."""
+    # Normalizar el texto en Python es más rápido que los métodos .str de pandas
+    text = [str(v).strip() for v in values]
+    text = [t.replace(".", "").replace(",", ".") if "," in t else t for t in text]
+    return pd.to_numeric(pd.Series(text, dtype=object), errors="coerce")
+
+
+def _parse_fx_date(text: str) -> pd.Timestamp:
+    """Una fecha suelta: "d/m/aaaa" con el día primero, el resto como ISO."""
+    return pd.to_datetime(text, dayfirst="/" in text, errors="coerce")
+
+
+def parse_fx_dates(values: Sequence) -> pd.Series:
+    """Fechas "dd/mm/aaaa" o ISO a datetime64; lo inválido queda NaT.
+
+    El caso común ("dd/mm/aaaa" o "aaaa-mm-dd" con ceros) se convierte en un
+    solo paso con formato fijo; lo que no encaja (p. ej. "1/2/2024" o ISO con
+    hora) se vuelve a leer fila por fila.
+    """
+    text = [str(v).strip() for v in values]
+    iso = [f"{t[6:10]}-{t[3:5]}-{t[0:2]}" if len(t) == 10 and t[2] == "/" else t for t in text]
+    parsed = pd.to_datetime(pd.Series(iso, dtype=object), format="%Y-%m-%d", errors="coerce")
+    missing = [i for i in parsed.index[parsed.isna()] if text[i]]
+    if missing:
+        parsed[missing] = [_parse_fx_date(text[i]) for i in missing]
+    return parsed
+
+
+def parse_ambito_series(data: Sequence) -> pd.Series:
+    """Serie diaria (índice de fechas) desde la respuesta de Ambito.
+
+    La respuesta es una lista cuya primera fila es el encabezado y el resto
+    pares [fecha, valor]; las filas que no se pueden leer se descartan.
+    """
+    rows = [row[:2] for row in data[1:] if row and len(row) >= 2]
+    if not rows:
+        return empty_fx_series()
+    fechas, valores = zip(*rows)
+    series = pd.Series(
+        parse_decimal_series(valores).to_numpy(dtype=float),
+        index=pd.DatetimeIndex(parse_fx_dates(fechas)).normalize(),
+    )
+    series = series[series.index.notna() & series.notna().to_numpy()]
+    return series[~series.index.duplicated(keep="last")].sort_index()
+
+
+def fill_missing_dates(start_dt: datetime, end_dt: datetime, series: pd.Series) -> pd.Series:
+    """Reindexa la serie a todos los días de [start_dt, end_dt] y completa hacia adelante.
+
+    Los días previos al primer dato del rango quedan afuera, igual que los
+    valores de ``series`` fuera del rango.
+    """
+    days = pd.date_range(pd.Timestamp(start_dt).normalize(), pd.Timestamp(end_dt).normalize(), freq="D")
+    if series.empty:
+        return empty_fx_series()
+    return series.reindex(days).ffill().dropna()
+
+
+def fx_rows(series: pd.Series, tipo: str, fuente: str) -> List[Tuple[str, str, str, float, float]]:
+    """Filas (fecha, tipo, fuente, compra, venta) para ``upsert_fx_rates_bulk``."""
+    fechas = series.index.strftime("%Y-%m-%d").tolist()
+    valores = series.to_numpy(dtype=float).tolist()
+    return list(zip(fechas, repeat(tipo), repeat(fuente), valores, valores))
@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from db_utils import fetch_fx_backfill_chunks, save_fx_backfill_chunk, upsert_fx_rates_bulk
+from services.fx import fill_missing_dates, fx_rows
+from services.rate_limit import backoff_delay
+
+# fetch(tipo, desde, hasta) -> serie diaria con índice de fechas; lanza excepción si el pedido falla
+SeriesFetcher = Callable[[str, datetime, datetime], pd.Series]
+
+FX_BACKFILL_CHUNK_DAYS = 180
+FX_BACKFILL_WORKERS = 4
+FX_BACKFILL_MAX_ATTEMPTS = 4
+
+
+def plan_chunks(start: datetime, end: datetime, chunk_days: int = FX_BACKFILL_CHUNK_DAYS) -> List[Tuple[datetime, datetime]]:
+    """Tramos [desde, hasta] consecutivos de ``chunk_days`` días a partir de ``start``.
+
+    Los bordes dependen sólo de ``start``, así una corrida posterior reconoce
+    los tramos ya completos aunque ``end`` haya avanzado.
+    """
+    chunks = []
+    current = start
+    while current <= end:
+        chunk_end = min(current + timedelta(days=chunk_days), end)
+        chunks.append((current, chunk_end))
+        current = chunk_end + timedelta(days=1)
+    return chunks
+
+
+class FxBackfillJob:
+    """Backfill histórico de tipos de cambio por tramos, concurrente y reanudable.
+
+    Cada tramo (tipo, desde, hasta) se baja en un pool acotado de hilos, con
+    reintentos y espera exponencial; el ritmo por host lo pone el ``fetch``
+    (ver ``HostRateLimiter``), que no debe reintentar por su cuenta: los
+    reintentos van en una sola capa. Las escrituras se hacen desde el hilo
+    que llama a ``run`` y cada tramo completo queda registrado en
+    ``fx_backfill_chunks``, así una corrida interrumpida retoma sólo lo que
+    faltaba.
+    """
+
+    def __init__(
+        self,
+        fetch: SeriesFetcher,
+        tipos: Iterable[str],
+        start: datetime,
+        end: datetime,
+        fuente: str,
+        chunk_days: int = FX_BACKFILL_CHUNK_DAYS,
+        max_workers: int = FX_BACKFILL_WORKERS,
+        max_attempts: int = FX_BACKFILL_MAX_ATTEMPTS,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.fetch = fetch
+        self.tipos = list(tipos)
+        self.start = start
+        self.end = end
+        self.fuente = fuente
+        self.chunk_days = chunk_days
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self._sleep = sleep
+
+    def pending_chunks(self) -> List[Tuple[str, datetime, datetime]]:
+        done = fetch_fx_backfill_chunks(self.fuente)
+        pending = []
+        for tipo in self.tipos:
+            for desde, hasta in plan_chunks(self.start, self.end, self.chunk_days):
+                record = done.get((tipo, desde.strftime("%Y-%m-%d")))
+                if (
+                    record
+                    and record["estado"] == "ok"
+                    and record["fecha_hasta"] >= hasta.strftime("%Y-%m-%d")
+                ):
+                    continue
+                pending.append((tipo, desde, hasta))
+        return pending
+
+    def _fetch_chunk(self, tipo: str, desde: datetime, hasta: datetime):
+        """Baja un tramo con reintentos; devuelve (serie, intentos, error)."""
+        error: Optional[str] = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return self.fetch(tipo, desde, hasta), attempt, None
+            except Exception as e:
+                error = str(e)
+                if attempt < self.max_attempts:
+                    self._sleep(backoff_delay(attempt))
+        return None, self.max_attempts, error
+
+    def run(self) -> List[str]:
+        """Baja los tramos pendientes y devuelve los errores de los que fallaron."""
+        pending = self.pending_chunks()
+        if not pending:
+            return []
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch_chunk, tipo, desde, hasta): (tipo, desde, hasta)
+                for tipo, desde, hasta in pending
+            }
+            for future in as_completed(futures):
+                tipo, desde, hasta = futures[future]
+                desde_str = desde.strftime("%Y-%m-%d")
+                hasta_str = hasta.strftime("%Y-%m-%d")
+                series, intentos, error = future.result()
+                if series is None:
+                    errors.append(f"Backfill {self.fuente} {tipo} {desde_str} a {hasta_str}: {error}")
+                    save_fx_backfill_chunk(tipo, self.fuente, desde_str, hasta_str, "error", intentos, error=error)
+                    continue
+                filled = fill_missing_dates(desde, hasta, series)
+                upsert_fx_rates_bulk(fx_rows(filled, tipo, self.fuente))
+                save_fx_backfill_chunk(tipo, self.fuente, desde_str, hasta_str, "ok", intentos, filas=len(filled))
+        return errors
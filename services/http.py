@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.rate_limit import HostRateLimiter
+
+HTTP_TIMEOUT = 10
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+HTTP_POOL_SIZE = 8
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class HttpClient:
+    """Cliente HTTP compartido: conexiones persistentes, reintentos y caché en disco.
+
+    Una sola ``requests.Session`` reutiliza conexiones TCP/TLS por host. Los
+    GET de las URL con TTL configurado (por prefijo en ``ttl_by_prefix``) se
+    guardan en ``cache_dir``: mientras la copia esté vigente no se va a la red
+    y, vencida, se revalida con ``If-None-Match``/``If-Modified-Since``; un 304
+    sólo renueva la copia. Los pedidos con ``Authorization`` nunca se guardan
+    en disco. ``base_url`` permite apuntar todo a un servidor local de prueba.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl_by_prefix: Optional[Mapping[str, float]] = None,
+        user_agent: Optional[str] = None,
+        timeout: float = HTTP_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+        backoff: float = HTTP_BACKOFF,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        base_url: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        # Prefijos más largos primero: el más específico gana
+        self.ttl_by_prefix = sorted((ttl_by_prefix or {}).items(), key=lambda kv: -len(kv[0]))
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self._cache_lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.session = session or requests.Session()
+        if session is None:
+            retry = Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=RETRY_STATUS,
+                allowed_methods=frozenset(["GET"]),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+
+    def close(self) -> None:
+        self.session.close()
+
+    def ttl_for(self, url: str) -> float:
+        for prefix, ttl in self.ttl_by_prefix:
+            if url.startswith(prefix):
+                return ttl
+        return 0
+
+    def _resolve(self, url: str) -> str:
+        if not self.base_url:
+            return url
+        parts = url.split("/", 3)
+        path = parts[3] if len(parts) > 3 else ""
+        return f"{self.base_url}/{path}"
+
+    def _cache_path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _load_entry(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._cache_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store_entry(self, url: str, entry: dict) -> None:
+        path = self._cache_path(url)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with self._cache_lock:
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"Error guardando caché HTTP de {url}: {e}")
+
+    def get_text(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        ttl: Optional[float] = None,
+        cache_if: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """GET que devuelve el cuerpo (UTF-8) como texto; lanza ``requests.HTTPError`` si falla.
+
+        ``cache_if(body)`` decide si una respuesta nueva se guarda (p. ej. para
+        no cachear resultados vacíos).
+        """
+        ttl = self.ttl_for(url) if ttl is None else ttl
+        authenticated = any(name.lower() == "authorization" for name in (headers or {}))
+        use_cache = bool(self.cache_dir) and ttl > 0 and not authenticated
+        entry = self._load_entry(url) if use_cache else None
+        now = time.time()
+        if entry and now - entry.get("fetched_at", 0) < ttl:
+            return entry["body"]
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        target = self._resolve(url)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(target)
+        resp = self.session.get(target, headers=request_headers, timeout=self.timeout)
+
+        if resp.status_code == 304 and entry:
+            entry["fetched_at"] = now
+            self._store_entry(url, entry)
+            return entry["body"]
+        if resp.status_code == 429 and self.rate_limiter is not None:
+            try:
+                retry_after = float(resp.headers.get("Retry-After", 5))
+            except ValueError:
+                retry_after = 5.0
+            self.rate_limiter.penalize(target, retry_after)
+        resp.raise_for_status()
+
+        body = resp.content.decode("utf-8", errors="ignore")
+        if use_cache and (cache_if is None or cache_if(body)):
+            self._store_entry(url, {
+                "url": url,
+                "fetched_at": now,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "body": body,
+            })
+        return body
+
+    def get_json(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        ttl: Optional[float] = None,
+        cache_if: Optional[Callable[[object], bool]] = None,
+    ):
+        """Como ``get_text`` pero decodifica JSON; ``cache_if`` recibe el dato ya decodificado."""
+        body_filter = None if cache_if is None else (lambda body: cache_if(json.loads(body)))
+        return json.loads(self.get_text(url, headers=headers, ttl=ttl, cache_if=body_filter))
@@ -1,10 +1,133 @@
-from typing import Optional, Tuple
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
 
 import pandas as pd
 
-from db_utils import fetch_market_data, save_market_data
+from db_utils import MARKET_COLUMNS, fetch_market_data, save_market_data
 from market_data import descargar_datos_mercado
 
+SYMBOL_COLUMNS = ["Símbolo.1", "Símbolo", "Simbolo", "Symbol", "Ticker"]
+PRICE_COLUMNS = ["Último Operado", "Ultimo Operado", "Precio", "Close"]
+VARIATION_COLUMNS = ["Variación Diaria", "Variacion Diaria", "Var.%", "Variación", "Change %"]
+VOLUME_COLUMNS = ["Volumen Nominal", "Volumen", "Monto Operado", "Volume"]
+SOURCE_COLUMNS = ["Fuente"]
+
+
+def _first_column(columns: Iterable[str], candidates) -> Optional[str]:
+    columns = set(columns)
+    return next((c for c in candidates if c in columns), None)
+
+
+def parse_price(value) -> Optional[float]:
+    """Convierte un precio con formato local ("1.234,5") o numérico a float."""
+    if isinstance(value, str):
+        value = value.replace('.', '').replace(',', '.')
+    try:
+        num = float(value)
+    except Exception:
+        return None
+    if num != num or num in (float("inf"), float("-inf")):
+        return None
+    return num
+
+
+def parse_variation(value) -> Optional[float]:
+    """Convierte una variación ("-1,25%") o numérica a float."""
+    if isinstance(value, str):
+        value = value.replace('%', '').replace(',', '.').strip()
+    try:
+        num = float(value)
+    except Exception:
+        return None
+    if num != num or num in (float("inf"), float("-inf")):
+        return None
+    return num
+
+
+def normalize_market_frame(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Reduce la tabla combinada del scraper a MARKET_COLUMNS con valores numéricos.
+
+    Las filas sin símbolo se descartan y, por fuente, gana la primera fila de
+    cada símbolo. Un DataFrame ya normalizado se devuelve tal cual.
+    """
+    if df is None:
+        return pd.DataFrame(columns=MARKET_COLUMNS)
+    if all(col in df.columns for col in MARKET_COLUMNS):
+        return df[MARKET_COLUMNS]
+    symbol_col = _first_column(df.columns, SYMBOL_COLUMNS)
+    if symbol_col is None:
+        return pd.DataFrame(columns=MARKET_COLUMNS)
+    price_col = _first_column(df.columns, PRICE_COLUMNS)
+    var_col = _first_column(df.columns, VARIATION_COLUMNS)
+    volume_col = _first_column(df.columns, VOLUME_COLUMNS)
+    source_col = _first_column(df.columns, SOURCE_COLUMNS)
+
+    def column(col, parser):
+        if col is None:
+            return [None] * len(df)
+        return [parser(value) for value in df[col]]
+
+    normalized = pd.DataFrame(
+        {
+            "fuente": df[source_col].fillna("").astype(str).tolist() if source_col else [""] * len(df),
+            "simbolo": df[symbol_col].tolist(),
+            "precio": column(price_col, parse_price),
+            "variacion": column(var_col, parse_variation),
+            "volumen": column(volume_col, parse_price),
+        },
+        columns=MARKET_COLUMNS,
+    )
+    normalized = normalized[normalized["simbolo"].map(lambda v: isinstance(v, str) and v != "")]
+    return normalized.drop_duplicates(subset=["fuente", "simbolo"], keep="first").reset_index(drop=True)
+
+
+class MarketQuote(NamedTuple):
+    simbolo: str
+    precio: Optional[float]
+    variacion: Optional[float]
+
+
+class MarketQuotes:
+    """Índice símbolo -> cotización construido una vez por carga de datos de mercado."""
+
+    def __init__(self, quotes: Optional[Dict[str, MarketQuote]] = None):
+        self._quotes = quotes or {}
+
+    @classmethod
+    def from_dataframe(cls, df: Optional[pd.DataFrame]) -> "MarketQuotes":
+        normalized = normalize_market_frame(df)
+        quotes = {}
+        for simbolo, precio, variacion in zip(normalized["simbolo"], normalized["precio"], normalized["variacion"]):
+            # Como en el filtrado por DataFrame, gana la primera fila de cada símbolo
+            if simbolo in quotes:
+                continue
+            quotes[simbolo] = MarketQuote(simbolo, parse_price(precio), parse_variation(variacion))
+        return cls(quotes)
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+    def __contains__(self, simbolo) -> bool:
+        return simbolo in self._quotes
+
+    def __iter__(self) -> Iterator[MarketQuote]:
+        return iter(self._quotes.values())
+
+    def get(self, simbolo: str) -> Optional[MarketQuote]:
+        return self._quotes.get(simbolo)
+
+    def price(self, simbolo: str) -> Optional[float]:
+        quote = self._quotes.get(simbolo)
+        return quote.precio if quote else None
+
+    def mep_rate(self, fallback: float = 1.0) -> float:
+        """Tipo de cambio MEP implícito AL30/AL30D; usa ``fallback`` si no hay datos."""
+        fx_rate = fallback
+        al30 = self.price("AL30")
+        al30d = self.price("AL30D")
+        if al30 is not None and al30d:
+            fx_rate = al30 / al30d
+        return fx_rate if fx_rate > 0 else 1.0
+
 
 def load_market_data() -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """Carga datos de mercado desde SQLite."""
@@ -14,10 +137,16 @@ def load_market_data() -> Tuple[Optional[pd.DataFrame], Optional[str]]:
 def update_market_data(data_dir: str) -> Tuple[bool, str]:
     """Descarga y guarda datos de mercado en SQLite."""
     try:
-        df = descargar_datos_mercado(data_dir)
+        errores = []
+        df = descargar_datos_mercado(data_dir, errores)
         if df is not None:
-            save_market_data(df)
+            save_market_data(normalize_market_frame(df))
+            if errores:
+                fallidas = ", ".join(fuente for fuente, _ in errores)
+                return True, f"Datos actualizados parcialmente (sin: {fallidas})"
             return True, "Datos actualizados correctamente"
+        if errores:
+            return False, "Error en la descarga: " + "; ".join(f"{fuente}: {motivo}" for fuente, motivo in errores)
         return False, "Error en la descarga"
     except Exception as e:
         return False, f"Error: {str(e)}"
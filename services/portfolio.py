@@ -1,6 +1,13 @@
+import bisect
 from collections import deque
 from datetime import datetime
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DEPOSIT_TYPES = ("Depósito ARS", "Depósito USD", "DepІsito ARS", "DepІsito USD")
+BUY_OPERATIONS = ("Compra", "Entrada")
+SELL_OPERATIONS = ("Venta", "Salida")
+INCOME_OPERATIONS = ("Rendimiento", "Dividendos")
+INCOME_INSTRUMENT_TYPES = ("Acciones AR", "CEDEARs", "Bonos AR", "Criptomonedas", "ETFs", "FCIs AR")
 
 
 def _to_float(val) -> float:
@@ -23,24 +30,316 @@ def compute_cash_by_broker(journal_rows: Iterable[dict], moneda: str = "ARS") ->
     return balances
 
 
-def compute_holdings_by_broker(journal_rows: Iterable[dict]) -> Dict[str, Dict[str, float]]:
-    holdings: Dict[str, Dict[str, float]] = {}
-    for row in journal_rows:
-        tipo = row.get("tipo", "")
-        if tipo in ["Depósito ARS", "Depósito USD", "DepІsito ARS", "DepІsito USD"]:
-            continue
-        tipo_op = row.get("tipo_operacion", "")
-        simbolo = row.get("simbolo", "")
-        broker = row.get("broker") or "GENERAL"
-        cantidad = _to_float(row.get("cantidad", 0))
-        if not simbolo:
-            continue
-        holdings.setdefault(broker, {})
+class FifoConsumption(NamedTuple):
+    cantidad: float
+    costo_precio: float
+    costo_total: float
+    descuentos: float
+    rendimiento: float
+
+
+class FifoLots:
+    """Cola FIFO de lotes abiertos de un instrumento.
+
+    Cada lote es una lista mutable
+    ``[cantidad, precio, costo_unitario, fecha, descuento_unitario, acc_rend, acc_desc]``
+    donde ``costo_unitario`` incluye los descuentos de la compra. Los
+    rendimientos (dividendos/cupones) se acumulan por unidad en tenencia, de
+    modo que repartirlos es O(1) y cada lote cobra sólo lo devengado mientras
+    estuvo abierto.
+    """
+
+    __slots__ = ("lots", "cantidad", "acc_rendimiento", "acc_descuentos")
+
+    def __init__(self) -> None:
+        self.lots: deque = deque()
+        self.cantidad = 0.0
+        self.acc_rendimiento = 0.0
+        self.acc_descuentos = 0.0
+
+    def add(
+        self,
+        cantidad: float,
+        precio: float,
+        costo_unitario: float,
+        fecha: str,
+        descuentos: float = 0.0,
+    ) -> None:
+        if cantidad <= 0:
+            return
+        self.lots.append(
+            [
+                cantidad,
+                precio,
+                costo_unitario,
+                fecha,
+                descuentos / cantidad,
+                self.acc_rendimiento,
+                self.acc_descuentos,
+            ]
+        )
+        self.cantidad += cantidad
+
+    def distribute(self, valor: float, descuentos: float = 0.0) -> bool:
+        """Reparte un rendimiento entre la tenencia actual, proporcional a la cantidad."""
+        if self.cantidad <= 0:
+            return False
+        self.acc_rendimiento += valor / self.cantidad
+        self.acc_descuentos += descuentos / self.cantidad
+        return True
+
+    def _take(self, lot: list, usada: float, totals: list) -> None:
+        totals[0] += usada
+        totals[1] += lot[1] * usada
+        totals[2] += lot[2] * usada
+        totals[3] += (lot[4] + self.acc_descuentos - lot[6]) * usada
+        totals[4] += (self.acc_rendimiento - lot[5]) * usada
+        lot[0] -= usada
+
+    def consume(self, cantidad: float) -> FifoConsumption:
+        """Consume ``cantidad`` en orden FIFO (o lo disponible si no alcanza)."""
+        totals = [0.0, 0.0, 0.0, 0.0, 0.0]
+        restante = cantidad
+        while restante > 0 and self.lots:
+            lot = self.lots[0]
+            usada = min(lot[0], restante)
+            self._take(lot, usada, totals)
+            restante -= usada
+            if lot[0] <= 1e-12:
+                self.lots.popleft()
+        self.cantidad = max(0.0, self.cantidad - totals[0])
+        return FifoConsumption(*totals)
+
+    def pop_lot(self) -> Optional[FifoConsumption]:
+        """Cierra el lote más antiguo completo (p. ej. un plazo fijo)."""
+        if not self.lots:
+            return None
+        totals = [0.0, 0.0, 0.0, 0.0, 0.0]
+        lot = self.lots.popleft()
+        self._take(lot, lot[0], totals)
+        self.cantidad = max(0.0, self.cantidad - totals[0])
+        return FifoConsumption(*totals)
+
+
+class _Position:
+    """Una posición (broker, símbolo) con tres vistas de las mismas filas.
+
+    - ``fifo``/``realized``: lotes abiertos FIFO y resultado realizado (costo
+      promedio de compra mostrado en la UI).
+    - ``cantidad``/``costo``: costo promedio ponderado de la tabla portfolio
+      (``precio_prom``); una venta o salida mayor a la tenencia se ignora.
+    - ``tenencia``: cantidad disponible para validar ventas; sólo cuentan
+      Compra/Venta y una venta de más deja la tenencia en cero. Es ``None``
+      mientras la posición no tenga ninguna Compra/Venta.
+    """
+
+    __slots__ = ("tipo", "moneda", "keys", "rows", "fifo", "realized", "cantidad", "costo", "tenencia")
+
+    def __init__(self, tipo: str, moneda: str) -> None:
+        self.tipo = tipo
+        self.moneda = moneda
+        self.keys: List[tuple] = []
+        self.rows: List[dict] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self.fifo = FifoLots()
+        self.realized = 0.0
+        self.cantidad = 0.0
+        self.costo = 0.0
+        self.tenencia: Optional[float] = None
+
+    def _apply_average(self, tipo_op: str, cantidad: float, costo_total: float) -> None:
+        if tipo_op in BUY_OPERATIONS:
+            self.cantidad += cantidad
+            self.costo += costo_total
+        elif tipo_op in SELL_OPERATIONS:
+            if self.cantidad < cantidad or self.cantidad == 0:
+                return
+            self.costo -= self.costo * (cantidad / self.cantidad)
+            self.cantidad -= cantidad
         if tipo_op == "Compra":
-            holdings[broker][simbolo] = holdings[broker].get(simbolo, 0.0) + cantidad
+            self.tenencia = (self.tenencia or 0.0) + cantidad
         elif tipo_op == "Venta":
-            holdings[broker][simbolo] = max(0.0, holdings[broker].get(simbolo, 0.0) - cantidad)
-    return holdings
+            self.tenencia = max(0.0, (self.tenencia or 0.0) - cantidad)
+
+    def apply(self, row: dict) -> None:
+        tipo_op = row.get("tipo_operacion")
+        cantidad = _to_float(row.get("cantidad"))
+        self._apply_average(tipo_op, cantidad, _to_float(row.get("costo_total")))
+        if cantidad <= 0:
+            return
+        if tipo_op in BUY_OPERATIONS:
+            precio = _to_float(row.get("precio"))
+            costo_total = _to_float(row.get("costo_total"))
+            costo_unitario = costo_total / cantidad if costo_total else precio
+            self.fifo.add(cantidad, precio, costo_unitario, row.get("fecha") or "")
+        elif tipo_op in SELL_OPERATIONS:
+            consumo = self.fifo.consume(cantidad)
+            if consumo.cantidad <= 0:
+                return
+            ingreso_total = _to_float(row.get("ingreso_total"))
+            ingreso_unitario = ingreso_total / cantidad if ingreso_total else _to_float(row.get("precio"))
+            self.realized += ingreso_unitario * consumo.cantidad - consumo.costo_total
+
+    def replay(self) -> None:
+        self._reset()
+        for row in self.rows:
+            self.apply(row)
+
+
+class LotLedger:
+    """Libro de lotes FIFO persistente por (broker, símbolo).
+
+    Aplicar una fila con fecha igual o posterior a la última de su posición
+    cuesta una comparación, un append y el consumo FIFO. Una fila retroactiva
+    (o una baja) se ubica con búsqueda binaria pero la inserción en la lista y
+    el rebobinado son O(n) en las filas de esa posición; nunca se recorre el
+    journal completo.
+    """
+
+    def __init__(self) -> None:
+        self._positions: Dict[Tuple[str, str], _Position] = {}
+        self._index: Dict[object, Tuple[Tuple[str, str], tuple]] = {}
+        self._seq = 0
+
+    @classmethod
+    def from_rows(cls, journal_rows: Iterable[dict]) -> "LotLedger":
+        ledger = cls()
+        for row in journal_rows:
+            ledger.apply(row)
+        return ledger
+
+    @staticmethod
+    def _is_tracked(row: dict) -> bool:
+        if row.get("tipo") in DEPOSIT_TYPES:
+            return False
+        if not row.get("simbolo"):
+            return False
+        return row.get("tipo_operacion") in BUY_OPERATIONS + SELL_OPERATIONS
+
+    def apply(self, row: dict) -> None:
+        if not self._is_tracked(row):
+            return
+        broker = row.get("broker") or "GENERAL"
+        key = (broker, row.get("simbolo"))
+        position = self._positions.get(key)
+        if position is None:
+            position = _Position(row.get("tipo"), row.get("moneda") or "ARS")
+            self._positions[key] = position
+        self._seq += 1
+        row_id = row.get("id")
+        sort_key = (str(row.get("fecha") or ""), row_id if row_id is not None else -1, self._seq)
+        if row_id is not None:
+            self._index[row_id] = (key, sort_key)
+        if not position.keys or position.keys[-1] <= sort_key:
+            position.keys.append(sort_key)
+            position.rows.append(row)
+            position.apply(row)
+            return
+        idx = bisect.bisect_right(position.keys, sort_key)
+        position.keys.insert(idx, sort_key)
+        position.rows.insert(idx, row)
+        position.replay()
+
+    def remove(self, row_id) -> bool:
+        return bool(self.remove_many([row_id]))
+
+    def remove_many(self, row_ids: Iterable) -> set:
+        """Quita varias filas y rebobina cada posición afectada una sola vez.
+
+        Devuelve las claves (broker, símbolo) que cambiaron.
+        """
+        touched = set()
+        for row_id in row_ids:
+            entry = self._index.pop(row_id, None)
+            if entry is None:
+                continue
+            key, sort_key = entry
+            position = self._positions[key]
+            idx = bisect.bisect_left(position.keys, sort_key)
+            if idx >= len(position.keys) or position.keys[idx] != sort_key:
+                continue
+            del position.keys[idx]
+            del position.rows[idx]
+            touched.add(key)
+        for key in touched:
+            position = self._positions[key]
+            if position.rows:
+                position.replay()
+            else:
+                del self._positions[key]
+        return touched
+
+    def holdings(self) -> Dict[str, Dict[str, float]]:
+        """Tenencia por broker para validar ventas (sólo Compra/Venta)."""
+        holdings: Dict[str, Dict[str, float]] = {}
+        for (broker, simbolo), position in self._positions.items():
+            if position.tenencia is not None:
+                holdings.setdefault(broker, {})[simbolo] = position.tenencia
+        return holdings
+
+    def open_lots(self, broker: str, simbolo: str) -> List[Tuple[float, float, str]]:
+        position = self._positions.get((broker or "GENERAL", simbolo))
+        if position is None:
+            return []
+        return [(lot[0], lot[1], lot[3]) for lot in position.fifo.lots]
+
+    def average_cost(self, broker: str, simbolo: str, include_fees: bool = False) -> float:
+        """Costo promedio de los lotes FIFO abiertos."""
+        position = self._positions.get((broker or "GENERAL", simbolo))
+        if position is None or position.fifo.cantidad <= 0:
+            return 0.0
+        col = 2 if include_fees else 1
+        total = sum(lot[0] * lot[col] for lot in position.fifo.lots)
+        return total / position.fifo.cantidad
+
+    def average_costs(self, include_fees: bool = False) -> Dict[Tuple[str, str], float]:
+        return {
+            key: self.average_cost(key[0], key[1], include_fees)
+            for key, position in self._positions.items()
+            if position.fifo.cantidad > 0
+        }
+
+    def realized_pnl(self, broker: Optional[str] = None, simbolo: Optional[str] = None) -> float:
+        total = 0.0
+        for (pos_broker, pos_simbolo), position in self._positions.items():
+            if broker is not None and pos_broker != broker:
+                continue
+            if simbolo is not None and pos_simbolo != simbolo:
+                continue
+            total += position.realized
+        return total
+
+    def symbols(self) -> set:
+        return {simbolo for (_, simbolo) in self._positions}
+
+    def portfolio_rows(self, keys: Optional[Iterable[Tuple[str, str]]] = None) -> List[dict]:
+        """Filas de la tabla portfolio; con ``keys`` sólo las de esas posiciones."""
+        if keys is None:
+            positions = self._positions.items()
+        else:
+            positions = [(key, self._positions[key]) for key in keys if key in self._positions]
+        rows_to_save = []
+        for (broker, simbolo), position in positions:
+            if position.cantidad <= 0:
+                continue
+            rows_to_save.append(
+                {
+                    "simbolo": simbolo,
+                    "broker": broker,
+                    "tipo": position.tipo,
+                    "moneda": position.moneda,
+                    "cantidad": position.cantidad,
+                    # Costo promedio ponderado (costo_total acumulado), no el de los lotes FIFO
+                    "precio_prom": position.costo / position.cantidad,
+                }
+            )
+        return rows_to_save
+
+
+def compute_holdings_by_broker(journal_rows: Iterable[dict]) -> Dict[str, Dict[str, float]]:
+    return LotLedger.from_rows(journal_rows).holdings()
 
 
 def compute_finished_operations(
@@ -48,6 +347,12 @@ def compute_finished_operations(
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
 ) -> List[dict]:
+    """Reconstruye las operaciones cerradas con un único barrido cronológico.
+
+    Compras, rendimientos y ventas se procesan en orden de fecha sobre una
+    cola FIFO por símbolo: cada rendimiento se reparte entre la tenencia
+    vigente en ese momento (las ventas previas ya no cobran) en O(1).
+    """
     journal_data = []
     for row in journal_rows:
         fecha = row.get("fecha") or row.get("Fecha")
@@ -61,162 +366,82 @@ def compute_finished_operations(
             continue
         if to_date and parsed_date > to_date:
             continue
-        journal_data.append(
-            {
-                "Fecha": fecha,
-                "Tipo": row.get("tipo") or row.get("Tipo"),
-                "Tipo_Operacion": row.get("tipo_operacion") or row.get("Tipo_Operacion"),
-                "Simbolo": row.get("simbolo") or row.get("Simbolo"),
-                "Detalle": row.get("detalle") or row.get("Detalle"),
-                "Cantidad": str(row.get("cantidad", row.get("Cantidad", ""))),
-                "Precio": str(row.get("precio", row.get("Precio", ""))),
-                "Rendimiento": str(row.get("rendimiento", row.get("Rendimiento", ""))),
-                "Total_Descuentos": str(row.get("total_descuentos", row.get("Total_Descuentos", ""))),
-            }
-        )
+        journal_data.append((fecha, row))
 
-    journal_data.sort(key=lambda x: datetime.strptime(x["Fecha"], "%Y-%m-%d"))
+    # Las fechas ISO ordenan igual como texto; sort es estable para el mismo día.
+    journal_data.sort(key=lambda x: x[0])
 
-    compras_pendientes_hist = {}
-    ventas = []
-    rendimientos = {}
+    lots_by_symbol: Dict[str, FifoLots] = {}
+    finished_ops: List[dict] = []
 
-    for row in journal_data:
-        fecha = row["Fecha"]
-        tipo = row["Tipo"]
-        tipo_op = row["Tipo_Operacion"]
-        simbolo = row["Simbolo"]
-        detalle = row["Detalle"]
-        cantidad = _to_float(row["Cantidad"])
-        precio = _to_float(row["Precio"])
-        rendimiento = _to_float(row["Rendimiento"])
-        total_descuentos = _to_float(row["Total_Descuentos"])
+    for fecha, row in journal_data:
+        tipo = row.get("tipo") or row.get("Tipo")
+        tipo_op = row.get("tipo_operacion") or row.get("Tipo_Operacion")
+        simbolo = row.get("simbolo") or row.get("Simbolo")
 
-        if tipo in ["Depósito ARS", "Depósito USD", "DepІsito ARS", "DepІsito USD"]:
+        if tipo in DEPOSIT_TYPES:
             continue
 
+        cantidad = _to_float(row.get("cantidad", row.get("Cantidad", "")))
+        precio = _to_float(row.get("precio", row.get("Precio", "")))
+        rendimiento = _to_float(row.get("rendimiento", row.get("Rendimiento", "")))
+        total_descuentos = _to_float(row.get("total_descuentos", row.get("Total_Descuentos", "")))
+
         if tipo_op == "Compra":
-            compras_pendientes_hist.setdefault(simbolo, deque()).append(
-                {
-                    "cantidad": cantidad,
-                    "precio": precio,
-                    "fecha": fecha,
-                    "descuentos": total_descuentos,
-                    "rendimiento": 0.0,
-                }
-            )
-        elif tipo_op == "Rendimiento" and tipo in [
-            "Acciones AR",
-            "CEDEARs",
-            "Bonos AR",
-            "Criptomonedas",
-            "ETFs",
-            "FCIs AR",
-        ]:
-            rendimientos.setdefault(simbolo, deque()).append(
-                {"fecha": fecha, "valor": rendimiento, "descuentos": total_descuentos}
+            lots_by_symbol.setdefault(simbolo, FifoLots()).add(
+                cantidad, precio, precio, fecha, descuentos=total_descuentos
             )
+        elif tipo_op in INCOME_OPERATIONS and tipo in INCOME_INSTRUMENT_TYPES:
+            lots = lots_by_symbol.get(simbolo)
+            if lots is not None:
+                lots.distribute(rendimiento, total_descuentos)
         elif tipo_op == "Venta":
-            ventas.append(
-                {
-                    "fecha": fecha,
-                    "tipo": tipo,
-                    "simbolo": simbolo,
-                    "detalle": detalle,
-                    "cantidad": cantidad,
-                    "precio_venta": precio,
-                    "rendimiento_venta": rendimiento,
-                    "descuentos_venta": total_descuentos,
-                }
-            )
-
-    for simbolo, rends in rendimientos.items():
-        if simbolo not in compras_pendientes_hist:
-            continue
-        for rend in rends:
-            fecha_rend = rend["fecha"]
-            tenencia_total = sum(compra["cantidad"] for compra in compras_pendientes_hist[simbolo] if compra["fecha"] <= fecha_rend)
-            if tenencia_total == 0:
+            lots = lots_by_symbol.get(simbolo)
+            if lots is None or not lots.lots:
                 continue
-            for compra in compras_pendientes_hist[simbolo]:
-                if compra["fecha"] <= fecha_rend:
-                    proporcion = compra["cantidad"] / tenencia_total
-                    compra["rendimiento"] += rend["valor"] * proporcion
-                    compra["descuentos"] += rend["descuentos"] * proporcion
 
-    finished_ops: List[dict] = []
-    for venta in ventas:
-        simbolo = venta["simbolo"]
-        cantidad_vendida = venta["cantidad"]
-        tipo = venta["tipo"]
+            if tipo == "Plazo Fijo":
+                compra = lots.pop_lot()
+                precio_compra = compra.costo_precio / compra.cantidad if compra.cantidad else 0
+                finished_ops.append(
+                    {
+                        "fecha": fecha,
+                        "tipo": tipo,
+                        "simbolo": simbolo,
+                        "cantidad": cantidad,
+                        "precio_compra": precio_compra,
+                        "precio_venta": precio,
+                        "diferencia_valor": (precio - precio_compra) * cantidad,
+                        "descuentos": -(compra.descuentos + total_descuentos),
+                        "rendimiento": rendimiento,
+                        "resultado": rendimiento - compra.descuentos - total_descuentos,
+                    }
+                )
+                continue
 
-        if tipo == "Plazo Fijo":
-            if simbolo not in compras_pendientes_hist or not compras_pendientes_hist[simbolo]:
+            consumo = lots.consume(cantidad)
+            if consumo.cantidad < cantidad - 1e-9:
                 continue
-            compra = compras_pendientes_hist[simbolo].popleft()
+
+            diferencia_valor = precio * cantidad - consumo.costo_precio
+            descuentos_totales = -(consumo.descuentos + total_descuentos)
+            rendimiento_total = rendimiento + consumo.rendimiento
+            resultado = rendimiento_total + descuentos_totales + diferencia_valor
+
             finished_ops.append(
                 {
-                    "fecha": venta["fecha"],
+                    "fecha": fecha,
                     "tipo": tipo,
                     "simbolo": simbolo,
-                    "cantidad": cantidad_vendida,
-                    "precio_compra": compra["precio"],
-                    "precio_venta": venta["precio_venta"],
-                    "diferencia_valor": (venta["precio_venta"] - compra["precio"]) * cantidad_vendida,
-                    "descuentos": -(compra["descuentos"] + venta["descuentos_venta"]),
-                    "rendimiento": venta["rendimiento_venta"],
-                    "resultado": venta["rendimiento_venta"] - compra["descuentos"] - venta["descuentos_venta"],
+                    "cantidad": cantidad,
+                    "precio_compra": consumo.costo_precio / cantidad if cantidad else 0,
+                    "precio_venta": precio,
+                    "diferencia_valor": diferencia_valor,
+                    "descuentos": descuentos_totales,
+                    "rendimiento": rendimiento_total,
+                    "resultado": resultado,
                 }
             )
-            continue
-
-        if simbolo not in compras_pendientes_hist or not compras_pendientes_hist[simbolo]:
-            continue
-
-        costo_total = 0.0
-        total_compra_discounts = 0.0
-        total_rendimiento = 0.0
-        cantidad_restante = cantidad_vendida
-
-        while cantidad_restante > 0 and compras_pendientes_hist[simbolo]:
-            compra = compras_pendientes_hist[simbolo][0]
-            compra_cantidad = compra["cantidad"]
-            cantidad_usada = min(compra_cantidad, cantidad_restante)
-            proporcion = cantidad_usada / compra_cantidad if compra_cantidad else 0
-            costo_total += compra["precio"] * cantidad_usada
-            total_compra_discounts += compra["descuentos"] * proporcion
-            total_rendimiento += compra["rendimiento"] * proporcion
-
-            compra["cantidad"] -= cantidad_usada
-            cantidad_restante -= cantidad_usada
-            if compra["cantidad"] <= 0:
-                compras_pendientes_hist[simbolo].popleft()
-            else:
-                compras_pendientes_hist[simbolo][0] = compra
-
-        if cantidad_restante > 0:
-            continue
-
-        valor_venta = venta["precio_venta"] * cantidad_vendida
-        diferencia_valor = valor_venta - costo_total
-        descuentos_totales = -(total_compra_discounts + venta["descuentos_venta"])
-        rendimiento_total = venta["rendimiento_venta"] + total_rendimiento
-        resultado = rendimiento_total + descuentos_totales + diferencia_valor
-
-        finished_ops.append(
-            {
-                "fecha": venta["fecha"],
-                "tipo": tipo,
-                "simbolo": simbolo,
-                "cantidad": cantidad_vendida,
-                "precio_compra": costo_total / cantidad_vendida if cantidad_vendida else 0,
-                "precio_venta": venta["precio_venta"],
-                "diferencia_valor": diferencia_valor,
-                "descuentos": descuentos_totales,
-                "rendimiento": rendimiento_total,
-                "resultado": resultado,
-            }
-        )
 
     return finished_ops
 
@@ -226,56 +451,7 @@ def recompute_portfolio_rows(journal_rows: Iterable[dict]) -> List[dict]:
     Recalcula el portafolio agregando todas las operaciones del journal.
     Devuelve filas listas para guardar en la tabla `portfolio`.
     """
-    portfolio = {}
-    for row in journal_rows:
-        tipo = row.get("tipo")
-        simbolo = row.get("simbolo")
-        tipo_operacion = row.get("tipo_operacion")
-        broker = row.get("broker") or "GENERAL"
-        moneda = row.get("moneda") or "ARS"
-        if not simbolo or not tipo_operacion:
-            continue
-
-        # Saltar efectivo líquido
-        if tipo in ["Depósito ARS", "Depósito USD", "DepІsito ARS", "DepІsito USD"]:
-            continue
-
-        try:
-            cantidad = _to_float(row.get("cantidad"))
-            costo_total = _to_float(row.get("costo_total"))
-        except Exception:
-            continue
-
-        key = (simbolo, broker)
-        if key not in portfolio:
-            portfolio[key] = {"tipo": tipo, "moneda": moneda, "cantidad": 0.0, "costo_acumulado": 0.0}
-
-        if tipo_operacion in ["Compra", "Entrada"]:
-            portfolio[key]["cantidad"] += cantidad
-            portfolio[key]["costo_acumulado"] += costo_total
-        elif tipo_operacion in ["Venta", "Salida"]:
-            if portfolio[key]["cantidad"] < cantidad or portfolio[key]["cantidad"] == 0:
-                continue
-            proporcion = cantidad / portfolio[key]["cantidad"]
-            costo_venta = portfolio[key]["costo_acumulado"] * proporcion
-            portfolio[key]["cantidad"] -= cantidad
-            portfolio[key]["costo_acumulado"] -= costo_venta
-
-    rows_to_save = []
-    for (simbolo, broker), data in portfolio.items():
-        if data["cantidad"] > 0:
-            precio_promedio = data["costo_acumulado"] / data["cantidad"]
-            rows_to_save.append(
-                {
-                    "simbolo": simbolo,
-                    "broker": broker,
-                    "tipo": data["tipo"],
-                    "moneda": data["moneda"],
-                    "cantidad": data["cantidad"],
-                    "precio_prom": precio_promedio,
-                }
-            )
-    return rows_to_save
+    return LotLedger.from_rows(journal_rows).portfolio_rows()
 
 
 def next_plazo_fijo_number(journal_rows: Iterable[dict]) -> int:
@@ -0,0 +1,358 @@
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from services.portfolio import compute_cash_by_broker
+
+if TYPE_CHECKING:
+    from services.market import MarketQuotes
+
+FxLookup = Callable[[datetime, str], Optional[float]]
+
+
+def safe_number(value, default=0.0):
+    try:
+        num = float(value)
+    except Exception:
+        return default
+    if math.isnan(num) or math.isinf(num):
+        return default
+    return num
+
+
+@dataclass(frozen=True)
+class PortfolioSnapshot:
+    """Valuación inmutable del portafolio, independiente de la vista que la muestre."""
+
+    items: Tuple[Mapping[str, object], ...]
+    cash_by_broker: Mapping[str, Mapping[str, float]]
+    fx_rate: float
+    tc_compra_by_symbol: Mapping[str, float]
+    tc_actual_by_tipo: Mapping[str, Optional[float]]
+    created_at: datetime = field(default_factory=datetime.now)
+
+    def tc_compra(self, simbolo: str) -> float:
+        tc = self.tc_compra_by_symbol.get(simbolo, self.fx_rate)
+        return tc if tc > 0 else self.fx_rate
+
+    def tc_actual(self, tipo: str) -> float:
+        return self.tc_actual_by_tipo.get(tipo) or self.fx_rate
+
+
+def build_portfolio_snapshot(
+    journal_rows: Iterable[dict],
+    portfolio_rows: Iterable[dict],
+    crypto_prices: Mapping[str, dict],
+    market_quotes: Optional["MarketQuotes"],
+    average_costs: Mapping[Tuple[str, str], float],
+    fx_lookup: FxLookup,
+    brokers: Sequence[str] = (),
+    now: Optional[datetime] = None,
+) -> PortfolioSnapshot:
+    """Valúa el portafolio completo sin tocar la UI.
+
+    ``fx_lookup(fecha, tipo)`` resuelve el tipo de cambio de un tipo de activo
+    para una fecha; ``average_costs`` es el costo promedio de los lotes abiertos
+    por (broker, símbolo).
+    """
+    now = now or datetime.now()
+    journal_rows = list(journal_rows)
+
+    plazo_fijo_detalles = {}
+    descuentos_por_simbolo = {}
+    rendimientos_por_simbolo = {}
+    tc_weighted_by_symbol = {}
+    tc_weighted_amount = {}
+    for row in journal_rows:
+        simbolo = row.get("simbolo", "")
+        tipo_op = row.get("tipo_operacion", "")
+        tipo = row.get("tipo", "")
+
+        # Recolectar descuentos
+        if tipo_op in ["Compra", "Dividendos"]:
+            total_desc = safe_number(str(row.get("total_descuentos", 0)).replace(',', '.'), 0)
+            descuentos_por_simbolo[simbolo] = descuentos_por_simbolo.get(simbolo, 0) + total_desc
+
+        # Recolectar rendimientos
+        if tipo_op == "Dividendos":
+            rendimiento = safe_number(str(row.get("rendimiento", 0)).replace(',', '.'), 0)
+            rendimientos_por_simbolo[simbolo] = rendimientos_por_simbolo.get(simbolo, 0) + rendimiento
+
+        if tipo_op == "Compra" and simbolo:
+            try:
+                cantidad = float(row.get("cantidad", 0) or 0)
+                precio = float(str(row.get("precio", 0)).replace(",", ".") or 0)
+            except Exception:
+                cantidad = 0
+                precio = 0
+            monto = cantidad * precio
+            if monto > 0:
+                tc_val = 0
+                try:
+                    fecha_dt = datetime.strptime(row.get("fecha", ""), "%Y-%m-%d")
+                    tc_val = fx_lookup(fecha_dt, tipo) or 0
+                except Exception:
+                    tc_val = 0
+                if tc_val <= 0:
+                    tc_val = safe_number(row.get("tc_usd_ars", 0) or 0, 0)
+                if tc_val > 0:
+                    tc_weighted_by_symbol[simbolo] = tc_weighted_by_symbol.get(simbolo, 0.0) + (tc_val * monto)
+                    tc_weighted_amount[simbolo] = tc_weighted_amount.get(simbolo, 0.0) + monto
+
+        if tipo == "Plazo Fijo" and simbolo:
+            plazo_fijo_detalles[simbolo] = row.get("detalle", "")
+
+    tc_actual_by_tipo: Dict[str, Optional[float]] = {}
+
+    def tc_actual_for(tipo_item):
+        if tipo_item not in tc_actual_by_tipo:
+            tc_actual_by_tipo[tipo_item] = fx_lookup(now, tipo_item)
+        return tc_actual_by_tipo[tipo_item]
+
+    # Efectivo por moneda/broker
+    cash_by_broker = {}
+    for moneda in ("ARS", "USD"):
+        balances = {broker: 0.0 for broker in brokers}
+        for broker, val in compute_cash_by_broker(journal_rows, moneda).items():
+            balances[broker] = balances.get(broker, 0.0) + val
+        cash_by_broker[moneda] = balances
+    fx_rate = tc_actual_for("Acciones AR") or 1.0
+    if market_quotes is not None:
+        fx_rate = market_quotes.mep_rate(fx_rate)
+
+    portfolio_data = []
+
+    # Efectivo por broker combinando ARS y USD en una fila
+    cash_combined = {}
+    for moneda, key in (("ARS", "ars"), ("USD", "usd")):
+        for broker, amount in cash_by_broker[moneda].items():
+            if abs(amount) >= 0.0001:
+                cash_combined.setdefault(broker, {'ars': 0.0, 'usd': 0.0})
+                cash_combined[broker][key] += amount
+
+    for broker, amounts in cash_combined.items():
+        moneda_label = "ARS/USD" if amounts['ars'] and amounts['usd'] else ("ARS" if amounts['ars'] else "USD")
+        portfolio_data.append({
+            'tipo': "Efectivo",
+            'broker': broker,
+            'moneda': moneda_label,
+            'simbolo': broker,
+            'simbolo_display': f"Liquidez {broker}",
+            'detalle': f"Liquidez en {broker}",
+            'precio_prom': 1.0,
+            'cantidad': 0,  # no aplica cantidad única
+            'precio_actual': 1.0,
+            'variacion_diaria': 0.0,
+            'monto_ars': amounts.get('ars', 0.0),
+            'monto_usd': amounts.get('usd', 0.0)
+        })
+
+    # Otros activos desde la tabla portfolio
+    for row in portfolio_rows:
+        simbolo = row['simbolo']
+        tipo = row['tipo']
+        simbolo_display = simbolo
+        if tipo == "Plazo Fijo":
+            detalle = plazo_fijo_detalles.get(simbolo, "")
+            if detalle:
+                simbolo_display = f"{simbolo} ({detalle})"
+        if tipo == "Efectivo Líquido":
+            continue
+        portfolio_data.append({
+            'tipo': tipo,
+            'broker': row['broker'],
+            'moneda': row['moneda'],
+            'simbolo': simbolo,
+            'simbolo_display': simbolo_display,
+            'detalle': "",
+            'precio_prom': float(row['precio_prom']),
+            'cantidad': float(row['cantidad'])
+        })
+
+    for item in portfolio_data:
+        moneda_item = item.get('moneda', 'ARS')
+        if item['tipo'] in ("Efectivo", "Plazo Fijo"):
+            item['precio_operacion_compra'] = 1.0
+            item['valor_compra'] = item['cantidad'] * item['precio_operacion_compra']
+            item['precio_actual'] = 1.0
+            item['valor_actual'] = item['cantidad'] * item['precio_actual']
+            item['diferencia_valor'] = item['valor_actual'] - item['valor_compra']
+            item['variacion_diaria'] = 0.0
+        else:
+            item['precio_operacion_compra'] = average_costs.get((item['broker'], item['simbolo']), 0.0)
+            item['valor_compra'] = item['cantidad'] * item['precio_operacion_compra']
+
+            # Precio actual y variación diaria del mercado
+            item['precio_actual'] = None
+            item['variacion_diaria'] = None
+            if item['tipo'] == "Criptomonedas":
+                symbol_key = (item.get("simbolo") or "").strip().upper()
+                price_row = crypto_prices.get(symbol_key)
+                if price_row:
+                    item['precio_actual'] = safe_number(price_row.get("price_usd"), None)
+                    item['variacion_diaria'] = safe_number(price_row.get("change_24h"), None)
+            if item['precio_actual'] is None and market_quotes is not None:
+                quote = market_quotes.get(item['simbolo'])
+                if quote is not None:
+                    precio = quote.precio
+                    if precio is not None and item['tipo'] == "Bonos AR":
+                        precio = precio * 0.01
+                    item['precio_actual'] = precio
+                    item['variacion_diaria'] = quote.variacion
+
+            if item['precio_actual'] is not None:
+                item['valor_actual'] = item['cantidad'] * item['precio_actual']
+            else:
+                item['valor_actual'] = item['valor_compra']
+            item['valor_actual'] = safe_number(item['valor_actual'], item['valor_compra'])
+            item['diferencia_valor'] = item['valor_actual'] - item['valor_compra']
+
+        # Descuentos totales (base = comisiones del libro) más el costo estimado de salida
+        descuento_total = descuentos_por_simbolo.get(item['simbolo'], 0)
+        item['comisiones_base'] = descuento_total
+        if item['tipo'] in ["Acciones AR", "CEDEARs", "ETFs", "Criptomonedas"]:
+            item['descuentos'] = descuento_total + 0.008228 * item['valor_actual']
+        elif item['tipo'] == "Bonos AR":
+            item['descuentos'] = descuento_total + 0.006171 * item['valor_actual']
+        else:  # Efectivo, Plazo Fijo
+            item['descuentos'] = 0
+
+        item['rendimientos'] = rendimientos_por_simbolo.get(item['simbolo'], 0.0)
+        item['resultado'] = item['diferencia_valor'] - item['descuentos'] + item['rendimientos']
+
+        # Valores convertidos por tipo de activo
+        tc_actual = tc_actual_for(item.get("tipo", "")) or fx_rate
+        if tc_actual <= 0:
+            tc_actual = fx_rate
+        simbolo = item.get("simbolo", "")
+        tc_compra = fx_rate
+        if simbolo in tc_weighted_by_symbol and tc_weighted_amount.get(simbolo, 0) > 0:
+            tc_compra = tc_weighted_by_symbol[simbolo] / tc_weighted_amount[simbolo]
+        if tc_compra <= 0:
+            tc_compra = fx_rate
+        item["tc_compra"] = tc_compra
+        item["tc_actual"] = tc_actual
+
+        if item['tipo'] == "Efectivo":
+            valor_ars = safe_number(item.get('monto_ars', 0.0), 0.0)
+            valor_usd = safe_number(item.get('monto_usd', 0.0), 0.0)
+        elif moneda_item == "USD":
+            valor_ars = safe_number(item['valor_actual'], 0.0) * tc_actual
+            valor_usd = safe_number(item['valor_actual'], 0.0)
+        else:
+            valor_ars = safe_number(item['valor_actual'], 0.0)
+            valor_usd = valor_ars / tc_actual if tc_actual else valor_ars
+        item['valor_ars'] = valor_ars
+        item['valor_usd'] = valor_usd
+
+    tc_compra_by_symbol = {
+        simbolo: tc_weighted_by_symbol[simbolo] / amount
+        for simbolo, amount in tc_weighted_amount.items()
+        if amount > 0
+    }
+    return PortfolioSnapshot(
+        items=tuple(MappingProxyType(item) for item in portfolio_data),
+        cash_by_broker=MappingProxyType({k: MappingProxyType(v) for k, v in cash_by_broker.items()}),
+        fx_rate=fx_rate,
+        tc_compra_by_symbol=MappingProxyType(tc_compra_by_symbol),
+        tc_actual_by_tipo=MappingProxyType(dict(tc_actual_by_tipo)),
+        created_at=now,
+    )
+
+
+@dataclass(frozen=True)
+class PortfolioProjection:
+    """Lo que muestra una vista: filas ya filtradas/agrupadas y sus totales."""
+
+    items: List[dict]
+    total_valor_ars: float
+    total_valor_usd: float
+    total_valor: float
+    total_assets_ars: float
+
+
+def _aggregate_by_symbol(items: Sequence[Mapping[str, object]]) -> List[dict]:
+    """Suma las posiciones de un mismo (tipo, símbolo, moneda) en distintos brokers."""
+    grouped = {}
+    passthrough = []
+    for item in items:
+        simbolo = item.get("simbolo")
+        if not simbolo:
+            passthrough.append(dict(item))
+            continue
+        key = (item.get("tipo"), simbolo, item.get("moneda", "ARS"))
+        if key not in grouped:
+            grouped[key] = {
+                **item,
+                "cantidad": 0.0,
+                "valor_compra": 0.0,
+                "valor_actual": 0.0,
+                "valor_ars": 0.0,
+                "valor_usd": 0.0,
+                "descuentos": 0.0,
+                "rendimientos": 0.0,
+                "comisiones_base": 0.0,
+                "_brokers": set(),
+            }
+        g = grouped[key]
+        g["_brokers"].add(item.get("broker"))
+        for field_name in (
+            "cantidad",
+            "valor_compra",
+            "valor_actual",
+            "valor_ars",
+            "valor_usd",
+            "descuentos",
+            "rendimientos",
+            "comisiones_base",
+        ):
+            g[field_name] += safe_number(item.get(field_name, 0.0), 0.0)
+        if g.get("precio_actual") is None and item.get("precio_actual") is not None:
+            g["precio_actual"] = item.get("precio_actual")
+        if g.get("variacion_diaria") is None and item.get("variacion_diaria") is not None:
+            g["variacion_diaria"] = item.get("variacion_diaria")
+
+    aggregated = []
+    for g in grouped.values():
+        if g["cantidad"] > 0:
+            g["precio_operacion_compra"] = g["valor_compra"] / g["cantidad"]
+            g["precio_actual"] = g["valor_actual"] / g["cantidad"]
+        else:
+            g["precio_operacion_compra"] = 0.0
+        g["diferencia_valor"] = g["valor_actual"] - g["valor_compra"]
+        g["resultado"] = g["diferencia_valor"] - g["descuentos"] + g["rendimientos"]
+        brokers = g.pop("_brokers", set())
+        g["broker"] = "Varios" if len(brokers) > 1 else next(iter(brokers), "")
+        aggregated.append(g)
+    return aggregated + passthrough
+
+
+def project_portfolio(
+    snapshot: PortfolioSnapshot,
+    include_cash: bool = True,
+    currency: str = "Todos",
+    aggregate_by_symbol: bool = False,
+    display_currency: str = "ARS",
+) -> PortfolioProjection:
+    """Proyección barata de una valuación para una vista concreta."""
+    items = [
+        dict(item)
+        for item in snapshot.items
+        if include_cash or item.get("tipo") not in ("Efectivo", "Efectivo Líquido")
+    ]
+    total_assets_ars = sum(p.get("valor_ars", 0) for p in items)
+    if currency != "Todos":
+        items = [p for p in items if p.get("moneda", "ARS") == currency]
+    if aggregate_by_symbol:
+        items = _aggregate_by_symbol(items)
+    total_valor_ars = sum(p.get("valor_ars", 0) for p in items)
+    total_valor_usd = sum(p.get("valor_usd", 0) for p in items)
+    return PortfolioProjection(
+        items=items,
+        total_valor_ars=total_valor_ars,
+        total_valor_usd=total_valor_usd,
+        total_valor=total_valor_usd if display_currency == "USD" else total_valor_ars,
+        total_assets_ars=total_assets_ars,
+    )
@@ -0,0 +1,130 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+# Vigencia de las cotizaciones por clase de activo
+ASSET_CLASS_TTLS = {
+    "mercado": timedelta(minutes=20),
+    "cripto": timedelta(minutes=15),
+    "fx": timedelta(hours=1),
+}
+# Espera antes de reintentar una clase cuyo refresco falló
+FAILED_REFRESH_RETRY = timedelta(minutes=2)
+
+
+class CachedQuote(NamedTuple):
+    simbolo: str
+    precio: Optional[float]
+    variacion: Optional[float]
+    updated_at: datetime
+    clase: str
+
+
+# refresh() -> {simbolo: (precio, variacion, updated_at)}; lanza excepción si falla
+QuoteRefresher = Callable[[], Mapping[str, Tuple[Optional[float], Optional[float], datetime]]]
+
+
+class QuoteCache:
+    """Última cotización por símbolo, con vigencia por clase de activo.
+
+    Las entradas se guardan por (clase, símbolo): un mismo símbolo puede
+    cotizar en más de una clase (p. ej. BTC en cripto y en el panel de Ripio
+    del mercado). Las lecturas no esperan a la red: devuelven lo que haya
+    aunque esté vencido y ``age``/``is_stale`` dicen cuánto.
+    ``refresh_expired`` lanza en segundo plano sólo las clases vencidas que
+    tienen refresco registrado; las demás (p. ej. "mercado", que se descarga
+    a pedido) se cargan con ``put_many``. Al terminar bien cada refresco se
+    llama a ``on_updated(clase)`` desde el hilo de trabajo; si falla no hay
+    datos nuevos y no se avisa.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Mapping[str, timedelta]] = None,
+        now: Callable[[], datetime] = datetime.now,
+    ) -> None:
+        self.ttls = dict(ASSET_CLASS_TTLS if ttls is None else ttls)
+        self.on_updated: Optional[Callable[[str], None]] = None
+        self._now = now
+        self._quotes: Dict[Tuple[str, str], CachedQuote] = {}
+        self._refreshers: Dict[str, QuoteRefresher] = {}
+        self._next_refresh: Dict[str, datetime] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def register(self, clase: str, refresher: QuoteRefresher) -> None:
+        self._refreshers[clase] = refresher
+
+    def put_many(self, clase: str, quotes: Mapping[str, Tuple[Optional[float], Optional[float], datetime]]) -> None:
+        """Actualiza cotizaciones de ``clase``; la vigencia cuenta desde la más vieja.
+
+        Los símbolos que no vienen conservan su último valor (y su antigüedad).
+        """
+        entries = {
+            (clase, simbolo): CachedQuote(simbolo, precio, variacion, updated_at, clase)
+            for simbolo, (precio, variacion, updated_at) in quotes.items()
+        }
+        oldest = min((q.updated_at for q in entries.values()), default=None)
+        with self._lock:
+            self._quotes.update(entries)
+            if oldest is not None:
+                self._next_refresh[clase] = oldest + self.ttls.get(clase, timedelta(0))
+
+    def get(self, clase: str, simbolo: str) -> Optional[CachedQuote]:
+        with self._lock:
+            return self._quotes.get((clase, simbolo))
+
+    def age(self, clase: str, simbolo: str) -> Optional[timedelta]:
+        quote = self.get(clase, simbolo)
+        if quote is None:
+            return None
+        return self._now() - quote.updated_at
+
+    def is_stale(self, clase: str, simbolo: str) -> bool:
+        quote = self.get(clase, simbolo)
+        if quote is None:
+            return False
+        return self._now() - quote.updated_at > self.ttls.get(clase, timedelta(0))
+
+    def expired_classes(self) -> List[str]:
+        now = self._now()
+        with self._lock:
+            return [
+                clase for clase in self._refreshers
+                if clase not in self._refreshing and self._next_refresh.get(clase, now) <= now
+            ]
+
+    def refresh_expired(self, classes: Optional[Iterable[str]] = None) -> List[str]:
+        """Lanza el refresco de las clases vencidas que no estén en curso; devuelve cuáles."""
+        expired = self.expired_classes()
+        if classes is not None:
+            expired = [clase for clase in expired if clase in set(classes)]
+        started = []
+        for clase in expired:
+            with self._lock:
+                if clase in self._refreshing:
+                    continue
+                self._refreshing.add(clase)
+            threading.Thread(target=self._refresh, args=(clase,), daemon=True).start()
+            started.append(clase)
+        return started
+
+    def _refresh(self, clase: str) -> None:
+        updated = False
+        try:
+            quotes = self._refreshers[clase]()
+            self.put_many(clase, quotes)
+            # Tras un refresco la vigencia cuenta desde ahora, aunque la fuente
+            # traiga datos viejos (p. ej. el último cierre de un fin de semana)
+            with self._lock:
+                self._next_refresh[clase] = self._now() + self.ttls.get(clase, timedelta(0))
+            updated = True
+        except Exception as e:
+            print(f"Error refrescando cotizaciones {clase}: {e}")
+            with self._lock:
+                self._next_refresh[clase] = self._now() + FAILED_REFRESH_RETRY
+        finally:
+            with self._lock:
+                self._refreshing.discard(clase)
+        if updated and self.on_updated is not None:
+            self.on_updated(clase)
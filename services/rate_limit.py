@@ -0,0 +1,57 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+
+def _host(url_or_host: str) -> str:
+    return urlsplit(url_or_host).netloc or url_or_host
+
+
+def backoff_delay(attempt: int, base: float = 1.0, factor: float = 2.0, maximum: float = 30.0) -> float:
+    """Espera antes del reintento ``attempt`` (1, 2, ...): exponencial con algo de jitter."""
+    delay = min(maximum, base * factor ** max(attempt - 1, 0))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class HostRateLimiter:
+    """Espaciado mínimo entre pedidos a un mismo host, compartido entre hilos.
+
+    ``acquire`` reserva el próximo turno del host bajo el lock y duerme fuera
+    de él, así varios hilos contra hosts distintos no se bloquean entre sí.
+    ``per_host`` fija un intervalo propio para hosts con límites más estrictos.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 0.5,
+        per_host: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.min_interval = min_interval
+        self.per_host = dict(per_host or {})
+        self._clock = clock
+        self._sleep = sleep
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url_or_host: str) -> float:
+        """Bloquea hasta que toque el turno del host; devuelve lo que esperó."""
+        host = _host(url_or_host)
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.per_host.get(host, self.min_interval)
+        delay = slot - now
+        if delay > 0:
+            self._sleep(delay)
+        return delay
+
+    def penalize(self, url_or_host: str, delay: float) -> None:
+        """Posterga el próximo turno del host (p. ej. tras un 429 o Retry-After)."""
+        host = _host(url_or_host)
+        with self._lock:
+            now = self._clock()
+            self._next_slot[host] = max(self._next_slot.get(host, now), now + delay)
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Los tests importan los módulos de la raíz del repo (db_utils, services, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Base SQLite temporaria e inicializada en ``tmp_path``."""
+    import db_utils
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db_utils, "DB_PATH", str(tmp_path / "portfolio.db"))
+    # Las cachés de db_utils son del proceso, no de la base: no deben pasar de un test a otro
+    db_utils.invalidate_journal_cache()
+    db_utils.invalidate_fx_cache()
+    db_utils.init_db()
+    yield tmp_path
+    db_utils.close_thread_connection()
+    db_utils.invalidate_journal_cache()
+    db_utils.invalidate_fx_cache()
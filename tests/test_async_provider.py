@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from portfolio_app.data_providers.async_provider import ExecutorAsyncProvider, as_async_provider
+from portfolio_app.models.asset import Asset, AssetType
+from portfolio_app.models.operation import Operation, OperationType
+from portfolio_app.services.metrics_service import MetricsService
+from portfolio_app.services.portfolio_service import PortfolioService
+from portfolio_app.storage.in_memory import InMemoryStore
+
+
+class StaticProvider:
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def get_bulk_prices(self, symbols):
+        symbols = list(symbols)
+        self.calls.append(symbols)
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+class HangingProvider:
+    """Blocks until released, like a provider whose socket never answers."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = 0
+        self._lock = threading.Lock()
+
+    def get_bulk_prices(self, symbols):
+        with self._lock:
+            self.started += 1
+        self.release.wait(5)
+        return {s: 1.0 for s in symbols}
+
+
+class NativeAsyncProvider:
+    async def get_bulk_prices(self, symbols):
+        await asyncio.sleep(0)
+        return {s: 7.0 for s in symbols}
+
+
+@pytest.fixture
+def hanging():
+    provider = HangingProvider()
+    yield provider
+    provider.release.set()
+
+
+def _service():
+    store = InMemoryStore()
+    service = PortfolioService(store)
+    for symbol in ("AAPL", "KO"):
+        service.register_asset(Asset(symbol=symbol, asset_type=AssetType.STOCK, name=symbol))
+        service.register_operation(
+            Operation(asset_symbol=symbol, op_type=OperationType.BUY, quantity=2, price=10, date=date(2024, 1, 2))
+        )
+    return service
+
+
+def test_first_provider_in_priority_order_wins():
+    primary = StaticProvider({"AAPL": 100.0})
+    secondary = StaticProvider({"AAPL": 1.0, "KO": 50.0})
+    metrics = asyncio.run(MetricsService(_service(), primary).compute_metrics_async([primary, secondary]))
+    assert metrics["market_value"] == pytest.approx(2 * 100.0 + 2 * 50.0)
+    assert metrics["asset_returns"] == {"AAPL": pytest.approx(180.0), "KO": pytest.approx(80.0)}
+
+
+def test_timed_out_provider_yields_nothing_while_fast_one_answers(hanging):
+    fast = StaticProvider({"AAPL": 100.0, "KO": 50.0})
+    slow = ExecutorAsyncProvider(hanging, timeout=0.1)
+    start = time.perf_counter()
+    metrics = asyncio.run(MetricsService(_service(), fast).compute_metrics_async([slow, fast]))
+    assert time.perf_counter() - start < 2
+    assert metrics["market_value"] == pytest.approx(300.0)
+    assert asyncio.run(slow.get_bulk_prices(["AAPL"])) == {}
+
+
+def test_hung_provider_is_capped_at_its_own_pool(hanging):
+    slow = ExecutorAsyncProvider(hanging, max_concurrency=2, timeout=0.05, chunk_size=1)
+    fast = ExecutorAsyncProvider(StaticProvider({"KO": 50.0}), timeout=1.0)
+    for _ in range(3):
+        assert asyncio.run(slow.get_bulk_prices(["A", "B", "C", "D"])) == {}
+    # Calls still stuck after their timeout keep at most max_concurrency threads busy
+    assert hanging.started == 2
+    assert asyncio.run(fast.get_bulk_prices(["KO"])) == {"KO": 50.0}
+
+
+def test_native_async_provider_is_passed_through():
+    native = NativeAsyncProvider()
+    assert as_async_provider(native) is native
+    wrapped = as_async_provider(StaticProvider({"KO": 50.0}), max_concurrency=3)
+    assert isinstance(wrapped, ExecutorAsyncProvider) and wrapped.max_concurrency == 3
+    metrics = asyncio.run(MetricsService(_service(), native).compute_metrics_async())
+    assert metrics["market_value"] == pytest.approx(4 * 7.0)
+
+
+def test_chunks_are_priced_separately_and_merged():
+    provider = StaticProvider({"AAPL": 1.0, "KO": 2.0, "MELI": 3.0})
+    adapter = ExecutorAsyncProvider(provider, chunk_size=2)
+    assert asyncio.run(adapter.get_bulk_prices(["AAPL", "KO", "MELI", "AAPL", ""])) == {
+        "AAPL": 1.0, "KO": 2.0, "MELI": 3.0,
+    }
+    assert sorted(provider.calls) == [["AAPL", "KO"], ["MELI"]]
@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+
+from portfolio_app.data_providers.caching_provider import CachingPriceProvider
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CountingProvider:
+    def __init__(self, prices):
+        self.prices = dict(prices)
+        self.calls = []
+        self.fail = False
+
+    def get_bulk_prices(self, symbols):
+        symbols = list(symbols)
+        self.calls.append(symbols)
+        if self.fail:
+            raise ConnectionError("sin conexión")
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+class BlockingProvider(CountingProvider):
+    def __init__(self, prices):
+        super().__init__(prices)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def get_bulk_prices(self, symbols):
+        self.entered.set()
+        self.release.wait(5)
+        return super().get_bulk_prices(symbols)
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    provider = CountingProvider({"AAPL": 100.0, "KO": 50.0})
+    cache = CachingPriceProvider(provider, ttl_seconds=60, clock=clock)
+    assert cache.get_bulk_prices(["AAPL", "KO"]) == {"AAPL": 100.0, "KO": 50.0}
+    clock.now += 30
+    provider.prices["AAPL"] = 101.0
+    assert cache.get_bulk_prices(["AAPL", "KO"]) == {"AAPL": 100.0, "KO": 50.0}
+    clock.now += 31
+    assert cache.get_latest_price("AAPL") == 101.0
+    assert provider.calls == [["AAPL", "KO"], ["AAPL"]]
+
+
+def test_least_recently_used_entry_is_evicted_at_max_size():
+    provider = CountingProvider({"A": 1.0, "B": 2.0, "C": 3.0})
+    cache = CachingPriceProvider(provider, max_size=2, clock=Clock())
+    cache.get_bulk_prices(["A", "B"])
+    cache.get_bulk_prices(["A"])  # B pasa a ser el menos usado
+    cache.get_bulk_prices(["C"])
+    provider.calls.clear()
+    assert cache.get_bulk_prices(["A", "B", "C"]) == {"A": 1.0, "B": 2.0, "C": 3.0}
+    assert provider.calls == [["B"]]
+
+
+def test_reload_from_db_keeps_only_entries_within_ttl(tmp_path):
+    db_path = str(tmp_path / "prices.db")
+    clock = Clock()
+    provider = CountingProvider({"OLD": 1.0, "NEW": 2.0})
+    cache = CachingPriceProvider(provider, ttl_seconds=60, db_path=db_path, clock=clock)
+    cache.get_bulk_prices(["OLD"])
+    clock.now += 40
+    cache.get_bulk_prices(["NEW"])
+    clock.now += 30
+
+    reloaded_provider = CountingProvider({"OLD": 9.0, "NEW": 9.0})
+    reloaded = CachingPriceProvider(reloaded_provider, ttl_seconds=60, db_path=db_path, clock=clock)
+    assert reloaded.get_bulk_prices(["NEW", "OLD"]) == {"NEW": 2.0, "OLD": 9.0}
+    assert reloaded_provider.calls == [["OLD"]]
+
+
+def test_concurrent_requests_share_one_bulk_call():
+    provider = BlockingProvider({"AAPL": 100.0, "KO": 50.0})
+    cache = CachingPriceProvider(provider, clock=Clock())
+    results = {}
+
+    def fetch(name, symbols):
+        results[name] = cache.get_bulk_prices(symbols)
+
+    owner = threading.Thread(target=fetch, args=("owner", ["AAPL", "KO"]))
+    owner.start()
+    assert provider.entered.wait(5)
+    waiter = threading.Thread(target=fetch, args=("waiter", ["KO"]))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    provider.release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == {"owner": {"AAPL": 100.0, "KO": 50.0}, "waiter": {"KO": 50.0}}
+    assert provider.calls == [["AAPL", "KO"]]
+
+
+def test_waiter_gets_no_stale_price_when_owner_fetch_fails():
+    clock = Clock()
+    provider = BlockingProvider({"KO": 50.0})
+    provider.release.set()
+    cache = CachingPriceProvider(provider, ttl_seconds=60, clock=clock)
+    cache.get_bulk_prices(["KO"])
+    clock.now += 120
+    provider.release.clear()
+    provider.entered.clear()
+    provider.fail = True
+    results = {}
+
+    def owner():
+        with pytest.raises(ConnectionError):
+            cache.get_bulk_prices(["KO"])
+
+    thread = threading.Thread(target=owner)
+    thread.start()
+    assert provider.entered.wait(5)
+    waiter = threading.Thread(target=lambda: results.update(waiter=cache.get_bulk_prices(["KO"])))
+    waiter.start()
+    waiter.join(0.1)
+    provider.release.set()
+    thread.join(5)
+    waiter.join(5)
+    assert results == {"waiter": {}}
+
+
+def test_waiter_gives_up_after_wait_timeout():
+    provider = BlockingProvider({"KO": 50.0})
+    cache = CachingPriceProvider(provider, clock=Clock(), wait_timeout=0.05)
+    owner = threading.Thread(target=cache.get_bulk_prices, args=(["KO"],))
+    owner.start()
+    try:
+        assert provider.entered.wait(5)
+        assert cache.get_bulk_prices(["KO"]) == {}
+    finally:
+        provider.release.set()
+        owner.join(5)
@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import db_utils
+from services import crypto
+from services.crypto import CoinGeckoResolver
+
+T0 = datetime(2024, 3, 4, 12, 0)
+
+
+class Clock:
+    def __init__(self, now=T0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSearch:
+    """Respuestas de /search por símbolo; ``down`` simula la red caída."""
+
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.down = False
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, symbol):
+        with self._lock:
+            self.calls.append(symbol)
+        if self.down:
+            raise ConnectionError("timeout")
+        coin_id = self.results.get(symbol)
+        return {"coins": [{"id": coin_id, "symbol": symbol}] if coin_id else []}
+
+
+def test_resolve_many_reads_crypto_map_once(db, monkeypatch):
+    db_utils.upsert_crypto_maps([("FOO", "foo-coin")])
+    reads = []
+    fetch_maps = crypto.fetch_crypto_maps
+    monkeypatch.setattr(crypto, "fetch_crypto_maps", lambda: reads.append(1) or fetch_maps())
+    search = FakeSearch({"bar": "bar-token"})
+    resolver = CoinGeckoResolver(search, now=Clock())
+
+    assert resolver.resolve_many(["foo", "BTC", " bar ", "BAR"]) == {
+        "FOO": "foo-coin",
+        "BTC": "bitcoin",
+        "BAR": "bar-token",
+    }
+    assert len(reads) == 1
+    assert search.calls == ["bar"]
+    assert db_utils.fetch_crypto_maps() == {"FOO": "foo-coin", "BTC": "bitcoin", "BAR": "bar-token"}
+
+    assert resolver.resolve("bar") == "bar-token"
+    assert search.calls == ["bar"]
+
+
+def test_miss_is_not_searched_again_before_it_expires(db):
+    clock = Clock()
+    search = FakeSearch()
+    resolver = CoinGeckoResolver(search, now=clock)
+
+    assert resolver.resolve_many(["ZZZ"]) == {}
+    clock.now = T0 + timedelta(hours=23)
+    assert resolver.resolve_many(["ZZZ"]) == {}
+    assert search.calls == ["zzz"]
+
+    clock.now = T0 + timedelta(hours=24)
+    search.results["zzz"] = "zzz-coin"
+    assert resolver.resolve_many(["ZZZ"]) == {"ZZZ": "zzz-coin"}
+    assert search.calls == ["zzz", "zzz"]
+    assert db_utils.fetch_crypto_map_misses() == {}
+
+
+def test_miss_backoff_doubles_up_to_max_miss_ttl(db):
+    clock = Clock()
+    resolver = CoinGeckoResolver(FakeSearch(), now=clock, miss_ttl=timedelta(hours=24), max_miss_ttl=timedelta(days=3))
+    waits = []
+    for _ in range(4):
+        resolver.resolve_many(["ZZZ"])
+        intentos, retry_after = db_utils.fetch_crypto_map_misses()["ZZZ"]
+        retry_at = datetime.strptime(retry_after, "%Y-%m-%d %H:%M:%S")
+        waits.append((intentos, retry_at - clock.now))
+        clock.now = retry_at
+    assert waits == [
+        (1, timedelta(hours=24)),
+        (2, timedelta(hours=48)),
+        (3, timedelta(days=3)),
+        (4, timedelta(days=3)),
+    ]
+
+
+def test_network_error_is_not_recorded_as_a_miss(db):
+    search = FakeSearch({"zzz": "zzz-coin"})
+    search.down = True
+    resolver = CoinGeckoResolver(search, now=Clock())
+
+    assert resolver.resolve_many(["ZZZ"]) == {}
+    assert db_utils.fetch_crypto_map_misses() == {}
+
+    search.down = False
+    assert resolver.resolve_many(["ZZZ"]) == {"ZZZ": "zzz-coin"}
+    assert search.calls == ["zzz", "zzz"]
+
+
+@pytest.mark.parametrize("data, expected", [
+    ({"coins": [{"id": "wrapped-x", "symbol": "WX"}, {"id": "x-coin", "symbol": "X"}]}, "x-coin"),
+    ({"coins": [{"id": "first", "symbol": "OTHER"}]}, "first"),
+    ({"coins": []}, None),
+    ([], None),
+])
+def test_pick_coingecko_id_prefers_exact_symbol(data, expected):
+    assert crypto.pick_coingecko_id("x", data) == expected
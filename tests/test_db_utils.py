@@ -0,0 +1,153 @@
+import pandas as pd
+import pytest
+
+import db_utils
+
+
+def _journal_row(fecha, simbolo="GGAL"):
+    row = {col: 0 for col in (
+        "cantidad", "precio", "rendimiento", "total_sin_desc", "comision", "iva_21", "derechos",
+        "iva_derechos", "total_descuentos", "costo_total", "ingreso_total", "balance", "tc_usd_ars",
+    )}
+    row.update(
+        fecha=fecha, tipo="Acciones", tipo_operacion="Compra", simbolo=simbolo, detalle="",
+        plazo="T+1", broker="IOL", moneda="ARS",
+    )
+    return row
+
+
+def test_query_plans_use_expected_indexes(db):
+    assert db_utils.audit_query_plans() == {}
+
+
+@pytest.mark.parametrize("name, sql, params, index", db_utils.QUERY_PLAN_EXPECTATIONS)
+def test_query_plan_names_index(db, name, sql, params, index):
+    with db_utils.get_conn() as conn:
+        plan = [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+    assert any(index in detail for detail in plan), (name, plan)
+
+
+def test_insert_journal_row_normalizes_fecha(db):
+    row = _journal_row("15/03/2024")
+    db_utils.insert_journal_row(row)
+    db_utils.insert_journal_row(_journal_row("2024-02-01"))
+    assert row["fecha"] == "2024-03-15"
+    assert [r["fecha"] for r in db_utils.fetch_journal()] == ["2024-02-01", "2024-03-15"]
+
+
+def test_legacy_market_data_is_dropped_once_by_migration(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db_utils, "DB_PATH", str(tmp_path / "portfolio.db"))
+    with db_utils.get_conn() as conn:
+        conn.execute("CREATE TABLE market_data (simbolo TEXT, updated_at TEXT)")
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+    try:
+        db_utils.init_db()
+        with db_utils.get_conn() as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            assert "market_data" not in tables
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db_utils.MIGRATIONS)
+            # Una tabla con ese nombre ya no se toca al guardar fotos de mercado
+            conn.execute("CREATE TABLE market_data (simbolo TEXT)")
+            conn.commit()
+        db_utils.save_market_data(
+            pd.DataFrame([["Cedears", "AAPL", 10.0, 1.0, 100.0]], columns=db_utils.MARKET_COLUMNS)
+        )
+        with db_utils.get_conn() as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "market_data" in tables
+        df, _ = db_utils.fetch_market_data()
+        assert df["simbolo"].tolist() == ["AAPL"]
+    finally:
+        db_utils.close_thread_connection()
+        db_utils.invalidate_journal_cache()
+        db_utils.invalidate_fx_cache()
+
+
+def _write_csv(path, header, rows):
+    path.write_text("\n".join([header] + rows) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_import_portfolio_skips_bad_rows_and_reports_their_lines(db):
+    csv_path = _write_csv(
+        db / "portfolio.csv",
+        "Simbolo,Broker,Tipo,Moneda,Cantidad,Precio_Promedio",
+        [
+            "GGAL,IOL,Acciones AR,ARS,10,5000",
+            'AL30,IOL,Bonos AR,,"1.500,5","70.123,45"',
+            "YPFD,IOL,Acciones AR,ARS,abc,20000",
+            'KO,IOL,CEDEARs,USD,"1,2,3",10',
+            "MELI,IOL,CEDEARs,USD,,",
+        ],
+    )
+    result = db_utils.import_portfolio_from_csv(csv_path)
+
+    assert result.imported == 3
+    assert [line for line, _ in result.errors] == [4, 5]
+    assert all(motivo.startswith("ValueError: ") for _, motivo in result.errors)
+    rows = {row["simbolo"]: row for row in db_utils.fetch_portfolio()}
+    assert sorted(rows) == ["AL30", "GGAL", "MELI"]
+    assert (rows["AL30"]["moneda"], rows["AL30"]["cantidad"], rows["AL30"]["precio_prom"]) == ("ARS", 1500.5, 70123.45)
+    assert (rows["MELI"]["cantidad"], rows["MELI"]["precio_prom"]) == (0.0, 0.0)
+
+
+def test_import_reports_missing_columns_per_row(db):
+    csv_path = _write_csv(db / "portfolio.csv", "Simbolo,Broker,Tipo", ["GGAL,IOL,Acciones AR"])
+    result = db_utils.import_portfolio_from_csv(csv_path)
+    assert result.imported == 0
+    assert result.errors == [(2, "KeyError: 'Cantidad'")]
+
+
+def test_import_progress_runs_after_each_chunk(db):
+    csv_path = _write_csv(
+        db / "analysis.csv",
+        "Tipo,Simbolo",
+        [f"Acciones AR,S{i}" for i in range(5)],
+    )
+    progress = []
+    result = db_utils._import_csv(
+        csv_path,
+        "analysis",
+        ("tipo", "simbolo"),
+        lambda row: (row["Tipo"], row["Simbolo"]),
+        progress=progress.append,
+        chunk_size=2,
+    )
+    assert result.imported == 5
+    assert progress == [2, 4, 5]
+
+
+def test_import_journal_normalizes_dates_and_local_numbers(db):
+    header = (
+        "Fecha,Tipo,Tipo_Operacion,Simbolo,Detalle,Plazo,Cantidad,Precio,Rendimiento,Total_Sin_Descuentos,"
+        "Comision,IVA_21,Derechos,IVA_Derechos,Total_Descuentos,Costo_Total,Ingreso_Total,Balance,Broker,Moneda,"
+        "TC_USD_ARS"
+    )
+    csv_path = _write_csv(
+        db / "journal.csv",
+        header,
+        [
+            '15/03/2024,Acciones AR,Compra,GGAL,,,10,"5.000,5",0,0,0,0,0,0,0,"50.005,00",0,0,IOL,ARS,0',
+            "2024-02-01,Acciones AR,Compra,YPFD,,T+0,x,1,0,0,0,0,0,0,0,0,0,0,IOL,ARS,0",
+        ],
+    )
+    result = db_utils.import_journal_from_csv(csv_path)
+    assert (result.imported, [line for line, _ in result.errors]) == (1, [3])
+    (row,) = db_utils.fetch_journal()
+    assert (row["fecha"], row["plazo"], row["precio"], row["costo_total"]) == ("2024-03-15", "T+1", 5000.5, 50005.0)
+
+
+def test_db_fixture_does_not_inherit_cached_fx_series(tmp_path, monkeypatch, request):
+    otra = tmp_path / "otra"
+    otra.mkdir()
+    monkeypatch.chdir(otra)
+    monkeypatch.setattr(db_utils, "DB_PATH", str(otra / "portfolio.db"))
+    db_utils.init_db()
+    db_utils.upsert_fx_rates_bulk([("2024-01-02", "oficial", "ambito", 800.0, 840.0)])
+    assert db_utils.fetch_fx_rate_on_or_before("2024-01-05", "oficial", "ambito")["venta"] == 840.0
+    db_utils.close_thread_connection()
+
+    request.getfixturevalue("db")
+    assert db_utils.fetch_fx_rate_on_or_before("2024-01-05", "oficial", "ambito") is None
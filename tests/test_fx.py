@@ -0,0 +1,31 @@
+import pandas as pd
+
+from services.fx import parse_ambito_series, parse_fx_dates
+
+
+def test_parse_fx_dates_accepts_padded_unpadded_and_iso():
+    parsed = parse_fx_dates(["01/02/2024", "1/2/2024", "9/12/2023", "2024-01-02", "2024-01-02T10:00:00"])
+    assert list(parsed) == [
+        pd.Timestamp("2024-02-01"),
+        pd.Timestamp("2024-02-01"),
+        pd.Timestamp("2023-12-09"),
+        pd.Timestamp("2024-01-02"),
+        pd.Timestamp("2024-01-02 10:00"),
+    ]
+
+
+def test_parse_fx_dates_leaves_invalid_as_nat():
+    parsed = parse_fx_dates(["basura", "", "31/02/2024"])
+    assert parsed.isna().all()
+
+
+def test_parse_ambito_series_keeps_unpadded_rows():
+    data = [
+        ["Fecha", "Compra", "Venta"],
+        ["5/1/2024", "810,50", "850,50"],
+        ["04/01/2024", "808,00", "848,00"],
+        ["fecha rota", "1,00", "1,00"],
+    ]
+    series = parse_ambito_series(data)
+    assert list(series.index) == [pd.Timestamp("2024-01-04"), pd.Timestamp("2024-01-05")]
+    assert list(series) == [808.0, 810.5]
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+import db_utils
+from services.fx_backfill import FxBackfillJob, plan_chunks
+
+START = datetime(2024, 1, 1)
+
+
+class FakeFetch:
+    """Serie constante por tramo; ``failing`` lista los tramos que siempre fallan."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, tipo, desde, hasta):
+        with self._lock:
+            self.calls.append((tipo, desde, hasta))
+        if (tipo, desde) in self.failing:
+            raise ConnectionError("503 Service Unavailable")
+        return pd.Series([1000.0], index=pd.DatetimeIndex([desde]))
+
+
+def _job(fetch, end, **kwargs):
+    kwargs.setdefault("sleep", lambda seconds: None)
+    return FxBackfillJob(fetch, ["oficial", "blue"], START, end, "ambito", chunk_days=10, **kwargs)
+
+
+def _chunks():
+    return db_utils.fetch_fx_backfill_chunks("ambito")
+
+
+def test_plan_chunk_boundaries_are_stable_as_end_moves():
+    first = plan_chunks(START, datetime(2024, 1, 25), chunk_days=10)
+    later = plan_chunks(START, datetime(2024, 2, 20), chunk_days=10)
+    assert first == [
+        (datetime(2024, 1, 1), datetime(2024, 1, 11)),
+        (datetime(2024, 1, 12), datetime(2024, 1, 22)),
+        (datetime(2024, 1, 23), datetime(2024, 1, 25)),
+    ]
+    assert later[:2] == first[:2]
+    assert later[2][0] == first[2][0]
+    assert later[-1][1] == datetime(2024, 2, 20)
+
+
+def test_completed_chunks_are_skipped_on_the_next_run(db):
+    fetch = FakeFetch()
+    assert _job(fetch, datetime(2024, 1, 25)).run() == []
+    assert len(fetch.calls) == 6
+    assert {record["estado"] for record in _chunks().values()} == {"ok"}
+
+    fetch.calls.clear()
+    assert _job(fetch, datetime(2024, 1, 25)).run() == []
+    assert fetch.calls == []
+
+    # Al avanzar el fin sólo se bajan el último tramo (ahora más largo) y los nuevos
+    _job(fetch, datetime(2024, 2, 5)).run()
+    assert sorted({desde for _, desde, _ in fetch.calls}) == [datetime(2024, 1, 23), datetime(2024, 2, 3)]
+
+
+def test_failed_chunk_is_saved_as_error_and_retried_on_the_next_run(db):
+    failing = ("blue", datetime(2024, 1, 12))
+    fetch = FakeFetch(failing=[failing])
+    sleeps = []
+    errors = _job(fetch, datetime(2024, 1, 25), max_attempts=3, sleep=sleeps.append).run()
+
+    assert errors == ["Backfill ambito blue 2024-01-12 a 2024-01-22: 503 Service Unavailable"]
+    assert sum(1 for tipo, desde, _ in fetch.calls if (tipo, desde) == failing) == 3
+    assert len(sleeps) == 2
+    record = _chunks()[("blue", "2024-01-12")]
+    assert (record["estado"], record["intentos"], record["error"]) == ("error", 3, "503 Service Unavailable")
+
+    fetch.failing.clear()
+    fetch.calls.clear()
+    assert _job(fetch, datetime(2024, 1, 25)).run() == []
+    assert [(tipo, desde) for tipo, desde, _ in fetch.calls] == [failing]
+    record = _chunks()[("blue", "2024-01-12")]
+    assert (record["estado"], record["intentos"], record["filas"]) == ("ok", 1, 11)
@@ -0,0 +1,136 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.http import HttpClient
+
+API = "https://api.example.com"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+            server.headers_seen.append(dict(self.headers))
+        if self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, headers={"ETag": '"v1"'})
+            else:
+                self._send(200, b'{"valor": 1}', {"ETag": '"v1"', "Content-Type": "application/json"})
+        elif self.path == "/flaky":
+            if hits <= 2:
+                self._send(503, b"ocupado")
+            else:
+                self._send(200, b"ok")
+        elif self.path == "/down":
+            self._send(503, b"ocupado")
+        elif self.path.startswith("/search"):
+            self._send(200, json.dumps({"coins": []}).encode())
+        else:
+            self._send(200, b"hola")
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.hits = {}
+    httpd.headers_seen = []
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _client(server, tmp_path, **kwargs):
+    kwargs.setdefault("ttl_by_prefix", {f"{API}/": 60})
+    return HttpClient(
+        cache_dir=str(tmp_path / "http"),
+        base_url=f"http://127.0.0.1:{server.server_address[1]}",
+        backoff=0,
+        **kwargs,
+    )
+
+
+def _expire(client, url):
+    path = client._cache_path(url)
+    with open(path, encoding="utf-8") as f:
+        entry = json.load(f)
+    entry["fetched_at"] = 0
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+
+
+def test_fresh_copy_is_served_without_network(server, tmp_path):
+    client = _client(server, tmp_path)
+    assert client.get_text(f"{API}/plain") == "hola"
+    assert client.get_text(f"{API}/plain") == "hola"
+    assert server.hits["/plain"] == 1
+
+
+def test_expired_copy_is_revalidated_with_etag(server, tmp_path):
+    client = _client(server, tmp_path)
+    assert client.get_json(f"{API}/etag") == {"valor": 1}
+    _expire(client, f"{API}/etag")
+
+    assert client.get_json(f"{API}/etag") == {"valor": 1}
+    assert server.hits["/etag"] == 2
+    assert server.headers_seen[-1].get("If-None-Match") == '"v1"'
+    # El 304 renovó la copia: el siguiente pedido no va a la red
+    assert client.get_json(f"{API}/etag") == {"valor": 1}
+    assert server.hits["/etag"] == 2
+
+
+def test_5xx_is_retried(server, tmp_path):
+    client = _client(server, tmp_path, retries=3)
+    assert client.get_text(f"{API}/flaky") == "ok"
+    assert server.hits["/flaky"] == 3
+
+
+def test_persistent_5xx_raises(server, tmp_path):
+    client = _client(server, tmp_path, retries=1)
+    with pytest.raises(Exception):
+        client.get_text(f"{API}/down")
+    assert server.hits["/down"] == 2
+
+
+def test_authenticated_requests_are_not_cached(server, tmp_path):
+    client = _client(server, tmp_path)
+    headers = {"Authorization": "BEARER secreto"}
+    assert client.get_text(f"{API}/plain", headers=headers) == "hola"
+    assert client.get_text(f"{API}/plain", headers=headers) == "hola"
+    assert server.hits["/plain"] == 2
+    assert not list((tmp_path / "http").iterdir())
+
+
+def test_cache_if_skips_empty_results(server, tmp_path):
+    client = _client(server, tmp_path)
+    url = f"{API}/search?query=nada"
+    for _ in range(2):
+        assert client.get_json(url, cache_if=lambda data: bool(data.get("coins"))) == {"coins": []}
+    assert server.hits["/search?query=nada"] == 2
+
+
+def test_no_retry_client_makes_a_single_request(server, tmp_path):
+    client = _client(server, tmp_path, retries=0)
+    with pytest.raises(Exception):
+        client.get_text(f"{API}/down")
+    assert server.hits["/down"] == 1
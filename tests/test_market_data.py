@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("bs4")
+
+import market_data  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+PAGINA_VACIA = "<html><body><p>Mantenimiento</p></body></html>"
+
+
+def _fixture(nombre):
+    with open(os.path.join(FIXTURES, nombre), encoding="utf-8") as fh:
+        return fh.read()
+
+
+class _Respuesta:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+class _SesionGrabada:
+    """Sustituto de requests.Session que responde con páginas guardadas por URL."""
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.headers = {}
+        self.pedidas = []
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def get(self, url, timeout=None):
+        self.pedidas.append(url)
+        return _Respuesta(self.paginas[url])
+
+
+def test_parse_iol_table_columns_and_values():
+    df = market_data.parse_iol_table(_fixture("iol_cedears.html"))
+
+    assert list(df.columns) == [
+        "Símbolo", "Último Operado", "Variación Diaria", "Cantidad Compra", "Precio Compra",
+        "Precio Venta", "Cantidad Venta", "Apertura", "Mínimo", "Máximo", "Último Cierre",
+        "Monto Operado",
+    ]
+    assert len(df) == 12
+    assert list(df["Símbolo"][:3]) == ["AAPL Apple Inc.", "KO Coca-Cola Co.", "MELI MercadoLibre Inc."]
+    assert df["Último Operado"].tolist()[:3] == [15250.5, 9870.0, 21400.0]
+    assert df["Variación Diaria"].tolist()[:3] == [1.25, -0.5, 0.0]
+    assert df["Símbolo"].iloc[-1] == "XOM Exxon Mobil Corp."
+    assert df.loc[0, "Monto Operado"] == pytest.approx(1234567.89)
+
+
+def test_parse_iol_table_without_table():
+    assert market_data.parse_iol_table(PAGINA_VACIA) is None
+
+
+def test_parse_iol_table_with_empty_body():
+    html = '<table id="cotizaciones"><thead><tr><th>Símbolo</th></tr></thead><tbody></tbody></table>'
+    assert market_data.parse_iol_table(html) is None
+
+
+def test_parse_ripio_columns_and_values():
+    df = market_data.parse_ripio(_fixture("ripio_criptomonedas.html"))
+
+    assert list(df.columns) == ["Símbolo", "Moneda", "Precio Compra", "Precio Venta", "Variación Diaria"]
+    # El ítem incompleto (DAI) se descarta
+    assert df.to_dict("records") == [
+        {"Símbolo": "BTC", "Moneda": "Bitcoin", "Precio Compra": "95.123.456,78",
+         "Precio Venta": "97.000.000,00", "Variación Diaria": "2,35%"},
+        {"Símbolo": "ETH", "Moneda": "Ethereum", "Precio Compra": "3.456.789,00",
+         "Precio Venta": "3.520.000,00", "Variación Diaria": "0,50%"},
+    ]
+
+
+def test_parse_ripio_without_list():
+    assert market_data.parse_ripio(PAGINA_VACIA) is None
+
+
+def test_parse_ripio_with_empty_list():
+    assert market_data.parse_ripio('<div id="cotizaciones-list"></div>') is None
+
+
+def _primera_pagina(html, filas):
+    """La página de IOL con sólo las primeras ``filas`` filas, como si viniera paginada."""
+    cabeza, resto = html.split("<tbody>")
+    cuerpo, cola = resto.split("</tbody>")
+    filas_html = cuerpo.split("</tr>")[:filas]
+    return cabeza + "<tbody>" + "</tr>".join(filas_html) + "</tr>\n    </tbody>" + cola
+
+
+def test_http_source_falls_back_to_selenium_when_parse_is_empty_or_paginated(monkeypatch):
+    pagina = market_data.FILAS_PAGINA_IOL
+    fuentes = [
+        market_data.FuenteMercado("Cedears", "https://iol.test/cedears", market_data.parse_iol_table, None, pagina),
+        market_data.FuenteMercado("Bonos", "https://iol.test/bonos", market_data.parse_iol_table, None, pagina),
+        market_data.FuenteMercado("ONs", "https://iol.test/ons", market_data.parse_iol_table, None, pagina),
+        market_data.FuenteMercado("Ripio", "https://ripio.test/", market_data.parse_ripio, None),
+    ]
+    sesion = _SesionGrabada({
+        "https://iol.test/cedears": _fixture("iol_cedears.html"),
+        "https://iol.test/bonos": PAGINA_VACIA,
+        "https://iol.test/ons": _primera_pagina(_fixture("iol_cedears.html"), pagina),
+        "https://ripio.test/": _fixture("ripio_criptomonedas.html"),
+    })
+    por_navegador = []
+
+    def descargar_fuentes(pendientes):
+        por_navegador.extend(nombre for nombre, _ in pendientes)
+        return {"Bonos": pd.DataFrame({"Símbolo": ["AL30 Bono"], "Último Operado": [70000.0]})}, {"ONs": "timeout (120s)"}
+
+    monkeypatch.setattr(market_data, "_fuentes_mercado", lambda: fuentes)
+    monkeypatch.setattr(market_data.requests, "Session", sesion)
+    monkeypatch.setattr(market_data, "_descargar_fuentes", descargar_fuentes)
+
+    errores = []
+    df = market_data.descargar_datos_mercado(None, errores)
+
+    assert len(sesion.pedidas) == 4
+    assert por_navegador == ["Bonos", "ONs"]
+    assert errores == [("ONs", "HTTP: 10 filas, posible primera página; navegador: timeout (120s)")]
+    assert df["Fuente"].tolist() == ["Cedears"] * 12 + ["Bonos"] + ["Ripio"] * 2
+
+
+def test_descargar_http_reports_empty_parse(monkeypatch):
+    sesion = _SesionGrabada({"https://iol.test/bonos": PAGINA_VACIA})
+    fuente = market_data.FuenteMercado("Bonos", "https://iol.test/bonos", market_data.parse_iol_table, None)
+    monkeypatch.setattr(market_data.requests, "Session", sesion)
+
+    resultados, errores = market_data._descargar_http([fuente])
+
+    assert resultados == {}
+    assert errores == {"Bonos": "sin datos"}
+
+
+class _DriverFalso:
+    """Driver de Selenium mínimo: ``quit`` destraba a quien espera en ``cerrado``."""
+
+    def __init__(self):
+        self.cerrado = threading.Event()
+
+    def quit(self):
+        self.cerrado.set()
+
+
+def test_descargar_fuentes_keeps_results_of_sources_that_did_not_fail(monkeypatch):
+    drivers = []
+
+    def crear_driver():
+        driver = _DriverFalso()
+        drivers.append(driver)
+        return driver
+
+    def lenta(driver):
+        # Como Selenium: la llamada colgada termina con error al cerrar la sesión
+        driver.cerrado.wait(5)
+        raise RuntimeError("sesión cerrada")
+
+    def rota(driver):
+        raise ValueError("tabla inesperada\ndetalle del stack")
+
+    def buena(driver):
+        return pd.DataFrame({"Símbolo": ["AAPL Apple"], "Último Operado": [100.0]})
+
+    monkeypatch.setattr(market_data, "_crear_driver", crear_driver)
+    inicio = time.monotonic()
+    resultados, errores = market_data._descargar_fuentes(
+        [("Lenta", lenta), ("Rota", rota), ("Buena", buena), ("Vacía", lambda driver: None)],
+        max_navegadores=2,
+        timeout=0.3,
+    )
+
+    assert time.monotonic() - inicio < 4
+    assert list(resultados) == ["Buena"]
+    assert errores == {"Lenta": "timeout (0.3s)", "Rota": "tabla inesperada", "Vacía": "sin datos"}
+    assert drivers and all(driver.cerrado.is_set() for driver in drivers)
+
+
+def test_descargar_fuentes_times_out_a_hung_browser_start(monkeypatch):
+    arranques = []
+    arranques_lock = threading.Lock()
+    liberar = threading.Event()
+
+    def crear_driver():
+        # El primer arranque de Chrome no vuelve (cuál fuente lo sufre depende del pool)
+        with arranques_lock:
+            arranques.append(threading.current_thread().name)
+            colgado = len(arranques) == 1
+        if colgado:
+            liberar.wait(5)
+        return _DriverFalso()
+
+    fuente = lambda driver: pd.DataFrame({"a": [1]})  # noqa: E731
+    monkeypatch.setattr(market_data, "_crear_driver", crear_driver)
+    inicio = time.monotonic()
+    try:
+        resultados, errores = market_data._descargar_fuentes(
+            [("A", fuente), ("B", fuente)], max_navegadores=2, timeout=0.3
+        )
+    finally:
+        liberar.set()
+
+    assert time.monotonic() - inicio < 4
+    assert len(resultados) == 1
+    assert list(errores.values()) == ["timeout (0.3s)"]
+    assert set(resultados) | set(errores) == {"A", "B"}
@@ -0,0 +1,147 @@
+import pytest
+
+from services.portfolio import (
+    LotLedger,
+    compute_finished_operations,
+    compute_holdings_by_broker,
+    recompute_portfolio_rows,
+)
+
+
+def _op(row_id, fecha, tipo_op, cantidad, precio, simbolo="GGAL", broker="IOL"):
+    total = cantidad * precio
+    return {
+        "id": row_id,
+        "fecha": fecha,
+        "tipo": "Acciones AR",
+        "tipo_operacion": tipo_op,
+        "simbolo": simbolo,
+        "broker": broker,
+        "moneda": "ARS",
+        "cantidad": cantidad,
+        "precio": precio,
+        "costo_total": total if tipo_op in ("Compra", "Entrada") else 0.0,
+        "ingreso_total": total if tipo_op in ("Venta", "Salida") else 0.0,
+    }
+
+
+def test_precio_prom_is_weighted_average_cost():
+    rows = [
+        _op(1, "2024-01-01", "Compra", 10, 100),
+        _op(2, "2024-01-02", "Compra", 10, 200),
+        _op(3, "2024-01-03", "Venta", 10, 250),
+    ]
+    (row,) = recompute_portfolio_rows(rows)
+    assert row["cantidad"] == 10
+    assert row["precio_prom"] == pytest.approx(150)
+    # El costo de compra mostrado sigue siendo el de los lotes FIFO abiertos
+    assert LotLedger.from_rows(rows).average_cost("IOL", "GGAL") == pytest.approx(200)
+
+
+def test_oversold_sell_is_skipped_in_portfolio_rows():
+    rows = [
+        _op(1, "2024-01-01", "Compra", 10, 100),
+        _op(2, "2024-01-02", "Venta", 15, 120),
+        _op(3, "2024-01-03", "Salida", 4, 120),
+    ]
+    (row,) = recompute_portfolio_rows(rows)
+    assert row["cantidad"] == 6
+    assert row["precio_prom"] == pytest.approx(100)
+
+
+def test_holdings_count_only_compra_venta_and_clamp_at_zero():
+    rows = [
+        _op(1, "2024-01-01", "Compra", 10, 100),
+        _op(2, "2024-01-02", "Entrada", 5, 100),
+        _op(3, "2024-01-03", "Venta", 12, 120),
+        _op(4, "2024-01-04", "Entrada", 3, 100, simbolo="YPF"),
+    ]
+    assert compute_holdings_by_broker(rows) == {"IOL": {"GGAL": 0.0}}
+
+
+def test_back_dated_insert_and_removal_match_a_full_rebuild():
+    rows = [
+        _op(1, "2024-01-01", "Compra", 10, 100),
+        _op(2, "2024-01-05", "Venta", 8, 150),
+        _op(3, "2024-01-10", "Compra", 5, 120),
+    ]
+    back_dated = _op(4, "2024-01-03", "Compra", 4, 90)
+    ledger = LotLedger.from_rows(rows)
+    ledger.apply(back_dated)
+    expected = LotLedger.from_rows(sorted(rows + [back_dated], key=lambda r: (r["fecha"], r["id"])))
+    assert ledger.portfolio_rows() == expected.portfolio_rows()
+    assert ledger.holdings() == expected.holdings()
+    assert ledger.open_lots("IOL", "GGAL") == expected.open_lots("IOL", "GGAL")
+
+    assert ledger.remove_many([4, 2]) == {("IOL", "GGAL")}
+    rebuilt = LotLedger.from_rows([rows[0], rows[2]])
+    assert ledger.portfolio_rows() == rebuilt.portfolio_rows()
+    assert ledger.holdings() == rebuilt.holdings()
+
+
+def _journal(fecha, tipo_op, cantidad=0.0, precio=0.0, rendimiento=0.0, descuentos=0.0, tipo="Bonos AR", simbolo="AL30"):
+    return {
+        "fecha": fecha,
+        "tipo": tipo,
+        "tipo_operacion": tipo_op,
+        "simbolo": simbolo,
+        "cantidad": cantidad,
+        "precio": precio,
+        "rendimiento": rendimiento,
+        "total_descuentos": descuentos,
+    }
+
+
+def test_coupon_after_partial_sale_goes_only_to_units_still_held():
+    ops = compute_finished_operations([
+        _journal("2024-01-01", "Compra", 10, 100),
+        _journal("2024-01-10", "Venta", 4, 110),
+        _journal("2024-01-15", "Rendimiento", rendimiento=60),
+        _journal("2024-01-20", "Venta", 6, 120),
+    ])
+    assert [op["rendimiento"] for op in ops] == [0, pytest.approx(60)]
+    assert ops[1]["resultado"] == pytest.approx(60 + 6 * 20)
+
+
+def test_sale_dated_before_purchase_does_not_consume_it():
+    ops = compute_finished_operations([
+        _journal("2024-01-05", "Compra", 5, 100),
+        _journal("2024-01-01", "Venta", 5, 90),
+        _journal("2024-01-10", "Venta", 5, 120),
+    ])
+    assert [(op["fecha"], op["precio_compra"]) for op in ops] == [("2024-01-10", pytest.approx(100))]
+
+
+def test_purchase_discounts_are_prorated_across_partial_sells():
+    ops = compute_finished_operations([
+        _journal("2024-01-01", "Compra", 10, 100, descuentos=10),
+        _journal("2024-01-02", "Venta", 5, 100, descuentos=2),
+        _journal("2024-01-03", "Venta", 5, 100),
+    ])
+    assert [op["descuentos"] for op in ops] == [pytest.approx(-7), pytest.approx(-5)]
+    assert sum(op["resultado"] for op in ops) == pytest.approx(-12)
+
+
+@pytest.mark.parametrize("tipo_op", ["Rendimiento", "Dividendos"])
+def test_dividendos_count_as_income_like_rendimiento(tipo_op):
+    ops = compute_finished_operations([
+        _journal("2024-01-01", "Compra", 10, 50, tipo="Acciones AR", simbolo="GGAL"),
+        _journal("2024-02-01", tipo_op, rendimiento=30, descuentos=3, tipo="Acciones AR", simbolo="GGAL"),
+        _journal("2024-03-01", "Venta", 10, 50, tipo="Acciones AR", simbolo="GGAL"),
+    ])
+    (op,) = ops
+    assert op["rendimiento"] == pytest.approx(30)
+    assert op["descuentos"] == pytest.approx(-3)
+    assert op["resultado"] == pytest.approx(27)
+
+
+def test_plazo_fijo_close_pops_the_whole_lot():
+    ops = compute_finished_operations([
+        _journal("2024-01-01", "Compra", 1, 100000, descuentos=100, tipo="Plazo Fijo", simbolo="PF-1"),
+        _journal("2024-01-31", "Venta", 1, 100000, rendimiento=3500, tipo="Plazo Fijo", simbolo="PF-1"),
+    ])
+    (op,) = ops
+    assert op["precio_compra"] == pytest.approx(100000)
+    assert op["diferencia_valor"] == pytest.approx(0)
+    assert op["descuentos"] == pytest.approx(-100)
+    assert op["resultado"] == pytest.approx(3400)
@@ -0,0 +1,216 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import pytest
+
+from services.portfolio_snapshot import build_portfolio_snapshot, project_portfolio
+
+NOW = datetime(2024, 3, 4, 15, 0)
+
+
+class _Quote(NamedTuple):
+    simbolo: str
+    precio: Optional[float]
+    variacion: Optional[float]
+
+
+class _Quotes:
+    """Lo mínimo de MarketQuotes que usa la valuación."""
+
+    def __init__(self, quotes):
+        self._quotes = {s: _Quote(s, precio, variacion) for s, (precio, variacion) in quotes.items()}
+
+    def get(self, simbolo):
+        return self._quotes.get(simbolo)
+
+    def mep_rate(self, fallback=1.0):
+        return self._quotes["AL30"].precio / self._quotes["AL30D"].precio
+
+
+def _row(fecha, tipo, tipo_op, simbolo, moneda="ARS", cantidad=0.0, precio=0.0, costo_total=0.0,
+         ingreso_total=0.0, total_descuentos=0.0, rendimiento=0.0, tc_usd_ars=0.0, detalle="", broker="IOL"):
+    return {
+        "fecha": fecha, "tipo": tipo, "tipo_operacion": tipo_op, "simbolo": simbolo, "moneda": moneda,
+        "cantidad": cantidad, "precio": precio, "costo_total": costo_total, "ingreso_total": ingreso_total,
+        "total_descuentos": total_descuentos, "rendimiento": rendimiento, "tc_usd_ars": tc_usd_ars,
+        "detalle": detalle, "broker": broker,
+    }
+
+
+JOURNAL = [
+    _row("2024-01-02", "Depósito ARS", "Depósito", "", ingreso_total=300000),
+    _row("2024-01-02", "Depósito USD", "Depósito", "", moneda="USD", ingreso_total=1000),
+    _row("2024-01-03", "Acciones AR", "Compra", "GGAL", cantidad=10, precio=5000, costo_total=50500, total_descuentos=500),
+    _row("2024-01-04", "Criptomonedas", "Compra", "BTC", moneda="USD", cantidad=0.01, precio=40000, costo_total=400,
+         tc_usd_ars=850),
+    _row("2024-01-05", "Acciones AR", "Compra", "YPFD", cantidad=4, precio=20000, costo_total=80000),
+    _row("2024-01-08", "Plazo Fijo", "Compra", "PF-1", cantidad=100000, precio=1, costo_total=100000,
+         detalle="Banco Nación 30d"),
+    _row("2024-02-01", "Acciones AR", "Dividendos", "GGAL", ingreso_total=270, rendimiento=300, total_descuentos=30),
+]
+
+PORTFOLIO = [
+    {"simbolo": "GGAL", "broker": "IOL", "tipo": "Acciones AR", "moneda": "ARS", "cantidad": 10, "precio_prom": 5050},
+    {"simbolo": "GGAL", "broker": "BALANZ", "tipo": "Acciones AR", "moneda": "ARS", "cantidad": 5, "precio_prom": 5200},
+    {"simbolo": "BTC", "broker": "IOL", "tipo": "Criptomonedas", "moneda": "USD", "cantidad": 0.01, "precio_prom": 40000},
+    {"simbolo": "YPFD", "broker": "IOL", "tipo": "Acciones AR", "moneda": "ARS", "cantidad": 4, "precio_prom": 20000},
+    {"simbolo": "PF-1", "broker": "IOL", "tipo": "Plazo Fijo", "moneda": "ARS", "cantidad": 100000, "precio_prom": 1},
+    {"simbolo": "CAJA", "broker": "IOL", "tipo": "Efectivo Líquido", "moneda": "ARS", "cantidad": 1, "precio_prom": 1},
+]
+
+AVERAGE_COSTS = {("IOL", "GGAL"): 5000.0, ("BALANZ", "GGAL"): 5200.0, ("IOL", "BTC"): 40000.0, ("IOL", "YPFD"): 20000.0}
+CRYPTO_PRICES = {"BTC": {"price_usd": 50000.0, "change_24h": 2.5}}
+MARKET = {"GGAL": (6000.0, 1.5), "AL30": (72000.0, 0.0), "AL30D": (60.0, 0.0)}
+
+
+def _fx_lookup(fecha, tipo):
+    if fecha == NOW:
+        return {"Acciones AR": 1000.0, "Criptomonedas": 1100.0}.get(tipo)
+    # Sin dato histórico para cripto: se usa el tc_usd_ars de la fila
+    return {"Acciones AR": 800.0}.get(tipo)
+
+
+def snapshot(market=MARKET, fx_lookup=_fx_lookup):
+    return build_portfolio_snapshot(
+        JOURNAL,
+        PORTFOLIO,
+        CRYPTO_PRICES,
+        _Quotes(market) if market is not None else None,
+        AVERAGE_COSTS,
+        fx_lookup,
+        brokers=("IOL", "BALANZ"),
+        now=NOW,
+    )
+
+
+def _items(snap):
+    return {(item["tipo"], item["broker"], item["simbolo"]): item for item in snap.items}
+
+
+def test_cash_item_combines_ars_and_usd_per_broker():
+    snap = snapshot()
+    assert dict(snap.cash_by_broker["ARS"]) == {"IOL": pytest.approx(69770.0), "BALANZ": 0.0}
+    assert dict(snap.cash_by_broker["USD"]) == {"IOL": pytest.approx(600.0), "BALANZ": 0.0}
+    cash = _items(snap)[("Efectivo", "IOL", "IOL")]
+    assert cash["moneda"] == "ARS/USD"
+    assert cash["simbolo_display"] == "Liquidez IOL"
+    assert (cash["valor_ars"], cash["valor_usd"]) == (pytest.approx(69770.0), pytest.approx(600.0))
+    assert (cash["valor_actual"], cash["resultado"]) == (0, 0)
+    assert not any(item["broker"] == "BALANZ" and item["tipo"] == "Efectivo" for item in snap.items)
+
+
+def test_ars_item_with_market_quote():
+    snap = snapshot()
+    ggal = _items(snap)[("Acciones AR", "IOL", "GGAL")]
+    assert snap.fx_rate == pytest.approx(1200.0)  # MEP AL30/AL30D
+    assert ggal["precio_operacion_compra"] == 5000.0
+    assert (ggal["precio_actual"], ggal["variacion_diaria"]) == (6000.0, 1.5)
+    assert ggal["valor_compra"] == pytest.approx(50000.0)
+    assert ggal["valor_actual"] == pytest.approx(60000.0)
+    assert ggal["comisiones_base"] == pytest.approx(530.0)
+    assert ggal["descuentos"] == pytest.approx(530.0 + 0.008228 * 60000)
+    assert ggal["rendimientos"] == pytest.approx(300.0)
+    assert ggal["resultado"] == pytest.approx(10000.0 - (530.0 + 0.008228 * 60000) + 300.0)
+    assert (ggal["tc_compra"], ggal["tc_actual"]) == (pytest.approx(800.0), pytest.approx(1000.0))
+    assert (ggal["valor_ars"], ggal["valor_usd"]) == (pytest.approx(60000.0), pytest.approx(60.0))
+    assert snap.tc_compra("GGAL") == pytest.approx(800.0)
+
+
+def test_ars_item_without_market_quote_is_valued_at_cost():
+    ypfd = _items(snapshot())[("Acciones AR", "IOL", "YPFD")]
+    assert ypfd["precio_actual"] is None and ypfd["variacion_diaria"] is None
+    assert ypfd["valor_actual"] == ypfd["valor_compra"] == pytest.approx(80000.0)
+    assert ypfd["resultado"] == pytest.approx(-0.008228 * 80000)
+    assert ypfd["valor_usd"] == pytest.approx(80.0)
+
+
+def test_usd_crypto_item_uses_crypto_price_and_row_fx():
+    snap = snapshot()
+    btc = _items(snap)[("Criptomonedas", "IOL", "BTC")]
+    assert (btc["precio_actual"], btc["variacion_diaria"]) == (50000.0, 2.5)
+    assert btc["valor_actual"] == pytest.approx(500.0)
+    assert btc["resultado"] == pytest.approx(100.0 - 0.008228 * 500)
+    assert (btc["tc_compra"], btc["tc_actual"]) == (pytest.approx(850.0), pytest.approx(1100.0))
+    assert (btc["valor_ars"], btc["valor_usd"]) == (pytest.approx(550000.0), pytest.approx(500.0))
+    assert snap.tc_actual("Criptomonedas") == pytest.approx(1100.0)
+
+
+def test_plazo_fijo_and_liquid_cash_rows():
+    items = _items(snapshot())
+    pf = items[("Plazo Fijo", "IOL", "PF-1")]
+    assert pf["simbolo_display"] == "PF-1 (Banco Nación 30d)"
+    assert pf["valor_actual"] == pf["valor_compra"] == pytest.approx(100000.0)
+    assert (pf["descuentos"], pf["resultado"]) == (0, 0)
+    assert not any(item["tipo"] == "Efectivo Líquido" for item in items.values())
+
+
+def test_missing_fx_rate_falls_back_to_one():
+    snap = snapshot(market=None, fx_lookup=lambda fecha, tipo: None)
+    assert snap.fx_rate == 1.0
+    ggal = _items(snap)[("Acciones AR", "IOL", "GGAL")]
+    assert ggal["precio_actual"] is None
+    assert (ggal["tc_compra"], ggal["tc_actual"]) == (1.0, 1.0)
+    assert ggal["valor_usd"] == ggal["valor_ars"] == pytest.approx(50000.0)
+    btc = _items(snap)[("Criptomonedas", "IOL", "BTC")]
+    # El tc_usd_ars de la compra sigue valiendo como tc de compra
+    assert (btc["tc_compra"], btc["valor_ars"]) == (pytest.approx(850.0), pytest.approx(500.0))
+    assert snap.tc_compra("YPFD") == 1.0
+
+
+def test_snapshot_items_are_read_only():
+    item = snapshot().items[0]
+    with pytest.raises(TypeError):
+        item["valor_ars"] = 0
+
+
+def test_projection_without_cash_keeps_total_assets_of_non_cash_items():
+    snap = snapshot()
+    full = project_portfolio(snap)
+    sin_efectivo = project_portfolio(snap, include_cash=False)
+    assert len(full.items) == len(snap.items) == 6
+    assert [item["tipo"] for item in sin_efectivo.items if item["tipo"] == "Efectivo"] == []
+    assert full.total_valor_ars - sin_efectivo.total_valor_ars == pytest.approx(69770.0)
+    assert sin_efectivo.total_assets_ars == pytest.approx(sin_efectivo.total_valor_ars)
+
+
+def test_projection_currency_filter_does_not_change_total_assets():
+    snap = snapshot()
+    usd = project_portfolio(snap, currency="USD")
+    assert [item["simbolo"] for item in usd.items] == ["BTC"]
+    assert (usd.total_valor_ars, usd.total_valor_usd) == (pytest.approx(550000.0), pytest.approx(500.0))
+    assert usd.total_assets_ars == pytest.approx(project_portfolio(snap).total_valor_ars)
+    # El efectivo mixto ("ARS/USD") no entra en ninguno de los dos filtros
+    ars = project_portfolio(snap, currency="ARS")
+    assert sorted(item["simbolo"] for item in ars.items) == ["GGAL", "GGAL", "PF-1", "YPFD"]
+
+
+def test_projection_aggregates_positions_across_brokers():
+    snap = snapshot()
+    by_broker = [item for item in snap.items if item["simbolo"] == "GGAL"]
+    (ggal,) = [item for item in project_portfolio(snap, aggregate_by_symbol=True).items if item["simbolo"] == "GGAL"]
+    assert ggal["broker"] == "Varios"
+    assert ggal["cantidad"] == pytest.approx(15)
+    assert ggal["valor_compra"] == pytest.approx(50000.0 + 26000.0)
+    assert ggal["precio_operacion_compra"] == pytest.approx(76000.0 / 15)
+    assert ggal["precio_actual"] == pytest.approx(6000.0)
+    for campo in ("valor_actual", "valor_ars", "valor_usd", "descuentos", "rendimientos"):
+        assert ggal[campo] == pytest.approx(sum(item[campo] for item in by_broker)), campo
+    assert ggal["resultado"] == pytest.approx(ggal["diferencia_valor"] - ggal["descuentos"] + ggal["rendimientos"])
+
+    (btc,) = [item for item in project_portfolio(snap, aggregate_by_symbol=True).items if item["simbolo"] == "BTC"]
+    assert btc["broker"] == "IOL"
+
+
+def test_projection_display_currency_picks_the_total():
+    snap = snapshot()
+    ars = project_portfolio(snap, include_cash=False)
+    usd = project_portfolio(snap, include_cash=False, display_currency="USD")
+    assert ars.total_valor == ars.total_valor_ars
+    assert usd.total_valor == usd.total_valor_usd
+    assert usd.total_valor_ars == ars.total_valor_ars
+
+
+def test_projection_items_are_copies():
+    snap = snapshot()
+    project_portfolio(snap, aggregate_by_symbol=True).items[0]["valor_ars"] = -1
+    assert all(item["valor_ars"] != -1 for item in snap.items)
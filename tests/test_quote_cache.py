@@ -0,0 +1,71 @@
+import threading
+from datetime import datetime, timedelta
+
+from services.quote_cache import QuoteCache
+
+T0 = datetime(2024, 3, 4, 12, 0)
+
+
+class Clock:
+    def __init__(self, now=T0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_same_symbol_in_two_classes_keeps_both_entries():
+    clock = Clock()
+    cache = QuoteCache(now=clock)
+    cache.put_many("cripto", {"BTC": (68000.0, 1.5, T0)})
+    cache.put_many("mercado", {"BTC": (95000000.0, 2.0, T0 - timedelta(minutes=30))})
+
+    assert cache.get("cripto", "BTC").precio == 68000.0
+    assert cache.get("mercado", "BTC").precio == 95000000.0
+    assert not cache.is_stale("cripto", "BTC")
+    assert cache.is_stale("mercado", "BTC")
+    assert cache.age("cripto", "BTC") == timedelta(0)
+    assert cache.get("fx", "BTC") is None
+    assert cache.age("fx", "BTC") is None
+
+
+def test_refresh_expired_only_runs_expired_classes():
+    clock = Clock()
+    cache = QuoteCache(now=clock)
+    done = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(clock.now)
+        return {"ETH": (3500.0, None, clock.now)}
+
+    cache.register("cripto", refresh)
+    cache.on_updated = lambda clase: done.set()
+    cache.put_many("cripto", {"ETH": (3400.0, None, T0 - timedelta(minutes=20))})
+
+    assert cache.refresh_expired() == ["cripto"]
+    assert done.wait(5)
+    assert cache.get("cripto", "ETH").precio == 3500.0
+    assert cache.refresh_expired() == []
+
+    clock.now = T0 + timedelta(minutes=16)
+    assert cache.expired_classes() == ["cripto"]
+
+
+def test_failed_refresh_retries_later():
+    clock = Clock()
+    cache = QuoteCache(now=clock)
+    done = threading.Event()
+
+    def refresh():
+        raise ConnectionError("sin red")
+
+    cache.register("fx", refresh)
+    cache.on_updated = lambda clase: done.set()
+    # Sincrónico: sin datos nuevos no hay aviso que esperar
+    cache._refresh("fx")
+    assert not done.is_set()
+
+    assert cache.expired_classes() == []
+    clock.now = T0 + timedelta(minutes=3)
+    assert cache.expired_classes() == ["fx"]
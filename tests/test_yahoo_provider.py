@@ -0,0 +1,90 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("yfinance")
+
+from portfolio_app.data_providers.yahoo_provider import YahooPriceProvider, latest_closes  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _recorded_frame():
+    """Respuesta grabada de yf.download para AAPL, BTC-USD y KO (columnas Price/Ticker)."""
+    frame = pd.read_csv(os.path.join(FIXTURES, "yf_download_multi.csv"), header=[0, 1], index_col=0)
+    frame.index = pd.to_datetime(frame.index)
+    return frame
+
+
+def _flat_frame():
+    return pd.DataFrame(
+        {"Open": [10.0, 11.0], "Close": [10.5, 11.5]},
+        index=pd.to_datetime(["2024-03-01", "2024-03-04"]),
+    )
+
+
+class RecordedTransport:
+    """Devuelve la respuesta grabada recortada a los símbolos pedidos."""
+
+    def __init__(self, frame, fail_on=()):
+        self.frame = frame
+        self.fail_on = set(fail_on)
+        self.calls = []
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, symbols):
+        with self._lock:
+            self.calls.append(list(symbols))
+            self.threads.add(threading.current_thread().name)
+        if self.fail_on & set(symbols):
+            raise ConnectionError("recorded failure")
+        tickers = [s for s in symbols if s in self.frame.columns.get_level_values(1)]
+        return self.frame.loc[:, pd.IndexSlice[:, tickers]]
+
+
+def test_multiindex_frame_uses_last_close():
+    provider = YahooPriceProvider(transport=RecordedTransport(_recorded_frame()))
+    assert provider.get_bulk_prices(["AAPL", "BTC-USD"]) == {"AAPL": 175.10, "BTC-USD": 68330.41}
+
+
+def test_nan_last_row_is_forward_filled():
+    frame = _recorded_frame().iloc[:3]  # termina en un fin de semana: sólo BTC-USD cotiza
+    assert latest_closes(frame, ["AAPL", "BTC-USD", "KO"]) == {
+        "AAPL": 179.66,
+        "BTC-USD": 63167.37,
+        "KO": 59.44,
+    }
+
+
+def test_flat_single_ticker_frame():
+    provider = YahooPriceProvider(transport=lambda symbols: _flat_frame())
+    assert provider.get_bulk_prices(["GGAL"]) == {"GGAL": 11.5}
+    assert provider.get_latest_price("GGAL") == 11.5
+
+
+def test_missing_symbols_are_omitted():
+    provider = YahooPriceProvider(transport=RecordedTransport(_recorded_frame()))
+    assert provider.get_bulk_prices(["KO", "NOPE"]) == {"KO": 59.67}
+    assert latest_closes(pd.DataFrame(), ["KO"]) == {}
+
+
+def test_chunks_run_on_thread_pool():
+    transport = RecordedTransport(_recorded_frame())
+    provider = YahooPriceProvider(transport=transport, chunk_size=1, max_workers=3)
+
+    prices = provider.get_bulk_prices(["AAPL", "BTC-USD", "KO", "AAPL"])
+
+    assert prices == {"AAPL": 175.10, "BTC-USD": 68330.41, "KO": 59.67}
+    assert sorted(map(tuple, transport.calls)) == [("AAPL",), ("BTC-USD",), ("KO",)]
+    assert threading.current_thread().name not in transport.threads
+
+
+def test_failing_chunk_only_drops_its_symbols():
+    transport = RecordedTransport(_recorded_frame(), fail_on={"BTC-USD"})
+    provider = YahooPriceProvider(transport=transport, chunk_size=2)
+
+    assert provider.get_bulk_prices(["AAPL", "BTC-USD", "KO"]) == {"KO": 59.67}
+    assert provider._fetch_chunk(["BTC-USD"]) == {}